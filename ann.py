@@ -0,0 +1,314 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Approximate nearest neighbour search over embedding vectors.
+
+An inverted file (IVF) index clusters the vectors with spherical k-means and
+only scores the vectors in the num_probes clusters closest to each query,
+instead of the whole vocabulary.
+"""
+
+import logging
+from typing import Optional, Tuple
+
+import constants
+import numpy as np
+import similarity
+
+
+_DEFAULT_NUM_ITERATIONS = 10
+_TRAINING_POINTS_PER_CLUSTER = 256
+_DEFAULT_RECALL_SAMPLE_SIZE = 1000
+
+
+def _normalize_rows(vectors: np.ndarray, norms: np.ndarray) -> np.ndarray:
+  """Returns a unit length float32 copy of vectors with precomputed norms."""
+  return (np.asarray(vectors, dtype=np.float32)
+          / np.where(norms == 0, 1.0, norms)[:, np.newaxis])
+
+
+def _merge_top_n(
+    indices: np.ndarray,
+    scores: np.ndarray,
+    candidates: np.ndarray,
+    candidate_scores: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+  """Merges the unsorted top k of each row with the scores of candidates."""
+  k = indices.shape[1]
+  merged_scores = np.concatenate([scores, candidate_scores], axis=1)
+  merged_indices = np.concatenate(
+      [indices, np.broadcast_to(candidates, candidate_scores.shape)], axis=1)
+  best = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+  return (np.take_along_axis(merged_indices, best, axis=1),
+          np.take_along_axis(merged_scores, best, axis=1))
+
+
+class IVFIndex:
+  """An inverted file index with k-means coarse quantization.
+
+  The index keeps a reference to the vectors instead of a copy, so it works
+  with read-only memory-mapped keyed vectors.
+
+  Example:
+    index = IVFIndex(num_clusters=1024, num_probes=16).build(vectors)
+    indices, scores = index.search(query_indices, top_n=7)
+  """
+
+  def __init__(
+      self,
+      num_clusters: int,
+      num_probes: int,
+      num_iterations: int = _DEFAULT_NUM_ITERATIONS,
+      seed: int = 0,
+  ) -> None:
+    """Initializes the index.
+
+    Args:
+      num_clusters: A number of k-means clusters. sqrt(vocabulary size) is a
+        reasonable starting point.
+      num_probes: A number of closest clusters scored for each query. Higher
+        values trade speed for recall.
+      num_iterations: A number of k-means iterations.
+      seed: A seed for the random number generator.
+
+    Raises:
+      ValueError: if num_clusters or num_probes is not positive.
+    """
+    if num_clusters <= 0 or num_probes <= 0:
+      raise ValueError('num_clusters and num_probes must be positive.')
+    self.num_clusters = num_clusters
+    self.num_probes = min(num_probes, num_clusters)
+    self.num_iterations = num_iterations
+    self.seed = seed
+    self.vectors = None
+    self.norms = None
+    self.centroids = None
+    self.order = None
+    self.offsets = None
+
+  def build(
+      self,
+      vectors: np.ndarray,
+      norms: Optional[np.ndarray] = None,
+      block_size: int = constants.BLOCK_SIZE,
+  ) -> 'IVFIndex':
+    """Clusters the vectors and builds the inverted lists.
+
+    Args:
+      vectors: A 2-D array of embedding vectors, one row per item.
+      norms: A 1-D array of the row lengths of vectors. Computed if None.
+      block_size: A number of vectors assigned to clusters at once.
+
+    Returns:
+      The built index.
+    """
+    self.vectors = vectors
+    self.norms = (np.linalg.norm(vectors, axis=1) if norms is None
+                  else np.asarray(norms))
+    num_items = len(vectors)
+    num_clusters = min(self.num_clusters, num_items)
+    rng = np.random.default_rng(self.seed)
+
+    num_training_points = min(
+        num_items, num_clusters * _TRAINING_POINTS_PER_CLUSTER)
+    sample = np.sort(rng.choice(num_items, num_training_points,
+                                replace=False))
+    training_points = _normalize_rows(vectors[sample], self.norms[sample])
+    centroids = training_points[
+        rng.choice(len(training_points), num_clusters, replace=False)]
+    for _ in range(self.num_iterations):
+      labels = np.argmax(training_points @ centroids.T, axis=1)
+      counts = np.bincount(labels, minlength=num_clusters)
+      empty = counts == 0
+      starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+      sums = np.zeros_like(centroids)
+      sums[~empty] = np.add.reduceat(
+          training_points[np.argsort(labels, kind='stable')],
+          starts[~empty], axis=0)
+      sums[empty] = training_points[
+          rng.choice(len(training_points), int(empty.sum()))]
+      centroids = similarity.normalize_vectors(sums)
+    self.centroids = centroids
+
+    labels = np.empty(num_items, dtype=np.int64)
+    for start in range(0, num_items, block_size):
+      stop = start + block_size
+      block = _normalize_rows(vectors[start:stop], self.norms[start:stop])
+      labels[start:stop] = np.argmax(block @ centroids.T, axis=1)
+    self.order = np.argsort(labels, kind='stable')
+    self.offsets = np.concatenate(
+        [[0], np.cumsum(np.bincount(labels, minlength=num_clusters))])
+    logging.info('Built IVF index with %d clusters over %d items.',
+                 num_clusters, num_items)
+
+    return self
+
+  def search(
+      self,
+      query_indices: np.ndarray,
+      top_n: int,
+      block_size: int = constants.BLOCK_SIZE,
+  ) -> Tuple[np.ndarray, np.ndarray]:
+    """Finds approximately the top_n most similar items for each query item.
+
+    Queries whose probed clusters hold fewer than top_n other items fall back
+    to exact search, so every query returns the same number of results as
+    similarity.top_n_similar.
+
+    Args:
+      query_indices: A 1-D array of row indices in the vectors to query.
+      top_n: A number of similar items to return for each query.
+      block_size: A number of queries assigned to clusters and scored at
+        once. The queries of a block that probe the same cluster are scored
+        with one matrix product.
+
+    Returns:
+      A tuple of (indices, scores) in the format of
+      similarity.top_n_similar.
+    """
+    query_indices = np.asarray(query_indices, dtype=np.int64)
+    num_items = len(self.vectors)
+    k = max(min(top_n, num_items - 1), 0)
+    indices = np.empty((len(query_indices), k), dtype=np.int64)
+    scores = np.empty((len(query_indices), k), dtype=np.float32)
+    if k == 0:
+      return indices, scores
+
+    num_probes = min(self.num_probes, len(self.centroids))
+    norms = np.where(self.norms == 0, 1.0, self.norms).astype(np.float32)
+    for start in range(0, len(query_indices), block_size):
+      block = query_indices[start:start + block_size]
+      queries = _normalize_rows(self.vectors[block], self.norms[block])
+      probes = np.argpartition(-(queries @ self.centroids.T), num_probes - 1,
+                               axis=1)[:, :num_probes]
+
+      # The queries are grouped by probed cluster, so the members of each
+      # cluster are scored against all of its queries with one matrix product.
+      pair_rows = np.repeat(np.arange(len(block)), num_probes)
+      pair_order = np.argsort(probes.ravel(), kind='stable')
+      clusters, group_starts = np.unique(probes.ravel()[pair_order],
+                                         return_index=True)
+      best_indices = np.zeros((len(block), k), dtype=np.int64)
+      best_scores = np.full((len(block), k), -np.inf, dtype=np.float32)
+      for cluster, rows in zip(clusters,
+                               np.split(pair_rows[pair_order],
+                                        group_starts[1:])):
+        members = self.order[self.offsets[cluster]:self.offsets[cluster + 1]]
+        if not len(members):
+          continue
+        member_scores = (queries[rows] @ self.vectors[members].T
+                         / norms[members]).astype(np.float32, copy=False)
+        member_scores[members[np.newaxis, :] == block[rows, np.newaxis]] = (
+            -np.inf)
+        best_indices[rows], best_scores[rows] = _merge_top_n(
+            best_indices[rows], best_scores[rows], members, member_scores)
+
+      order = np.argsort(-best_scores, axis=1, kind='stable')
+      indices[start:start + len(block)] = np.take_along_axis(
+          best_indices, order, axis=1)
+      scores[start:start + len(block)] = np.take_along_axis(
+          best_scores, order, axis=1)
+
+      # Queries whose probed clusters hold fewer than k other items.
+      fallback = np.flatnonzero(np.isneginf(best_scores).any(axis=1))
+      if len(fallback):
+        indices[start + fallback], scores[start + fallback] = (
+            similarity.top_n_similar(self.vectors, block[fallback], k,
+                                     norms=self.norms))
+
+    return indices, scores
+
+  def save(self, path: str) -> None:
+    """Saves the clustering of the index without the vectors.
+
+    Args:
+      path: A .npz file path to save the index.
+    """
+    np.savez(path, centroids=self.centroids, order=self.order,
+             offsets=self.offsets,
+             num_probes=np.array(self.num_probes))
+
+  @classmethod
+  def load(
+      cls,
+      path: str,
+      vectors: np.ndarray,
+      norms: Optional[np.ndarray] = None,
+  ) -> 'IVFIndex':
+    """Loads an index saved by save over the same vectors.
+
+    Args:
+      path: A .npz file path of the saved index.
+      vectors: The embedding vectors that the index was built over.
+      norms: A 1-D array of the row lengths of vectors. Computed if None.
+
+    Returns:
+      A loaded index.
+    """
+    with np.load(path) as data:
+      index = cls(len(data['centroids']), int(data['num_probes']))
+      index.centroids = data['centroids']
+      index.order = data['order']
+      index.offsets = data['offsets']
+    index.vectors = vectors
+    index.norms = (np.linalg.norm(vectors, axis=1) if norms is None
+                   else np.asarray(norms))
+    return index
+
+
+def recall_at_n(
+    approximate_indices: np.ndarray,
+    exact_indices: np.ndarray,
+) -> float:
+  """Computes the mean fraction of exact top-N items found approximately.
+
+  Args:
+    approximate_indices: A 2-D array of approximate top-N indices per query.
+    exact_indices: A 2-D array of exact top-N indices per query.
+
+  Returns:
+    Recall@N between 0.0 and 1.0.
+  """
+  if exact_indices.size == 0:
+    return 1.0
+  hits = sum(len(np.intersect1d(a, e))
+             for a, e in zip(approximate_indices, exact_indices))
+  return hits / exact_indices.size
+
+
+def sampled_recall(
+    index: IVFIndex,
+    top_n: int,
+    sample_size: int = _DEFAULT_RECALL_SAMPLE_SIZE,
+    seed: int = 0,
+) -> float:
+  """Estimates recall@top_n of the index against exact search on a sample.
+
+  Args:
+    index: A built IVF index.
+    top_n: A number of similar items per query.
+    sample_size: A number of randomly sampled query items.
+    seed: A seed for the random number generator.
+
+  Returns:
+    Estimated recall@top_n between 0.0 and 1.0.
+  """
+  num_items = len(index.vectors)
+  rng = np.random.default_rng(seed)
+  sample = np.sort(rng.choice(num_items, min(sample_size, num_items),
+                              replace=False))
+  approximate_indices, _ = index.search(sample, top_n)
+  exact_indices, _ = similarity.top_n_similar(
+      index.vectors, sample, top_n, norms=index.norms)
+  return recall_at_n(approximate_indices, exact_indices)
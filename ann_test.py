@@ -0,0 +1,104 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for ann.py."""
+
+import os
+import tempfile
+import unittest
+
+import ann
+import numpy as np
+import similarity
+
+
+_FAKE_VECTORS = np.random.default_rng(0).normal(
+    size=(200, 16)).astype(np.float32)
+_FAKE_TOP_N = 5
+
+
+class IVFIndexTest(unittest.TestCase):
+
+  def test_search_probing_all_clusters_matches_exact_search(self):
+    index = ann.IVFIndex(num_clusters=8, num_probes=8).build(_FAKE_VECTORS)
+    query_indices = np.arange(len(_FAKE_VECTORS))
+
+    indices, scores = index.search(query_indices, _FAKE_TOP_N, block_size=64)
+
+    expected_indices, expected_scores = similarity.top_n_similar(
+        similarity.normalize_vectors(_FAKE_VECTORS), query_indices,
+        _FAKE_TOP_N)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+  def test_search_with_few_probes_returns_full_results(self):
+    index = ann.IVFIndex(num_clusters=50, num_probes=1).build(_FAKE_VECTORS)
+
+    indices, _ = index.search(np.arange(10), _FAKE_TOP_N)
+
+    self.assertEqual(indices.shape, (10, _FAKE_TOP_N))
+    for query_index, row in enumerate(indices):
+      self.assertNotIn(query_index, row)
+      self.assertEqual(len(set(row)), _FAKE_TOP_N)
+
+  def test_search_does_not_depend_on_block_size(self):
+    index = ann.IVFIndex(num_clusters=16, num_probes=3).build(_FAKE_VECTORS)
+    query_indices = np.arange(len(_FAKE_VECTORS))
+
+    indices, scores = index.search(query_indices, _FAKE_TOP_N, block_size=1)
+
+    expected_indices, expected_scores = index.search(
+        query_indices, _FAKE_TOP_N, block_size=64)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+  def test_sampled_recall_increases_with_probes(self):
+    low = ann.sampled_recall(
+        ann.IVFIndex(num_clusters=16, num_probes=1).build(_FAKE_VECTORS),
+        _FAKE_TOP_N)
+    high = ann.sampled_recall(
+        ann.IVFIndex(num_clusters=16, num_probes=16).build(_FAKE_VECTORS),
+        _FAKE_TOP_N)
+
+    self.assertLessEqual(low, high)
+    self.assertAlmostEqual(high, 1.0)
+
+  def test_save_and_load(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    path = os.path.join(temp_dir.name, 'index.npz')
+    index = ann.IVFIndex(num_clusters=8, num_probes=2).build(_FAKE_VECTORS)
+
+    index.save(path)
+    actual = ann.IVFIndex.load(path, _FAKE_VECTORS)
+
+    np.testing.assert_array_equal(actual.search(np.arange(20), 3)[0],
+                                  index.search(np.arange(20), 3)[0])
+
+  def test_init_with_failure_invalid_clusters(self):
+    with self.assertRaisesRegex(ValueError, 'must be positive'):
+      ann.IVFIndex(num_clusters=0, num_probes=1)
+
+
+class RecallAtNTest(unittest.TestCase):
+
+  def test_recall_at_n(self):
+    actual = ann.recall_at_n(np.array([[1, 2], [3, 4]]),
+                             np.array([[2, 1], [3, 5]]))
+
+    self.assertAlmostEqual(actual, 0.75)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,409 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Content recommendation of many GA4 properties in one invocation.
+
+A manifest CSV lists the input, content and output file paths of each
+property. The properties are trained and predicted with
+main.execute_content_recommendation_w2v_from_csv in one pool of worker
+processes, which import pandas and gensim once and are reused across
+properties. The largest inputs start first, and the cores are divided
+between concurrent properties by the size of their input, recomputed for
+each property that starts, so the fleet finishes in less wall time than
+running the properties one by one.
+
+Run from project's root directory.
+
+Example:
+  `python batch_runner.py -m manifest.csv -o summary.csv --jobs 4`
+"""
+
+import argparse
+import collections
+from concurrent import futures
+import dataclasses
+import logging
+import os
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Union
+
+import constants
+import instrumentation
+import main as pipeline
+import pandas as pd
+
+
+PROPERTY = 'property'
+INPUT = 'input'
+CONTENT = 'content'
+OUTPUT = 'output'
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+
+_MANIFEST_COLUMNS = (PROPERTY, INPUT, CONTENT, OUTPUT)
+# Property names are used as file names of run reports.
+_PROPERTY_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.-]*')
+_DEFAULT_JOBS = 2
+
+logging.basicConfig(
+    format='%(asctime)s %(message)s',
+    datefmt='%m/%d/%Y %I:%M:%S %p',
+    level=logging.INFO,
+)
+
+
+class Job(NamedTuple):
+  """Content recommendation of one property.
+
+  Attributes:
+    property: A name of the property, e.g. the GA4 property id.
+    input_file_path: A CSV format file path of training data.
+    content_file_path: A CSV format file path of content data.
+    output_file_path: A file path of output.
+    input_bytes: A size of the input file, which stands for the size of the
+      corpus.
+  """
+  property: str
+  input_file_path: str
+  content_file_path: str
+  output_file_path: str
+  input_bytes: int
+
+
+def read_manifest(path: str) -> List[Job]:
+  """Reads the jobs of a manifest CSV.
+
+  Args:
+    path: A CSV file path with the columns property, input, content and
+      output, one row per property. Relative file paths are relative to the
+      directory of the manifest.
+
+  Returns:
+    A list of jobs in the order of the manifest.
+
+  Raises:
+    ValueError: if a column is missing, a property name is not made of
+      letters, digits, '_', '.' and '-' starting with a letter or digit, or
+      a property is listed twice, ignoring case.
+    IOError: if an input file is not found.
+  """
+  df_manifest = pd.read_csv(path, dtype=str, keep_default_na=False)
+  missing = [column for column in _MANIFEST_COLUMNS
+             if column not in df_manifest.columns]
+  if missing:
+    raise ValueError(f'Manifest {path} has no columns {missing}.')
+  invalid = [name for name in df_manifest[PROPERTY]
+             if not _PROPERTY_PATTERN.fullmatch(name)]
+  if invalid:
+    raise ValueError(f'Manifest {path} has invalid property names {invalid}.')
+  # Run reports of names that differ only in case collide on some file
+  # systems.
+  if df_manifest[PROPERTY].str.lower().duplicated().any():
+    raise ValueError(f'Manifest {path} lists a property more than once.')
+
+  base_dir = os.path.dirname(os.path.abspath(path))
+  jobs = []
+  for row in df_manifest.itertuples(index=False):
+    input_file_path, content_file_path, output_file_path = (
+        os.path.join(base_dir, getattr(row, column))
+        for column in (INPUT, CONTENT, OUTPUT))
+    jobs.append(Job(getattr(row, PROPERTY), input_file_path,
+                    content_file_path, output_file_path,
+                    os.path.getsize(input_file_path)))
+  return jobs
+
+
+def divide_cores(sizes: Sequence[int], num_cores: int) -> List[int]:
+  """Divides the cores between concurrent jobs by their input size.
+
+  Every job gets the floor of its share of num_cores, at least 1, and the
+  cores left over go to the largest remainders. Jobs of equal size always get
+  equal workers, even if a core is left idle, and the total never exceeds
+  num_cores as long as there are no more jobs than cores.
+
+  Args:
+    sizes: Input sizes of the jobs that run at the same time.
+    num_cores: A number of cores to divide.
+
+  Returns:
+    A list of numbers of word2vec worker threads, one per size.
+  """
+  total = sum(sizes)
+  if total:
+    shares = [num_cores * size / total for size in sizes]
+  else:
+    shares = [num_cores / len(sizes)] * len(sizes)
+  workers = [max(1, int(share)) for share in shares]
+  # Jobs of equal size gain and lose cores together, so they stay equal.
+  groups = {}
+  for index, size in enumerate(sizes):
+    groups.setdefault(size, []).append(index)
+
+  def over_allocation(group: List[int]) -> float:
+    return workers[group[0]] - shares[group[0]]
+
+  while sum(workers) > num_cores:
+    group = max((group for group in groups.values() if workers[group[0]] > 1),
+                key=over_allocation)
+    for index in group:
+      workers[index] -= 1
+  for group in sorted(groups.values(), key=over_allocation):
+    if sum(workers) + len(group) > num_cores:
+      break
+    for index in group:
+      workers[index] += 1
+  return workers
+
+
+def next_job_workers(
+    size: int,
+    running_sizes: Sequence[int],
+    free_cores: int,
+    num_cores: int,
+) -> int:
+  """Computes the workers of a job started next to running jobs.
+
+  The share of the job is recomputed by divide_cores from its size and the
+  sizes of the jobs still running, and capped by the cores they leave free,
+  so a large job is not held to the share of a small job it replaces.
+
+  Args:
+    size: An input size of the job to start.
+    running_sizes: Input sizes of the jobs that are still running.
+    free_cores: A number of cores not used by the running jobs.
+    num_cores: A number of cores to divide.
+
+  Returns:
+    A number of word2vec worker threads, at least 1.
+  """
+  share = divide_cores([*running_sizes, size], num_cores)[-1]
+  return max(1, min(share, free_cores))
+
+
+def _run_job(
+    job: Job,
+    params: pipeline.Word2VecParams,
+    scoring_params: pipeline.ScoringParams,
+    is_ranking_process: bool,
+    ranking_item_name: str,
+    run_report_dir: Optional[str],
+) -> Dict[str, Union[str, int, float]]:
+  """Runs one property in a worker process and summarizes it."""
+  logging.info('Started %s with %d word2vec workers.', job.property,
+               params.workers)
+  run_report_path = None
+  if run_report_dir:
+    run_report_path = os.path.join(run_report_dir, f'{job.property}.json')
+  start = time.perf_counter()
+  status, error = STATUS_OK, ''
+  try:
+    with instrumentation.recording(run_report_path):
+      pipeline.execute_content_recommendation_w2v_from_csv(
+          job.input_file_path,
+          job.content_file_path,
+          job.output_file_path,
+          is_ranking_process,
+          ranking_item_name,
+          scoring_params,
+          params=params,
+      )
+  except Exception as e:  # pylint: disable=broad-except
+    logging.exception('Failed %s.', job.property)
+    status, error = STATUS_FAILED, repr(e)
+  seconds = time.perf_counter() - start
+  logging.info('Finished %s in %.2f seconds.', job.property, seconds)
+
+  return {
+      PROPERTY: job.property,
+      'status': status,
+      'input_bytes': job.input_bytes,
+      'workers': params.workers,
+      'seconds': seconds,
+      'output': job.output_file_path,
+      'error': error,
+  }
+
+
+def run_batch(
+    jobs: Sequence[Job],
+    num_jobs: int = _DEFAULT_JOBS,
+    params: Optional[pipeline.Word2VecParams] = None,
+    scoring_params: Optional[pipeline.ScoringParams] = None,
+    is_ranking_process: bool = False,
+    ranking_item_name: str = 'undefined',
+    run_report_dir: Optional[str] = None,
+    num_cores: Optional[int] = None,
+) -> pd.DataFrame:
+  """Runs the jobs in a pool of num_jobs processes, largest input first.
+
+  The cores are divided by divide_cores between the first num_jobs jobs.
+  Whenever jobs finish, the next jobs get their share by next_job_workers
+  from their size and the jobs still running, capped by the free cores, so
+  concurrent jobs never use more than num_cores threads. A failed job is
+  logged and reported in the summary without stopping the other jobs.
+
+  Args:
+    jobs: Jobs to run, e.g. from read_manifest.
+    num_jobs: A number of jobs that run concurrently, at most num_cores.
+    params: Hyperparameters of word2vec for every job. The workers field is
+      replaced by the workers of the job's process.
+    scoring_params: Parameters of the similarity search for every job.
+    is_ranking_process: A flag whether to run the ranking process.
+    ranking_item_name: A keyword to call the ranking result in outputs.
+    run_report_dir: A directory to write the JSON run report of each
+      property into as <property>.json, or None.
+    num_cores: A number of cores to divide. Defaults to os.cpu_count().
+
+  Returns:
+    A summary dataframe with one row per job in the order of jobs.
+  """
+  params = params or pipeline.Word2VecParams()
+  scoring_params = scoring_params or pipeline.ScoringParams()
+  num_cores = num_cores or os.cpu_count() or 1
+  num_jobs = max(1, min(num_jobs, num_cores, len(jobs)))
+  if run_report_dir:
+    os.makedirs(run_report_dir, exist_ok=True)
+
+  queue = collections.deque(
+      sorted(jobs, key=lambda job: job.input_bytes, reverse=True))
+  first_jobs = [queue.popleft() for _ in range(num_jobs)]
+  first_workers = divide_cores([job.input_bytes for job in first_jobs],
+                               num_cores)
+  logging.info('Running %d properties in %d processes with %s word2vec '
+               'workers on %d cores.', len(jobs), num_jobs, first_workers,
+               num_cores)
+  start = time.perf_counter()
+  rows = {}
+  with futures.ProcessPoolExecutor(max_workers=num_jobs) as executor:
+    running = {}  # future -> (job, workers)
+
+    def submit(job: Job, workers: int) -> None:
+      params_of_job = dataclasses.replace(params, workers=workers)
+      running[executor.submit(
+          _run_job, job, params_of_job, scoring_params, is_ranking_process,
+          ranking_item_name, run_report_dir)] = (job, workers)
+
+    for job, workers in zip(first_jobs, first_workers):
+      submit(job, workers)
+    while running:
+      done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+      for future in done:
+        running.pop(future)
+        row = future.result()
+        rows[row[PROPERTY]] = row
+      while queue and len(running) < num_jobs:
+        job = queue.popleft()
+        submit(job, next_job_workers(
+            job.input_bytes,
+            [running_job.input_bytes for running_job, _ in running.values()],
+            num_cores - sum(workers for _, workers in running.values()),
+            num_cores))
+  logging.info('Finished %d properties in %.2f seconds.', len(jobs),
+               time.perf_counter() - start)
+
+  return pd.DataFrame([rows[job.property] for job in jobs])
+
+
+def parse_cli_args() -> argparse.Namespace:
+  """Parses command line arguments.
+
+  Returns:
+    An instance of argparse.Namespace with arg values.
+  """
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+      '--manifest', '-m',
+      help=('Manifest CSV file path with the columns property, input, '
+            'content and output.'),
+      required=True,
+      type=str,
+      )
+  parser.add_argument(
+      '--output', '-o',
+      help='Output file path of the per-property summary CSV.',
+      required=True,
+      type=str,
+      )
+  parser.add_argument(
+      '--jobs', '-j',
+      help='Number of properties run concurrently.',
+      default=_DEFAULT_JOBS,
+      type=int,
+      )
+  parser.add_argument(
+      '--is_ranking', '-r',
+      help='Whether to run the ranking process.',
+      default=False,
+      action=argparse.BooleanOptionalAction,
+      )
+  parser.add_argument(
+      '--ranking_item_name', '-ri',
+      help='Set the keyword to call the ranking result.',
+      default='undefined',
+      type=str,
+      )
+  parser.add_argument(
+      '--run_report_dir', '-rr',
+      help='Directory to write the JSON run report of each property into.',
+      default=None,
+      type=str,
+      )
+  parser.add_argument(
+      '--block_size', '-b',
+      help='Number of content ids scored at once.',
+      default=constants.BLOCK_SIZE,
+      type=int,
+      )
+  defaults = pipeline.Word2VecParams()
+  for field in ('sg', 'window', 'min_count', 'vector_size', 'hs', 'negative',
+                'seed', 'epochs'):
+    parser.add_argument(
+        f'--{field}',
+        help=f'Word2vec {field} parameter.',
+        default=getattr(defaults, field),
+        type=int,
+        )
+
+  return parser.parse_args()
+
+
+def main() -> None:
+  """Runs every property of the manifest and writes the summary."""
+  args = parse_cli_args()
+  params = pipeline.Word2VecParams(
+      sg=args.sg,
+      window=args.window,
+      min_count=args.min_count,
+      vector_size=args.vector_size,
+      hs=args.hs,
+      negative=args.negative,
+      seed=args.seed,
+      epochs=args.epochs,
+  )
+  df_summary = run_batch(
+      read_manifest(args.manifest),
+      args.jobs,
+      params,
+      pipeline.ScoringParams(block_size=args.block_size),
+      args.is_ranking,
+      args.ranking_item_name,
+      args.run_report_dir,
+  )
+  df_summary.to_csv(args.output, index=False)
+  print(df_summary.to_string(index=False))
+
+
+if __name__ == '__main__':
+  main()
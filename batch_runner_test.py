@@ -0,0 +1,151 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for batch_runner.py."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import batch_runner
+import pandas as pd
+
+
+_SAMPLE_INPUT = 'sample_input_data.csv'
+_SAMPLE_CONTENT = 'sample_content_data.csv'
+
+
+def _fake_job(name: str, input_bytes: int) -> batch_runner.Job:
+  return batch_runner.Job(name, f'{name}.csv', 'content.csv',
+                          f'{name}_output.csv', input_bytes)
+
+
+class BatchRunnerTest(unittest.TestCase):
+
+  def _create_tempdir(self):
+    """Creates a temporary directory removed after the test."""
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    return temp_dir.name
+
+  def _write_manifest(self, temp_dir, rows):
+    """Writes a manifest of (property, input, content, output) rows."""
+    path = os.path.join(temp_dir, 'manifest.csv')
+    pd.DataFrame(rows, columns=batch_runner._MANIFEST_COLUMNS).to_csv(
+        path, index=False)
+    return path
+
+  def test_read_manifest_resolves_relative_paths(self):
+    temp_dir = self._create_tempdir()
+    shutil.copy(_SAMPLE_INPUT, os.path.join(temp_dir, 'input.csv'))
+    manifest_path = self._write_manifest(
+        temp_dir, [('123', 'input.csv', 'content.csv', 'output.csv')])
+
+    actual = batch_runner.read_manifest(manifest_path)
+
+    self.assertEqual(actual, [batch_runner.Job(
+        '123', os.path.join(temp_dir, 'input.csv'),
+        os.path.join(temp_dir, 'content.csv'),
+        os.path.join(temp_dir, 'output.csv'),
+        os.path.getsize(_SAMPLE_INPUT))])
+
+  def test_read_manifest_raises_value_error(self):
+    temp_dir = self._create_tempdir()
+    shutil.copy(_SAMPLE_INPUT, os.path.join(temp_dir, 'input.csv'))
+    duplicate_path = self._write_manifest(
+        temp_dir, [('123', 'input.csv', 'content.csv', 'a.csv'),
+                   ('123', 'input.csv', 'content.csv', 'b.csv')])
+    missing_path = os.path.join(temp_dir, 'missing.csv')
+    pd.DataFrame({'property': ['123'], 'input': ['input.csv']}).to_csv(
+        missing_path, index=False)
+
+    for path in (duplicate_path, missing_path):
+      with self.subTest(path=path):
+        with self.assertRaises(ValueError):
+          batch_runner.read_manifest(path)
+
+  def test_read_manifest_rejects_unsafe_property_names(self):
+    temp_dir = self._create_tempdir()
+    shutil.copy(_SAMPLE_INPUT, os.path.join(temp_dir, 'input.csv'))
+    for names in (['../123'], ['a/b'], ['..'], [''], ['Site', 'site']):
+      with self.subTest(names=names):
+        manifest_path = self._write_manifest(
+            temp_dir, [(name, 'input.csv', 'content.csv', f'{i}.csv')
+                       for i, name in enumerate(names)])
+
+        with self.assertRaisesRegex(ValueError, 'property'):
+          batch_runner.read_manifest(manifest_path)
+
+  def test_divide_cores(self):
+    self.assertEqual(batch_runner.divide_cores([600, 200], num_cores=8),
+                     [6, 2])
+    self.assertEqual(batch_runner.divide_cores([100, 1], num_cores=8), [7, 1])
+
+  def test_divide_cores_never_oversubscribes(self):
+    for sizes, num_cores in (([100, 1], 8), ([30, 30, 30], 9),
+                             ([10000, 1], 4), ([1000, 1, 1, 1], 4),
+                             ([5, 5, 5], 8), ([50, 50, 1], 4), ([0, 0], 3)):
+      with self.subTest(sizes=sizes, num_cores=num_cores):
+        actual = batch_runner.divide_cores(sizes, num_cores)
+
+        self.assertLessEqual(sum(actual), num_cores)
+        self.assertGreaterEqual(min(actual), 1)
+        for size, workers in zip(sizes, actual):
+          self.assertEqual(
+              {peer_workers for peer_size, peer_workers in zip(sizes, actual)
+               if peer_size == size}, {workers})
+
+  def test_next_job_workers(self):
+    # A large job queued behind a small one gets its own share of the free
+    # cores rather than the one worker the small job held.
+    self.assertEqual(batch_runner.next_job_workers(
+        900, running_sizes=[1000], free_cores=4, num_cores=8), 4)
+    self.assertEqual(batch_runner.next_job_workers(
+        900, running_sizes=[], free_cores=8, num_cores=8), 8)
+    # The share never exceeds the free cores, nor drops below 1.
+    self.assertEqual(batch_runner.next_job_workers(
+        900, running_sizes=[1000], free_cores=1, num_cores=8), 1)
+    self.assertEqual(batch_runner.next_job_workers(
+        1, running_sizes=[1000, 1000], free_cores=2, num_cores=8), 1)
+
+  def test_run_batch(self):
+    temp_dir = self._create_tempdir()
+    run_report_dir = os.path.join(temp_dir, 'reports')
+    manifest_path = self._write_manifest(temp_dir, [
+        ('site_a', os.path.abspath(_SAMPLE_INPUT),
+         os.path.abspath(_SAMPLE_CONTENT), 'site_a.csv'),
+        ('site_b', os.path.abspath(_SAMPLE_INPUT), 'missing_content.csv',
+         'site_b.csv'),
+        ('site_c', os.path.abspath(_SAMPLE_INPUT),
+         os.path.abspath(_SAMPLE_CONTENT), 'site_c.csv'),
+    ])
+
+    actual = batch_runner.run_batch(batch_runner.read_manifest(manifest_path),
+                                    num_jobs=3, run_report_dir=run_report_dir,
+                                    num_cores=2)
+
+    self.assertEqual(actual[batch_runner.PROPERTY].tolist(),
+                     ['site_a', 'site_b', 'site_c'])
+    self.assertEqual(actual['status'].tolist(),
+                     [batch_runner.STATUS_OK, batch_runner.STATUS_FAILED,
+                      batch_runner.STATUS_OK])
+    self.assertEqual(actual['workers'].tolist(), [1, 1, 1])
+    self.assertFalse(pd.read_csv(os.path.join(temp_dir, 'site_a.csv')).empty)
+    self.assertTrue(os.path.exists(os.path.join(run_report_dir,
+                                                'site_a.json')))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,916 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for performance regressions in the recommendation pipeline.
+
+Run from project's root directory.
+
+Example:
+  `python benchmark.py result_assembly --sizes 1000 2000 4000`
+  `python benchmark.py train_throughput --workers 1 2 4 8`
+  `python benchmark.py incremental_drift --delta_fraction 0.05`
+  `python benchmark.py ann_recall --num_items 100000 --probes 1 4 16`
+  `python benchmark.py parallel_scoring --num_items 100000 --workers 1 2 4`
+  `python benchmark.py quantized_scoring --num_items 100000`
+  `python benchmark.py corpus_memory -i sample_input_data.csv`
+  `python benchmark.py output_format --num_rows 10000000`
+  `python benchmark.py serving_latency --num_requests 10000 --concurrency 8`
+  `python benchmark.py serving_latency --url http://localhost:8080`
+"""
+
+import argparse
+from concurrent import futures
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable, Iterator, Optional, Sequence, Tuple
+from urllib import parse
+from urllib import request
+
+import ann
+import constants
+import corpus
+import firestore
+import gensim
+import main as pipeline
+import model_store
+import numpy as np
+import pandas as pd
+import preprocessing
+import quantization
+import results
+import serving
+import similarity
+
+
+_DEFAULT_ASSEMBLY_SIZES = (1000, 2000, 4000, 8000)
+_DEFAULT_WORKERS = (1, 2, 4)
+_DEFAULT_DELTA_FRACTION = 0.05
+_DEFAULT_NUM_ITEMS = 50000
+_DEFAULT_VECTOR_SIZE = 100
+_DEFAULT_CLUSTERS = (256,)
+_DEFAULT_PROBES = (1, 4, 16)
+_DEFAULT_NUM_ROWS = 10000000
+_DEFAULT_NUM_REQUESTS = 10000
+_DEFAULT_CONCURRENCY = 8
+_DEFAULT_RERANK_CANDIDATES = (0, 50)
+_SESSION_QUERY_LENGTH = 3
+
+logging.basicConfig(
+    format='%(asctime)s %(message)s',
+    datefmt='%m/%d/%Y %I:%M:%S %p',
+    level=logging.INFO,
+)
+
+
+def _time_call(func: Callable[[], object]) -> float:
+  """Returns wall time in seconds of calling func once."""
+  start = time.perf_counter()
+  func()
+  return time.perf_counter() - start
+
+
+def synthetic_vectors(
+    num_items: int,
+    vector_size: int,
+    num_topics: int = 100,
+    seed: int = 0,
+) -> np.ndarray:
+  """Generates embedding vectors clustered around random topics.
+
+  Args:
+    num_items: A number of vectors.
+    vector_size: Dimensionality of the vectors.
+    num_topics: A number of topic centers the vectors are drawn around.
+    seed: A seed for the random number generator.
+
+  Returns:
+    A float32 array of shape (num_items, vector_size).
+  """
+  rng = np.random.default_rng(seed)
+  topics = rng.normal(size=(num_topics, vector_size))
+  return (topics[rng.integers(num_topics, size=num_items)]
+          + rng.normal(scale=0.5, size=(num_items, vector_size))
+          ).astype(np.float32)
+
+
+def _concat_assembly(
+    keywords: np.ndarray,
+    rcm_results: np.ndarray,
+    ranks: np.ndarray,
+    scores: np.ndarray,
+) -> pd.DataFrame:
+  """Assembles results with one pd.concat per row as a quadratic reference."""
+  df_result = pd.DataFrame({
+      constants.KEYWORD: pd.Series(dtype='object'),
+      constants.RCM_RESULT: pd.Series(dtype='object'),
+      constants.RANK: pd.Series(dtype='int64'),
+      constants.SCORE: pd.Series(dtype='float64'),
+  })
+  for row in zip(keywords, rcm_results, ranks, scores):
+    record = pd.DataFrame([row], columns=df_result.columns)
+    df_result = pd.concat([df_result, record])
+  return df_result
+
+
+def benchmark_result_assembly(
+    sizes: Sequence[int],
+    include_concat: bool = True,
+) -> pd.DataFrame:
+  """Measures result assembly time against the number of recommendations.
+
+  Args:
+    sizes: Numbers of content ids in the synthetic catalogs. Each content id
+      produces constants.TOP_N recommendations.
+    include_concat: Whether to also time the per-row pd.concat reference.
+
+  Returns:
+    A dataframe with the number of rows, seconds and seconds per row for each
+    method and size. Linear methods have a flat seconds per row.
+  """
+  rng = np.random.default_rng(0)
+  records = []
+  for size in sizes:
+    keywords = np.repeat(
+        np.array([f'ITEM_{i}' for i in range(size)], dtype=object),
+        constants.TOP_N)
+    rcm_results = rng.permutation(keywords)
+    ranks = np.tile(np.arange(1, constants.TOP_N + 1), size)
+    scores = rng.random(len(keywords))
+    methods = {'columnar': results.build_result_frame}
+    if include_concat:
+      methods['concat'] = _concat_assembly
+    for method, assemble in methods.items():
+      seconds = _time_call(
+          lambda: assemble(keywords, rcm_results, ranks, scores))  # pylint: disable=cell-var-from-loop
+      records.append((method, len(keywords), seconds,
+                      seconds / len(keywords)))
+      logging.info('%s assembly of %d rows took %.4f seconds.',
+                   method, len(keywords), seconds)
+
+  return pd.DataFrame(
+      records, columns=['method', 'rows', 'seconds', 'seconds_per_row'])
+
+
+def benchmark_train_throughput(
+    workers: Sequence[int],
+    input_file_path: Optional[str] = None,
+    num_sessions: int = corpus.SYNTHETIC_NUM_SESSIONS,
+    vocabulary_size: int = corpus.SYNTHETIC_VOCABULARY_SIZE,
+    session_length: int = corpus.SYNTHETIC_SESSION_LENGTH,
+) -> pd.DataFrame:
+  """Measures word2vec training throughput against the number of workers.
+
+  Both the sentences mode with a streaming corpus and the corpus_file mode
+  are measured for each worker count.
+
+  Args:
+    workers: Numbers of worker threads to measure.
+    input_file_path: A CSV format file path of training data. Synthetic
+      sessions are generated when it is None.
+    num_sessions: A number of synthetic sessions.
+    vocabulary_size: A number of distinct synthetic content ids.
+    session_length: A mean number of content ids per synthetic session.
+
+  Returns:
+    A dataframe with the mode, workers, seconds and raw words per second.
+  """
+  records = []
+  with tempfile.TemporaryDirectory() as temp_dir:
+    if input_file_path is None:
+      training_data = corpus.synthetic_sessions(
+          num_sessions, vocabulary_size, session_length)
+    else:
+      training_data = corpus.ItemListCorpus(input_file_path)
+    corpus_file = os.path.join(temp_dir, 'corpus.txt')
+    num_words = corpus.write_line_sentence_file(training_data, corpus_file)
+
+    for num_workers in workers:
+      params = pipeline.Word2VecParams(workers=num_workers)
+      for mode, args in (('sentences', (training_data, params)),
+                         ('corpus_file', (None, params, corpus_file))):
+        seconds = _time_call(
+            lambda: pipeline.execute_embedding_w2v(*args))  # pylint: disable=cell-var-from-loop
+        words_per_second = num_words * params.epochs / seconds
+        records.append((mode, num_workers, seconds, words_per_second))
+        logging.info('%s mode with %d workers trained %.0f words/sec.',
+                     mode, num_workers, words_per_second)
+
+  return pd.DataFrame(
+      records, columns=['mode', 'workers', 'seconds', 'words_per_second'])
+
+
+def benchmark_incremental_drift(
+    delta_fraction: float,
+    input_file_path: Optional[str] = None,
+    num_sessions: int = corpus.SYNTHETIC_NUM_SESSIONS,
+    vocabulary_size: int = corpus.SYNTHETIC_VOCABULARY_SIZE,
+    session_length: int = corpus.SYNTHETIC_SESSION_LENGTH,
+) -> pd.DataFrame:
+  """Compares an incremental model update with a full retrain.
+
+  The sessions are split into history and a new delta. The incremental model
+  is trained on the history and then updated only with the delta, while the
+  full model is retrained on all sessions.
+
+  Args:
+    delta_fraction: A fraction of the sessions used as the new delta.
+    input_file_path: A CSV format file path of training data. Synthetic
+      sessions are generated when it is None.
+    num_sessions: A number of synthetic sessions.
+    vocabulary_size: A number of distinct synthetic content ids.
+    session_length: A mean number of content ids per synthetic session.
+
+  Returns:
+    A one row dataframe with the seconds of the full retrain and of the
+    update, and the drift of the updated vectors from the full retrain.
+  """
+  if input_file_path is None:
+    sessions = corpus.synthetic_sessions(num_sessions, vocabulary_size,
+                                  session_length)
+  else:
+    sessions = list(corpus.ItemListCorpus(input_file_path))
+  split = int(len(sessions) * (1 - delta_fraction))
+  history, delta = sessions[:split], sessions[split:]
+
+  start = time.perf_counter()
+  full_model = pipeline.execute_embedding_w2v(sessions)
+  full_seconds = time.perf_counter() - start
+
+  model = pipeline.execute_embedding_w2v(history)
+  start = time.perf_counter()
+  model_store.update_model(model, delta)
+  update_seconds = time.perf_counter() - start
+
+  drift = model_store.vector_drift(model.wv, full_model.wv, constants.TOP_N)
+  logging.info('Full retrain took %.2f seconds and update took %.2f seconds.',
+               full_seconds, update_seconds)
+
+  return pd.DataFrame([{
+      'full_seconds': full_seconds,
+      'update_seconds': update_seconds,
+      **drift._asdict(),
+  }])
+
+
+def benchmark_ann_recall(
+    num_items: int,
+    vector_size: int,
+    clusters: Sequence[int],
+    probes: Sequence[int],
+    num_queries: int = 1000,
+) -> pd.DataFrame:
+  """Measures approximate search speed and recall against exact search.
+
+  Args:
+    num_items: A number of synthetic embedding vectors.
+    vector_size: Dimensionality of the vectors.
+    clusters: Numbers of k-means clusters to measure.
+    probes: Numbers of probed clusters to measure.
+    num_queries: A number of query items.
+
+  Returns:
+    A dataframe with clusters, probes, build and search seconds and
+    recall@constants.TOP_N, plus an exact search row with 0 clusters.
+  """
+  vectors = synthetic_vectors(num_items, vector_size)
+  norms = np.linalg.norm(vectors, axis=1)
+  query_indices = np.arange(min(num_queries, num_items))
+  start = time.perf_counter()
+  exact_indices, _ = similarity.top_n_similar(
+      vectors, query_indices, constants.TOP_N, norms=norms)
+  records = [(0, 0, 0.0, time.perf_counter() - start, 1.0)]
+
+  for num_clusters in clusters:
+    start = time.perf_counter()
+    index = ann.IVFIndex(num_clusters, 1).build(vectors, norms)
+    build_seconds = time.perf_counter() - start
+    for num_probes in probes:
+      index.num_probes = min(num_probes, num_clusters)
+      start = time.perf_counter()
+      indices, _ = index.search(query_indices, constants.TOP_N)
+      search_seconds = time.perf_counter() - start
+      recall = ann.recall_at_n(indices, exact_indices)
+      records.append((num_clusters, num_probes, build_seconds,
+                      search_seconds, recall))
+      logging.info('%d clusters and %d probes: recall@%d %.4f.',
+                   num_clusters, num_probes, constants.TOP_N, recall)
+
+  return pd.DataFrame(
+      records,
+      columns=['clusters', 'probes', 'build_seconds', 'search_seconds',
+               f'recall_at_{constants.TOP_N}'])
+
+
+def benchmark_parallel_scoring(
+    num_items: int,
+    vector_size: int,
+    workers: Sequence[int],
+    block_size: int = 1024,
+) -> pd.DataFrame:
+  """Measures exact top-N scoring speedup against the number of processes.
+
+  Args:
+    num_items: A number of synthetic embedding vectors, all of which are
+      queried.
+    vector_size: Dimensionality of the vectors.
+    workers: Numbers of worker processes to measure.
+    block_size: A number of queries scored with one matrix product.
+
+  Returns:
+    A dataframe with workers, seconds and speedup over the first entry.
+  """
+  vectors = synthetic_vectors(num_items, vector_size)
+  norms = np.linalg.norm(vectors, axis=1)
+  query_indices = np.arange(num_items)
+  records = []
+  for num_workers in workers:
+    seconds = _time_call(lambda: similarity.parallel_top_n_similar(  # pylint: disable=cell-var-from-loop
+        vectors, query_indices, constants.TOP_N, block_size, norms,
+        num_workers))
+    records.append((num_workers, seconds))
+    logging.info('Scoring with %d workers took %.2f seconds.',
+                 num_workers, seconds)
+
+  df_benchmark = pd.DataFrame(records, columns=['workers', 'seconds'])
+  df_benchmark['speedup'] = df_benchmark['seconds'].iloc[0] / (
+      df_benchmark['seconds'])
+  return df_benchmark
+
+
+def benchmark_quantized_scoring(
+    num_items: int,
+    vector_size: int,
+    rerank_candidates: Sequence[int],
+    num_queries: int = 1000,
+    block_size: int = 1024,
+) -> pd.DataFrame:
+  """Measures quantized top-N scoring against float32 scoring.
+
+  Args:
+    num_items: A number of synthetic embedding vectors.
+    vector_size: Dimensionality of the vectors.
+    rerank_candidates: Numbers of re-ranked candidates per query to measure,
+      where 0 does not re-rank.
+    num_queries: A number of query items.
+    block_size: A number of queries scored at once.
+
+  Returns:
+    A dataframe with quantization, rerank candidates, bytes of the scored
+    vectors, search seconds and top-constants.TOP_N overlap with float32 search.
+  """
+  vectors = synthetic_vectors(num_items, vector_size)
+  norms = np.linalg.norm(vectors, axis=1)
+  query_indices = np.arange(min(num_queries, num_items))
+  start = time.perf_counter()
+  exact_indices, _ = similarity.top_n_similar(
+      vectors, query_indices, constants.TOP_N, block_size, norms)
+  records = [(quantization.NONE, 0, vectors.nbytes,
+              time.perf_counter() - start, 1.0)]
+
+  for method in (quantization.FLOAT16, quantization.INT8):
+    quantized = quantization.quantize(vectors, method, norms)
+    for num_candidates in rerank_candidates:
+      start = time.perf_counter()
+      indices, _ = quantization.top_n_similar(
+          quantized, query_indices, constants.TOP_N, block_size, vectors, norms,
+          num_candidates)
+      search_seconds = time.perf_counter() - start
+      overlap = ann.recall_at_n(indices, exact_indices)
+      records.append((method, num_candidates, quantized.nbytes,
+                      search_seconds, overlap))
+      logging.info('%s with %d re-ranked candidates: overlap@%d %.4f.',
+                   method, num_candidates, constants.TOP_N, overlap)
+
+  return pd.DataFrame(
+      records,
+      columns=['quantization', 'rerank_candidates', 'vector_bytes',
+               'search_seconds', f'overlap_at_{constants.TOP_N}'])
+
+
+def _traced_bytes(func: Callable[[], object]) -> Tuple[object, int, int]:
+  """Returns the result of func and the retained and peak bytes allocated."""
+  tracemalloc.start()
+  try:
+    result = func()
+    retained, peak = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+  return result, retained, peak
+
+
+def benchmark_corpus_memory(
+    input_file_path: Optional[str] = None,
+    num_sessions: int = corpus.SYNTHETIC_NUM_SESSIONS,
+    vocabulary_size: int = corpus.SYNTHETIC_VOCABULARY_SIZE,
+    session_length: int = corpus.SYNTHETIC_SESSION_LENGTH,
+) -> pd.DataFrame:
+  """Compares memory of sessions as lists of strings and as an encoded corpus.
+
+  Args:
+    input_file_path: A CSV format file path of training data. Synthetic
+      sessions are written to a temporary CSV when it is None.
+    num_sessions: A number of synthetic sessions.
+    vocabulary_size: A number of distinct synthetic content ids.
+    session_length: A mean number of content ids per synthetic session.
+
+  Returns:
+    A dataframe with the representation, bytes retained by the loaded corpus,
+    peak bytes while loading and seconds to load.
+  """
+  with tempfile.TemporaryDirectory() as temp_dir:
+    if input_file_path is None:
+      input_file_path = os.path.join(temp_dir, 'input.csv')
+      pd.DataFrame({constants.ITEM_LIST: [
+          constants.DELIMITER.join(session)
+          for session in corpus.synthetic_sessions(
+              num_sessions, vocabulary_size, session_length)
+      ]}).to_csv(input_file_path, index=False)
+    encoded_path = os.path.join(temp_dir, 'encoded')
+
+    loaders = {
+        'list_of_str': lambda: list(corpus.ItemListCorpus(input_file_path)),
+        'encoded': lambda: corpus.EncodedCorpus.from_csv(input_file_path),
+        'encoded_reload': lambda: corpus.EncodedCorpus.load(encoded_path,
+                                                            mmap_mode=None),
+    }
+    records = []
+    for name, loader in loaders.items():
+      start = time.perf_counter()
+      loaded, retained, peak = _traced_bytes(loader)
+      seconds = time.perf_counter() - start
+      if name == 'encoded':
+        loaded.save(encoded_path)
+      records.append((name, retained, peak, seconds))
+      logging.info('%s corpus retained %d bytes.', name, retained)
+
+  return pd.DataFrame(
+      records,
+      columns=['representation', 'retained_bytes', 'peak_bytes', 'seconds'])
+
+
+def benchmark_preprocessing(
+    input_file_path: Optional[str] = None,
+    num_sessions: int = corpus.SYNTHETIC_NUM_SESSIONS,
+    vocabulary_size: int = corpus.SYNTHETIC_VOCABULARY_SIZE,
+    session_length: int = corpus.SYNTHETIC_SESSION_LENGTH,
+) -> pd.DataFrame:
+  """Compares word2vec training on raw and preprocessed corpora.
+
+  The preprocessed corpus has consecutive repeats collapsed and sessions of
+  fewer than 2 content ids dropped.
+
+  Args:
+    input_file_path: A CSV format file path of training data. Synthetic
+      sessions are generated when it is None.
+    num_sessions: A number of synthetic sessions.
+    vocabulary_size: A number of distinct synthetic content ids.
+    session_length: A mean number of content ids per synthetic session.
+
+  Returns:
+    A dataframe with the corpus, sessions, tokens, training seconds and
+    speedup over the raw corpus.
+  """
+  if input_file_path is None:
+    encoded = corpus.synthetic_corpus(num_sessions, vocabulary_size,
+                                      session_length)
+  else:
+    encoded = corpus.EncodedCorpus.from_csv(input_file_path)
+  preprocessed, _ = preprocessing.preprocess(encoded, collapse=True,
+                                             min_length=2)
+
+  records = []
+  for name, training_data in (('raw', encoded),
+                              ('preprocessed', preprocessed)):
+    seconds = _time_call(
+        lambda: pipeline.execute_embedding_w2v(training_data))  # pylint: disable=cell-var-from-loop
+    records.append((name, len(training_data), len(training_data.tokens),
+                    seconds))
+    logging.info('%s corpus of %d tokens trained in %.2f seconds.', name,
+                 len(training_data.tokens), seconds)
+
+  df_benchmark = pd.DataFrame(
+      records, columns=['corpus', 'sessions', 'tokens', 'seconds'])
+  df_benchmark['speedup'] = df_benchmark['seconds'][0] / df_benchmark[
+      'seconds']
+  return df_benchmark
+
+
+def benchmark_output_format(
+    num_rows: int = _DEFAULT_NUM_ROWS,
+    vocabulary_size: int = corpus.SYNTHETIC_VOCABULARY_SIZE,
+) -> pd.DataFrame:
+  """Compares write and read time and file size of CSV and npz outputs.
+
+  CSV is written with to_csv and read with firestore.read_csv_to_np_array.
+  npz is written with results.write_npz and read both as memory-mapped codes
+  and decoded with firestore.read_npz_to_np_array.
+
+  Args:
+    num_rows: A number of synthetic recommendation rows.
+    vocabulary_size: A number of distinct synthetic content ids.
+
+  Returns:
+    A dataframe with the format, seconds to write, seconds to read and file
+    size in bytes.
+  """
+  rng = np.random.default_rng(0)
+  vocabulary = np.array([f'ITEM_{i}' for i in range(vocabulary_size)],
+                        dtype=object)
+  num_keywords = -(-num_rows // constants.TOP_N)
+  df_result = results.build_result_frame(
+      np.repeat(vocabulary[rng.integers(vocabulary_size, size=num_keywords)],
+                constants.TOP_N)[:num_rows],
+      vocabulary[rng.integers(vocabulary_size, size=num_rows)],
+      np.tile(np.arange(1, constants.TOP_N + 1), num_keywords)[:num_rows],
+      rng.random(num_rows, dtype=np.float32),
+  )
+
+  with tempfile.TemporaryDirectory() as temp_dir:
+    csv_path = os.path.join(temp_dir, 'output.csv')
+    npz_path = os.path.join(temp_dir, 'output.npz')
+    outputs = (
+        ('csv', csv_path,
+         lambda: df_result.to_csv(csv_path, index=False),
+         lambda: firestore.read_csv_to_np_array(csv_path)),
+        ('npz', npz_path,
+         lambda: results.write_npz(df_result, npz_path),
+         lambda: firestore.read_npz_to_np_array(npz_path)),
+        ('npz_codes', npz_path,
+         lambda: results.write_npz(df_result, npz_path),
+         lambda: results.read_npz_records(npz_path)),
+    )
+    records = []
+    for name, path, write, read in outputs:
+      write_seconds = _time_call(write)
+      read_seconds = _time_call(read)
+      records.append((name, write_seconds, read_seconds,
+                      os.path.getsize(path)))
+      logging.info('%s output of %d rows took %.2f seconds to read.',
+                   name, num_rows, read_seconds)
+
+  return pd.DataFrame(
+      records,
+      columns=['format', 'write_seconds', 'read_seconds', 'file_bytes'])
+
+
+@contextlib.contextmanager
+def _local_server(num_items: int, vector_size: int) -> Iterator[str]:
+  """Serves synthetic vectors on a free localhost port and yields its URL."""
+  keyed_vectors = gensim.models.KeyedVectors(vector_size)
+  keyed_vectors.add_vectors([f'ITEM_{i}' for i in range(num_items)],
+                            synthetic_vectors(num_items, vector_size))
+  httpd = serving.RecommendationServer(('127.0.0.1', 0),
+                                       serving.Recommender(keyed_vectors))
+  thread = threading.Thread(target=httpd.serve_forever)
+  thread.start()
+  try:
+    yield 'http://%s:%d' % httpd.server_address
+  finally:
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+def benchmark_serving_latency(
+    url: Optional[str] = None,
+    num_requests: int = _DEFAULT_NUM_REQUESTS,
+    concurrency: int = _DEFAULT_CONCURRENCY,
+    num_items: int = _DEFAULT_NUM_ITEMS,
+    vector_size: int = _DEFAULT_VECTOR_SIZE,
+) -> pd.DataFrame:
+  """Load-tests the /similar and /session endpoints of serving.py.
+
+  Queried content ids follow a long tail popularity, so hot ids hit the LRU
+  cache of the server as they would in production.
+
+  Args:
+    url: A base URL of a running serving.py, whose vocabulary must use the
+      ITEM_{i} content ids of synthetic data. A server over synthetic vectors
+      is started on localhost if it is None.
+    num_requests: A number of requests per endpoint.
+    concurrency: A number of concurrent clients.
+    num_items: A number of synthetic content ids queried.
+    vector_size: Dimensionality of the synthetic vectors of a local server.
+
+  Returns:
+    A dataframe with the endpoint, requests per second and client side p50
+    and p99 latency in milliseconds.
+  """
+  rng = np.random.default_rng(0)
+  popularity = 1.0 / np.arange(1, num_items + 1)
+  popularity /= popularity.sum()
+  items = rng.choice(num_items, (num_requests, _SESSION_QUERY_LENGTH),
+                     p=popularity)
+  queries = {
+      serving.PATH_SIMILAR: [
+          parse.urlencode({serving.PARAM_ITEM: f'ITEM_{row[0]}'})
+          for row in items],
+      serving.PATH_SESSION: [
+          parse.urlencode({serving.PARAM_ITEMS: constants.DELIMITER.join(
+              f'ITEM_{i}' for i in row)}) for row in items],
+  }
+
+  def get(query_url: str) -> float:
+    start = time.perf_counter()
+    with request.urlopen(query_url) as response:
+      response.read()
+    return time.perf_counter() - start
+
+  with contextlib.ExitStack() as stack:
+    if url is None:
+      url = stack.enter_context(_local_server(num_items, vector_size))
+    records = []
+    for path, query_strings in queries.items():
+      with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        latencies = np.array(list(executor.map(
+            get, [f'{url}{path}?{query}' for query in query_strings])))
+        seconds = time.perf_counter() - start
+      records.append((path, num_requests / seconds,
+                      np.percentile(latencies, 50) * 1000,
+                      np.percentile(latencies, 99) * 1000))
+    with request.urlopen(f'{url}{serving.PATH_METRICS}') as response:
+      logging.info('Server metrics: %s', json.load(response))
+
+  return pd.DataFrame(
+      records, columns=['endpoint', 'requests_per_second', 'p50_ms', 'p99_ms'])
+
+
+def parse_cli_args() -> argparse.Namespace:
+  """Parses command line arguments.
+
+  Returns:
+    An instance of argparse.Namespace with arg values.
+  """
+  parser = argparse.ArgumentParser()
+  subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+  assembly_parser = subparsers.add_parser(
+      'result_assembly',
+      help='Result dataframe assembly time against catalog size.',
+      )
+  assembly_parser.add_argument(
+      '--sizes',
+      help='Numbers of content ids in the synthetic catalogs.',
+      default=_DEFAULT_ASSEMBLY_SIZES,
+      nargs='+',
+      type=int,
+      )
+  assembly_parser.add_argument(
+      '--include_concat',
+      help='Whether to time the per-row pd.concat reference.',
+      default=True,
+      action=argparse.BooleanOptionalAction,
+      )
+
+  throughput_parser = subparsers.add_parser(
+      'train_throughput',
+      help='Word2vec training words/sec against the number of workers.',
+      )
+  throughput_parser.add_argument(
+      '--workers',
+      help='Numbers of worker threads to measure.',
+      default=_DEFAULT_WORKERS,
+      nargs='+',
+      type=int,
+      )
+
+  drift_parser = subparsers.add_parser(
+      'incremental_drift',
+      help='Incremental update time and vector drift against a retrain.',
+      )
+  drift_parser.add_argument(
+      '--delta_fraction',
+      help='Fraction of the sessions used as the new delta.',
+      default=_DEFAULT_DELTA_FRACTION,
+      type=float,
+      )
+
+  ann_parser = subparsers.add_parser(
+      'ann_recall',
+      help='Approximate search speed and recall against exact search.',
+      )
+  ann_parser.add_argument(
+      '--clusters',
+      help='Numbers of k-means clusters to measure.',
+      default=_DEFAULT_CLUSTERS,
+      nargs='+',
+      type=int,
+      )
+  ann_parser.add_argument(
+      '--probes',
+      help='Numbers of probed clusters to measure.',
+      default=_DEFAULT_PROBES,
+      nargs='+',
+      type=int,
+      )
+
+  parallel_parser = subparsers.add_parser(
+      'parallel_scoring',
+      help='Exact top-N scoring speedup against the number of processes.',
+      )
+  parallel_parser.add_argument(
+      '--workers',
+      help='Numbers of worker processes to measure.',
+      default=_DEFAULT_WORKERS,
+      nargs='+',
+      type=int,
+      )
+
+  quantized_parser = subparsers.add_parser(
+      'quantized_scoring',
+      help='Quantized top-N scoring speed and overlap with float32 scoring.',
+      )
+  quantized_parser.add_argument(
+      '--rerank_candidates',
+      help='Numbers of re-ranked candidates per query to measure.',
+      default=_DEFAULT_RERANK_CANDIDATES,
+      nargs='+',
+      type=int,
+      )
+
+  serving_parser = subparsers.add_parser(
+      'serving_latency',
+      help='Load test of the serving.py HTTP endpoints on localhost.',
+      )
+  serving_parser.add_argument(
+      '--url',
+      help=('Base URL of a running serving.py. A local server over synthetic '
+            'vectors is started if omitted.'),
+      default=None,
+      type=str,
+      )
+  serving_parser.add_argument(
+      '--num_requests',
+      help='Number of requests per endpoint.',
+      default=_DEFAULT_NUM_REQUESTS,
+      type=int,
+      )
+  serving_parser.add_argument(
+      '--concurrency',
+      help='Number of concurrent clients.',
+      default=_DEFAULT_CONCURRENCY,
+      type=int,
+      )
+
+  for subparser in (ann_parser, parallel_parser, quantized_parser,
+                    serving_parser):
+    subparser.add_argument(
+        '--num_items',
+        help='Number of synthetic embedding vectors.',
+        default=_DEFAULT_NUM_ITEMS,
+        type=int,
+        )
+    subparser.add_argument(
+        '--vector_size',
+        help='Dimensionality of the synthetic embedding vectors.',
+        default=_DEFAULT_VECTOR_SIZE,
+        type=int,
+        )
+
+  memory_parser = subparsers.add_parser(
+      'corpus_memory',
+      help='Memory of list of strings and integer-encoded corpora.',
+      )
+
+  preprocessing_parser = subparsers.add_parser(
+      'preprocessing',
+      help='Training time on raw and preprocessed corpora.',
+      )
+
+  output_parser = subparsers.add_parser(
+      'output_format',
+      help='Write and read time and file size of CSV and npz outputs.',
+      )
+  output_parser.add_argument(
+      '--num_rows',
+      help='Number of synthetic recommendation rows.',
+      default=_DEFAULT_NUM_ROWS,
+      type=int,
+      )
+  output_parser.add_argument(
+      '--vocabulary_size',
+      help='Number of distinct synthetic content ids.',
+      default=corpus.SYNTHETIC_VOCABULARY_SIZE,
+      type=int,
+      )
+
+  for subparser in (throughput_parser, drift_parser, memory_parser,
+                    preprocessing_parser):
+    subparser.add_argument(
+        '--input', '-i',
+        help='Input data file path. Synthetic sessions are used if omitted.',
+        default=None,
+        type=str,
+        )
+    subparser.add_argument(
+        '--num_sessions',
+        help='Number of synthetic sessions.',
+        default=corpus.SYNTHETIC_NUM_SESSIONS,
+        type=int,
+        )
+    subparser.add_argument(
+        '--vocabulary_size',
+        help='Number of distinct synthetic content ids.',
+        default=corpus.SYNTHETIC_VOCABULARY_SIZE,
+        type=int,
+        )
+    subparser.add_argument(
+        '--session_length',
+        help='Mean number of content ids per synthetic session.',
+        default=corpus.SYNTHETIC_SESSION_LENGTH,
+        type=int,
+        )
+
+  return parser.parse_args()
+
+
+def main() -> None:
+  """Runs the selected benchmark and prints the results."""
+  args = parse_cli_args()
+  if args.benchmark == 'result_assembly':
+    df_benchmark = benchmark_result_assembly(args.sizes, args.include_concat)
+  elif args.benchmark == 'train_throughput':
+    df_benchmark = benchmark_train_throughput(
+        args.workers,
+        args.input,
+        args.num_sessions,
+        args.vocabulary_size,
+        args.session_length,
+    )
+  elif args.benchmark == 'incremental_drift':
+    df_benchmark = benchmark_incremental_drift(
+        args.delta_fraction,
+        args.input,
+        args.num_sessions,
+        args.vocabulary_size,
+        args.session_length,
+    )
+  elif args.benchmark == 'ann_recall':
+    df_benchmark = benchmark_ann_recall(
+        args.num_items,
+        args.vector_size,
+        args.clusters,
+        args.probes,
+    )
+  elif args.benchmark == 'corpus_memory':
+    df_benchmark = benchmark_corpus_memory(
+        args.input,
+        args.num_sessions,
+        args.vocabulary_size,
+        args.session_length,
+    )
+  elif args.benchmark == 'preprocessing':
+    df_benchmark = benchmark_preprocessing(
+        args.input,
+        args.num_sessions,
+        args.vocabulary_size,
+        args.session_length,
+    )
+  elif args.benchmark == 'output_format':
+    df_benchmark = benchmark_output_format(
+        args.num_rows,
+        args.vocabulary_size,
+    )
+  elif args.benchmark == 'serving_latency':
+    df_benchmark = benchmark_serving_latency(
+        args.url,
+        args.num_requests,
+        args.concurrency,
+        args.num_items,
+        args.vector_size,
+    )
+  elif args.benchmark == 'parallel_scoring':
+    df_benchmark = benchmark_parallel_scoring(
+        args.num_items,
+        args.vector_size,
+        args.workers,
+    )
+  elif args.benchmark == 'quantized_scoring':
+    df_benchmark = benchmark_quantized_scoring(
+        args.num_items,
+        args.vector_size,
+        args.rerank_candidates,
+    )
+  print(df_benchmark.to_string(index=False))
+
+
+if __name__ == '__main__':
+  main()
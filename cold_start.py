@@ -0,0 +1,201 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for embedding cold-start content ids from their content data.
+
+Content ids that are new or below min_count have no word2vec vector. They are
+embedded from the words of their title and URL path instead: every content id
+in the content data gets a hashed TF-IDF vector of words and character
+trigrams, and a cold content id is projected into the word2vec space as the
+text-similarity weighted mean of the vectors of its most similar warm content
+ids.
+"""
+
+import logging
+from typing import List, Sequence, Tuple
+import zlib
+
+import constants
+import gensim
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+_DEFAULT_NUM_FEATURES = 2 ** 20
+_CHAR_NGRAM = 3
+# Scheme and host of URLs, which every content id of a site shares.
+_URL_HOST_PATTERN = r'[a-z][a-z0-9+.-]*://[^/\s]*'
+_WORD_PATTERN = r'[a-z0-9]+'
+
+
+def content_words(df_content: pd.DataFrame) -> pd.Series:
+  """Splits the content data of each content id into lowercase words.
+
+  Args:
+    df_content: A DataFrame of content data with content id, content title
+      and content URL. Every column after the content id is used as text.
+
+  Returns:
+    A series of lists of words, one per row of df_content.
+  """
+  text = pd.Series('', index=df_content.index)
+  for column in df_content.columns[1:]:
+    text = text + ' ' + df_content[column].fillna('').astype(str)
+  return (text.str.lower()
+          .str.replace(_URL_HOST_PATTERN, ' ', regex=True)
+          .str.findall(_WORD_PATTERN))
+
+
+def _features(words: Sequence[str]) -> List[str]:
+  """Returns words and the character n-grams of the words."""
+  features = list(words)
+  for word in words:
+    padded = f'<{word}>'
+    features.extend(padded[i:i + _CHAR_NGRAM]
+                    for i in range(len(padded) - _CHAR_NGRAM + 1))
+  return features
+
+
+def hashed_tfidf(
+    word_lists: Sequence[Sequence[str]],
+    num_features: int = _DEFAULT_NUM_FEATURES,
+) -> sparse.csr_matrix:
+  """Builds L2-normalized TF-IDF vectors of hashed words and n-grams.
+
+  Features are hashed with CRC32, so the vectors do not depend on the Python
+  hash seed. Term frequencies are sublinear, 1 + log(tf).
+
+  Args:
+    word_lists: Words of each document.
+    num_features: A number of hash buckets.
+
+  Returns:
+    A float32 sparse matrix with one unit length row per document, or a zero
+    row for a document without words.
+  """
+  lengths = []
+  columns = []
+  for words in word_lists:
+    features = _features(words)
+    lengths.append(len(features))
+    columns.extend(zlib.crc32(feature.encode('utf-8')) % num_features
+                   for feature in features)
+
+  rows = np.repeat(np.arange(len(lengths)), lengths)
+  counts = sparse.csr_matrix(
+      (np.ones(len(columns), dtype=np.float32), (rows, columns)),
+      shape=(len(lengths), num_features))
+  counts.sum_duplicates()
+  counts.data = 1 + np.log(counts.data)
+
+  document_frequencies = np.bincount(counts.indices, minlength=num_features)
+  idf = (np.log((1 + len(lengths)) / (1 + document_frequencies)) + 1).astype(
+      np.float32)
+  tfidf = sparse.csr_matrix(counts.multiply(idf[np.newaxis, :]))
+  norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+  return sparse.csr_matrix(sparse.diags(
+      1 / np.where(norms == 0, 1.0, norms)).dot(tfidf), dtype=np.float32)
+
+
+def project_to_anchors(
+    tfidf: sparse.csr_matrix,
+    anchor_tfidf: sparse.csr_matrix,
+    anchor_vectors: np.ndarray,
+    num_neighbours: int,
+    block_size: int = constants.BLOCK_SIZE,
+) -> Tuple[np.ndarray, np.ndarray]:
+  """Projects TF-IDF vectors into an embedding space through anchors.
+
+  Each row becomes the mean of the anchor_vectors of its num_neighbours most
+  text-similar anchors, weighted by cosine similarity. Rows are processed in
+  blocks with one sparse matrix product each.
+
+  Args:
+    tfidf: Unit length TF-IDF vectors to project.
+    anchor_tfidf: Unit length TF-IDF vectors of the anchors.
+    anchor_vectors: A 2-D array of unit length embedding vectors of the
+      anchors.
+    num_neighbours: A number of most similar anchors to average.
+    block_size: A number of rows projected at once.
+
+  Returns:
+    A tuple of (has_vector, vectors). has_vector is a boolean array, False
+    for rows without words in common with any anchor. vectors is a float32
+    array of unit length embedding vectors of the rows with has_vector.
+  """
+  num_rows = tfidf.shape[0]
+  k = min(num_neighbours, anchor_tfidf.shape[0])
+  if k == 0:
+    return (np.zeros(num_rows, dtype=bool),
+            np.empty((0, anchor_vectors.shape[1]), dtype=np.float32))
+
+  anchor_tfidf_t = anchor_tfidf.T.tocsr()
+  vectors = np.zeros((num_rows, anchor_vectors.shape[1]), dtype=np.float32)
+  for start in range(0, num_rows, block_size):
+    stop = min(start + block_size, num_rows)
+    similarities = (tfidf[start:stop] @ anchor_tfidf_t).toarray()
+    neighbours = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    weights = np.take_along_axis(similarities, neighbours, axis=1)
+    vectors[start:stop] = np.einsum('ij,ijk->ik', weights,
+                                    anchor_vectors[neighbours])
+
+  norms = np.linalg.norm(vectors, axis=1)
+  has_vector = norms > 0
+  return has_vector, vectors[has_vector] / norms[has_vector, np.newaxis]
+
+
+def embed_cold_items(
+    df_content: pd.DataFrame,
+    keyed_vectors: gensim.models.KeyedVectors,
+    num_neighbours: int,
+    num_features: int = _DEFAULT_NUM_FEATURES,
+    block_size: int = constants.BLOCK_SIZE,
+) -> Tuple[np.ndarray, np.ndarray]:
+  """Embeds the content ids of content data that have no word2vec vector.
+
+  Args:
+    df_content: A DataFrame of content data with content id, content title
+      and content URL.
+    keyed_vectors: Trained keyed vectors. The content ids of df_content in
+      their vocabulary are the anchors of the projection.
+    num_neighbours: A number of most text-similar warm content ids that the
+      vector of a cold content id is averaged from.
+    num_features: A number of hash buckets of the TF-IDF vectors.
+    block_size: A number of cold content ids projected at once.
+
+  Returns:
+    A tuple of (positions, vectors). positions are the row positions in
+    df_content of the cold content ids that could be embedded, and vectors
+    is a float32 array of their unit length vectors.
+  """
+  indices = pd.Index(keyed_vectors.index_to_key).get_indexer(
+      df_content.iloc[:, 0])
+  is_warm = indices >= 0
+  tfidf = hashed_tfidf(content_words(df_content), num_features)
+
+  keyed_vectors.fill_norms()
+  anchor_indices = indices[is_warm]
+  anchor_norms = keyed_vectors.norms[anchor_indices]
+  anchor_vectors = (keyed_vectors.vectors[anchor_indices]
+                    / np.where(anchor_norms == 0, 1.0,
+                               anchor_norms)[:, np.newaxis])
+  has_vector, vectors = project_to_anchors(
+      tfidf[~is_warm], tfidf[is_warm], anchor_vectors, num_neighbours,
+      block_size)
+
+  positions = np.flatnonzero(~is_warm)[has_vector]
+  logging.info('Embedded %d of %d cold content ids from content data.',
+               len(positions), np.count_nonzero(~is_warm))
+  return positions, vectors
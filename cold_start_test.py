@@ -0,0 +1,86 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for cold_start.py."""
+
+import unittest
+
+import cold_start
+import gensim
+import numpy as np
+import pandas as pd
+
+
+_FAKE_DF_CONTENTS = pd.DataFrame({
+    'item': ['SOCKS', 'BACKPACKS', 'NEW_SOCKS', 'NEW_BAGS', 'UNRELATED'],
+    'title': ['Socks | Apparel', 'Backpacks | Bags', 'Wool Socks', None,
+              'Gift cards'],
+    'url': ['https://shop.example.com/Apparel/Socks',
+            'https://shop.example.com/bags/backpacks/',
+            'https://shop.example.com/Apparel/wool+socks',
+            'https://shop.example.com/bags/new',
+            'https://shop.example.com/gift'],
+})
+
+
+def _fake_keyed_vectors():
+  keyed_vectors = gensim.models.KeyedVectors(vector_size=2)
+  keyed_vectors.add_vectors(['SOCKS', 'BACKPACKS', 'CAPS'], np.array([
+      [2.0, 0.0],
+      [0.0, 3.0],
+      [1.0, 1.0],
+  ], dtype=np.float32))
+  return keyed_vectors
+
+
+class ColdStartTest(unittest.TestCase):
+
+  def test_content_words(self):
+    actual = cold_start.content_words(_FAKE_DF_CONTENTS)
+
+    self.assertEqual(actual[0], ['socks', 'apparel', 'apparel', 'socks'])
+    self.assertEqual(actual[3], ['bags', 'new'])
+
+  def test_hashed_tfidf(self):
+    actual = cold_start.hashed_tfidf(
+        [['socks'], ['socks', 'bags'], [], ['socks']], num_features=2 ** 10)
+
+    np.testing.assert_allclose(
+        np.asarray(actual.multiply(actual).sum(axis=1)).ravel(),
+        [1.0, 1.0, 0.0, 1.0], rtol=1e-6)
+    self.assertAlmostEqual((actual[0] @ actual[3].T).toarray()[0, 0], 1.0,
+                           places=5)
+    self.assertLess((actual[0] @ actual[1].T).toarray()[0, 0], 1.0)
+
+  def test_project_to_anchors(self):
+    anchor_tfidf = cold_start.hashed_tfidf([['socks'], ['bags']])
+    tfidf = cold_start.hashed_tfidf([['socks'], ['caps']])
+
+    has_vector, vectors = cold_start.project_to_anchors(
+        tfidf, anchor_tfidf, np.eye(2, dtype=np.float32), num_neighbours=1,
+        block_size=1)
+
+    np.testing.assert_array_equal(has_vector, [True, False])
+    np.testing.assert_allclose(vectors, [[1.0, 0.0]])
+
+  def test_embed_cold_items(self):
+    positions, vectors = cold_start.embed_cold_items(
+        _FAKE_DF_CONTENTS, _fake_keyed_vectors(), num_neighbours=1)
+
+    np.testing.assert_array_equal(positions, [2, 3])
+    np.testing.assert_allclose(vectors, [[1.0, 0.0], [0.0, 1.0]])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -21,9 +21,20 @@ KEYWORD: Final[str] = 'keyword'
 RCM_RESULT: Final[str] = 'rcm_result'
 RANK: Final[str] = 'rank'
 SCORE: Final[str] = 'score'
+# Rank of a row that marks a keyword as deleted in a differential output.
+DELETED_RANK: Final[int] = 0
+
+# Training data related constants.
+USER_ID: Final[str] = 'user_id'
+ITEM_LIST: Final[str] = 'item_list'
 
 # Import output of content recommendations related constants.
 RANK: Final[str] = 'rank'
 SCORE: Final[str] = 'score'
 DELIMITER: Final[str] = ','
 SKIPROWS: Final[str] = 1
+
+# Similarity search related constants.
+TOP_N: Final[int] = 7
+BLOCK_SIZE: Final[int] = 1024
+SCORING_WORKERS: Final[int] = 1
@@ -0,0 +1,222 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Recommendations from windowed co-occurrence of content ids in sessions.
+
+Content ids that appear within window positions of each other in a session
+are counted into a sparse content id x content id matrix, and each content
+id is recommended the content ids with the highest normalized pointwise
+mutual information (NPMI) with it. NPMI is in [-1, 1] like the cosine
+similarity of word2vec vectors, so the two scores can be blended.
+"""
+
+import logging
+
+import constants
+import corpus
+import numpy as np
+import pandas as pd
+import results
+from scipy import sparse
+
+
+_DEFAULT_WINDOW = 5
+_DEFAULT_MIN_PAIR_COUNT = 2
+_EMBEDDING_SCORE = 'embedding_score'
+_COOCCURRENCE_SCORE = 'cooccurrence_score'
+
+
+def cooccurrence_matrix(
+    encoded: corpus.EncodedCorpus,
+    window: int = _DEFAULT_WINDOW,
+) -> sparse.csr_matrix:
+  """Counts pairs of content ids within window positions in a session.
+
+  Each pair is counted in both directions, and pairs of a content id with
+  itself are ignored. The whole corpus is processed with one vectorized pass
+  per distance up to window.
+
+  Args:
+    encoded: An encoded corpus of sessions.
+    window: A maximum distance in a session between co-occurring content
+      ids.
+
+  Returns:
+    A symmetric float32 CSR matrix of pair counts indexed by the ids of
+    encoded.vocabulary.
+  """
+  tokens = np.asarray(encoded.tokens)
+  session_ids = encoded.session_ids()
+  rows = []
+  columns = []
+  for distance in range(1, window + 1):
+    left = tokens[:-distance]
+    right = tokens[distance:]
+    is_pair = (session_ids[:-distance] == session_ids[distance:]) & (
+        left != right)
+    rows.extend([left[is_pair], right[is_pair]])
+    columns.extend([right[is_pair], left[is_pair]])
+
+  rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+  columns = np.concatenate(columns) if columns else np.empty(0,
+                                                             dtype=np.int32)
+  vocabulary_size = len(encoded.vocabulary)
+  counts = sparse.csr_matrix(
+      (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+      shape=(vocabulary_size, vocabulary_size))
+  counts.sum_duplicates()
+  return counts
+
+
+def npmi_matrix(
+    counts: sparse.csr_matrix,
+    min_pair_count: int = _DEFAULT_MIN_PAIR_COUNT,
+) -> sparse.csr_matrix:
+  """Weights pair counts by normalized pointwise mutual information.
+
+  Args:
+    counts: A symmetric CSR matrix of pair counts.
+    min_pair_count: Pairs counted fewer times than this are dropped, since
+      the PMI of rare pairs is noisy.
+
+  Returns:
+    A float32 CSR matrix of the NPMI of the kept pairs.
+  """
+  counts = counts.tocoo()
+  keep = counts.data >= min_pair_count
+  rows, columns, pair_counts = (counts.row[keep], counts.col[keep],
+                                counts.data[keep].astype(np.float64))
+  marginals = np.asarray(counts.sum(axis=1), dtype=np.float64).ravel()
+  total = marginals.sum()
+
+  log_joint = np.log(pair_counts / total) if total else pair_counts
+  pmi = log_joint - np.log(marginals[rows] / total) - np.log(
+      marginals[columns] / total)
+  npmi = np.divide(pmi, -log_joint, out=np.ones_like(pmi),
+                   where=log_joint != 0)
+  return sparse.csr_matrix((npmi.astype(np.float32), (rows, columns)),
+                           shape=counts.shape)
+
+
+def top_n_frame(
+    scores: sparse.csr_matrix,
+    vocabulary: np.ndarray,
+    top_n: int = constants.TOP_N,
+) -> pd.DataFrame:
+  """Builds the top_n entries of each row of a sparse score matrix.
+
+  Rows are ranked with one sort of all stored entries, with ties broken by
+  column id.
+
+  Args:
+    scores: A CSR matrix of scores.
+    vocabulary: Content ids indexed by row and column id.
+    top_n: A number of recommendations per content id.
+
+  Returns:
+    A dataframe with key content id, recommend content id, rank, score.
+  """
+  scores = scores.tocsr()
+  scores.sort_indices()
+  rows = np.repeat(np.arange(scores.shape[0]), np.diff(scores.indptr))
+  order = np.lexsort((scores.indices, -scores.data, rows))
+  ranks = np.arange(len(order)) - scores.indptr[rows[order]] + 1
+  keep = order[ranks <= top_n]
+
+  vocabulary = np.asarray(vocabulary, dtype=object)
+  return results.build_result_frame(
+      vocabulary[rows[keep]],
+      vocabulary[scores.indices[keep]],
+      ranks[ranks <= top_n],
+      scores.data[keep],
+  )
+
+
+def recommend(
+    encoded: corpus.EncodedCorpus,
+    window: int = _DEFAULT_WINDOW,
+    min_pair_count: int = _DEFAULT_MIN_PAIR_COUNT,
+    top_n: int = constants.TOP_N,
+) -> pd.DataFrame:
+  """Recommends the content ids that co-occur most in sessions.
+
+  Args:
+    encoded: An encoded corpus of sessions.
+    window: A maximum distance in a session between co-occurring content
+      ids.
+    min_pair_count: A minimum number of co-occurrences of a recommended pair.
+    top_n: A number of recommendations per content id.
+
+  Returns:
+    A dataframe with key content id, recommend content id, rank, NPMI score.
+  """
+  counts = cooccurrence_matrix(encoded, window)
+  df_result = top_n_frame(npmi_matrix(counts, min_pair_count),
+                          encoded.vocabulary, top_n)
+  logging.info('Computed co-occurrence recommendations of %d pairs for %d '
+               'content ids.', counts.nnz,
+               df_result[constants.KEYWORD].nunique())
+  return df_result
+
+
+def blend_results(
+    df_embedding: pd.DataFrame,
+    df_cooccurrence: pd.DataFrame,
+    weight: float,
+    top_n: int = constants.TOP_N,
+) -> pd.DataFrame:
+  """Re-ranks embedding recommendations with co-occurrence scores.
+
+  The candidates of a content id are the union of its recommendations in
+  both inputs. A candidate scores (1 - weight) * cosine similarity + weight
+  * NPMI, where a score missing from one input counts as 0.
+
+  Args:
+    df_embedding: Recommendations scored by cosine similarity, e.g. from
+      main.sort_recommendation_results.
+    df_cooccurrence: Recommendations scored by NPMI, e.g. from recommend.
+    weight: A weight of the co-occurrence score in [0, 1].
+    top_n: A number of recommendations per content id.
+
+  Returns:
+    A dataframe with key content id, recommend content id, rank, blended
+    score. Content ids are in order of first appearance in df_embedding and
+    then df_cooccurrence.
+  """
+  keys = [constants.KEYWORD, constants.RCM_RESULT]
+  df_merged = pd.merge(
+      df_embedding[keys + [constants.SCORE]].rename(
+          columns={constants.SCORE: _EMBEDDING_SCORE}),
+      df_cooccurrence[keys + [constants.SCORE]].rename(
+          columns={constants.SCORE: _COOCCURRENCE_SCORE}),
+      on=keys, how='outer')
+  scores = ((1 - weight) * df_merged[_EMBEDDING_SCORE].fillna(0).to_numpy()
+            + weight * df_merged[_COOCCURRENCE_SCORE].fillna(0).to_numpy())
+
+  keyword_order = pd.unique(pd.concat([df_embedding[constants.KEYWORD],
+                                       df_cooccurrence[constants.KEYWORD]]))
+  keyword_codes = pd.Index(keyword_order).get_indexer(
+      df_merged[constants.KEYWORD])
+  order = np.lexsort((-scores, keyword_codes))
+  sorted_codes = keyword_codes[order]
+  ranks = np.arange(len(order)) - np.searchsorted(sorted_codes,
+                                                  sorted_codes) + 1
+  keep = order[ranks <= top_n]
+
+  return results.build_result_frame(
+      df_merged[constants.KEYWORD].to_numpy()[keep],
+      df_merged[constants.RCM_RESULT].to_numpy()[keep],
+      ranks[ranks <= top_n],
+      scores[keep],
+  )
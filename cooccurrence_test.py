@@ -0,0 +1,96 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for cooccurrence.py."""
+
+import math
+import unittest
+
+import constants
+import cooccurrence
+import corpus
+import numpy as np
+import pandas as pd
+import results
+
+
+_FAKE_CORPUS = corpus.EncodedCorpus.from_sessions([
+    ['ITEM_A', 'ITEM_B', 'ITEM_C'],
+    ['ITEM_A', 'ITEM_B', 'ITEM_B'],
+    ['ITEM_D'],
+])
+
+
+class CooccurrenceTest(unittest.TestCase):
+
+  def test_cooccurrence_matrix(self):
+    actual = cooccurrence.cooccurrence_matrix(_FAKE_CORPUS, window=1)
+
+    np.testing.assert_array_equal(actual.toarray(), [
+        [0, 2, 0, 0],
+        [2, 0, 1, 0],
+        [0, 1, 0, 0],
+        [0, 0, 0, 0],
+    ])
+
+  def test_cooccurrence_matrix_with_window(self):
+    actual = cooccurrence.cooccurrence_matrix(_FAKE_CORPUS, window=2)
+
+    np.testing.assert_array_equal(actual.toarray(), [
+        [0, 3, 1, 0],
+        [3, 0, 1, 0],
+        [1, 1, 0, 0],
+        [0, 0, 0, 0],
+    ])
+
+  def test_recommend(self):
+    actual = cooccurrence.recommend(_FAKE_CORPUS, window=1, min_pair_count=1)
+
+    self.assertEqual(
+        list(zip(actual[constants.KEYWORD], actual[constants.RCM_RESULT],
+                 actual[constants.RANK])),
+        [('ITEM_A', 'ITEM_B', 1), ('ITEM_B', 'ITEM_A', 1),
+         ('ITEM_B', 'ITEM_C', 2), ('ITEM_C', 'ITEM_B', 1)])
+    np.testing.assert_allclose(
+        actual[constants.SCORE][:3],
+        [math.log(2) / math.log(3), math.log(2) / math.log(3),
+         math.log(2) / math.log(6)], rtol=1e-6)
+
+  def test_recommend_with_min_pair_count_and_top_n(self):
+    actual = cooccurrence.recommend(_FAKE_CORPUS, window=1, min_pair_count=2,
+                                    top_n=1)
+
+    self.assertEqual(actual[constants.RCM_RESULT].tolist(),
+                     ['ITEM_B', 'ITEM_A'])
+
+  def test_blend_results(self):
+    df_embedding = results.build_result_frame(
+        ['ITEM_A', 'ITEM_A', 'ITEM_B'], ['ITEM_B', 'ITEM_C', 'ITEM_A'],
+        [1, 2, 1], [0.9, 0.8, 0.9])
+    df_cooccurrence = results.build_result_frame(
+        ['ITEM_A', 'ITEM_A', 'ITEM_D'], ['ITEM_C', 'ITEM_D', 'ITEM_A'],
+        [1, 2, 1], [0.6, 0.4, 0.5])
+
+    actual = cooccurrence.blend_results(df_embedding, df_cooccurrence,
+                                        weight=0.5, top_n=2)
+
+    pd.testing.assert_frame_equal(actual, results.build_result_frame(
+        ['ITEM_A', 'ITEM_A', 'ITEM_B', 'ITEM_D'],
+        ['ITEM_C', 'ITEM_B', 'ITEM_A', 'ITEM_A'],
+        [1, 2, 1, 1],
+        [0.7, 0.45, 0.45, 0.25]), check_exact=False)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,392 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions and classes for reading training corpora of user sessions."""
+
+import json
+import logging
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import constants
+import error_messages
+import numpy as np
+import pandas as pd
+
+
+SYNTHETIC_NUM_SESSIONS = 100000
+SYNTHETIC_VOCABULARY_SIZE = 10000
+SYNTHETIC_SESSION_LENGTH = 10
+
+_DEFAULT_CHUNK_SIZE = 100000
+_TOKENS_FILE = 'tokens.npy'
+_OFFSETS_FILE = 'offsets.npy'
+_VOCABULARY_FILE = 'vocabulary.npy'
+_SOURCE_FILE = 'source.json'
+
+
+class ItemListCorpus:
+  """A restartable corpus that streams item_list sessions from a CSV file.
+
+  Each iteration re-reads the file in chunks of chunk_size rows, so only one
+  chunk is held in memory at a time. This satisfies the multi-pass corpus
+  contract of `gensim.models.word2vec.Word2Vec`, which iterates over the
+  sentences once to build the vocabulary and once per training epoch.
+  Compression, such as gzip, is inferred from the file extension.
+
+  Example:
+    corpus = ItemListCorpus('sample_input_data.csv')
+    for session in corpus:
+      print(session)  # ['STICKERS', 'DRINKWARE', ...]
+  """
+
+  def __init__(
+      self,
+      path: str,
+      chunk_size: int = _DEFAULT_CHUNK_SIZE,
+      column: str = constants.ITEM_LIST,
+  ) -> None:
+    """Initializes the corpus.
+
+    Args:
+      path: A CSV format file path of training data that the content ID is
+        for each line each user in the order that a certain user saw the
+        content.
+      chunk_size: A number of CSV rows read at once.
+      column: A column name of the comma separated content ids.
+
+    Raises:
+      IOError: if the path is not found.
+      ValueError: if chunk_size is not positive.
+    """
+    if not os.path.exists(path):
+      raise IOError(error_messages.NOT_EXISTS_INPUT_FILE)
+    if chunk_size <= 0:
+      raise ValueError('chunk_size must be positive.')
+    self.path = path
+    self.chunk_size = chunk_size
+    self.column = column
+
+  def __iter__(self) -> Iterator[List[str]]:
+    """Yields each session as a list of content ids."""
+    with pd.read_csv(
+        self.path,
+        usecols=[self.column],
+        dtype={self.column: str},
+        chunksize=self.chunk_size,
+        compression='infer',
+    ) as reader:
+      for chunk in reader:
+        for item_list in chunk[self.column].dropna():
+          yield item_list.split(constants.DELIMITER)
+
+
+class EncodedCorpus:
+  """A compact corpus of sessions encoded as integer content ids.
+
+  The sessions are stored in CSR layout: one flat int32 array of token ids
+  and an int64 array of offsets, where session i is
+  tokens[offsets[i]:offsets[i + 1]]. A global vocabulary maps the ids back to
+  content ids in first-seen order. Compared with lists of Python strings this
+  cuts the memory of the corpus several-fold, and a saved corpus reloads
+  instantly with memory-mapped arrays.
+
+  Iterating yields sessions as lists of content ids, so the corpus can be
+  passed directly to word2vec.
+
+  Example:
+    encoded = EncodedCorpus.from_csv('sample_input_data.csv')
+    encoded.save('corpus_dir')
+    encoded = EncodedCorpus.load('corpus_dir')
+  """
+
+  def __init__(
+      self,
+      vocabulary: Sequence[str],
+      tokens: np.ndarray,
+      offsets: np.ndarray,
+  ) -> None:
+    """Initializes the corpus.
+
+    Args:
+      vocabulary: Content ids indexed by their integer id.
+      tokens: A 1-D int32 array of the integer ids of all sessions.
+      offsets: A 1-D int64 array of len(sessions) + 1 session boundaries.
+    """
+    self.vocabulary = np.asarray(vocabulary, dtype=object)
+    self.tokens = tokens
+    self.offsets = offsets
+
+  def __len__(self) -> int:
+    """Returns the number of sessions."""
+    return len(self.offsets) - 1
+
+  def __iter__(self) -> Iterator[List[str]]:
+    """Yields each session as a list of content ids."""
+    for start, stop in zip(self.offsets[:-1], self.offsets[1:]):
+      yield self.vocabulary[self.tokens[start:stop]].tolist()
+
+  def session(self, index: int) -> np.ndarray:
+    """Returns the integer ids of one session."""
+    return self.tokens[self.offsets[index]:self.offsets[index + 1]]
+
+  def session_ids(self) -> np.ndarray:
+    """Returns the session index of every token."""
+    return np.repeat(np.arange(len(self), dtype=np.int64),
+                     np.diff(self.offsets))
+
+  @classmethod
+  def from_sessions(
+      cls,
+      training_data: Iterable[Sequence[str]],
+  ) -> 'EncodedCorpus':
+    """Encodes sessions of content ids.
+
+    Args:
+      training_data: An iterable of sessions as lists of content ids.
+
+    Returns:
+      An encoded corpus.
+    """
+    key_to_index = {}
+    tokens = []
+    lengths = []
+    for session in training_data:
+      tokens.extend(key_to_index.setdefault(item, len(key_to_index))
+                    for item in session)
+      lengths.append(len(session))
+    return cls(list(key_to_index),
+               np.asarray(tokens, dtype=np.int32),
+               np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]))
+
+  @classmethod
+  def from_csv(
+      cls,
+      path: str,
+      chunk_size: int = _DEFAULT_CHUNK_SIZE,
+      column: str = constants.ITEM_LIST,
+  ) -> 'EncodedCorpus':
+    """Encodes the item_list column of a CSV file chunk by chunk.
+
+    Each chunk is split and mapped to integer ids with vectorized pandas
+    operations, so only one chunk of strings is held in memory at a time.
+
+    Args:
+      path: A CSV format file path of training data. Compression is inferred
+        from the file extension.
+      chunk_size: A number of CSV rows read at once.
+      column: A column name of the comma separated content ids.
+
+    Returns:
+      An encoded corpus.
+
+    Raises:
+      IOError: if the path is not found.
+    """
+    if not os.path.exists(path):
+      raise IOError(error_messages.NOT_EXISTS_INPUT_FILE)
+    key_to_index: Dict[str, int] = {}
+    token_chunks = [np.empty(0, dtype=np.int32)]
+    length_chunks = [np.empty(0, dtype=np.int64)]
+    with pd.read_csv(
+        path,
+        usecols=[column],
+        dtype={column: str},
+        chunksize=chunk_size,
+        compression='infer',
+    ) as reader:
+      for chunk in reader:
+        item_lists = chunk[column].dropna()
+        items = item_lists.str.split(constants.DELIMITER).explode()
+        for item in pd.unique(items[~items.isin(key_to_index)]):
+          key_to_index[item] = len(key_to_index)
+        token_chunks.append(items.map(key_to_index).to_numpy(np.int32))
+        length_chunks.append(
+            item_lists.str.count(constants.DELIMITER).to_numpy(np.int64) + 1)
+
+    offsets = np.concatenate([[0], np.cumsum(np.concatenate(length_chunks))])
+    encoded = cls(list(key_to_index), np.concatenate(token_chunks), offsets)
+    logging.info('Encoded %d sessions with %d tokens and %d content ids.',
+                 len(encoded), len(encoded.tokens), len(key_to_index))
+    return encoded
+
+  def save(self, path: str, source_path: Optional[str] = None) -> None:
+    """Saves the corpus as .npy files in a directory.
+
+    Args:
+      path: A directory path to save the corpus.
+      source_path: A file path of the CSV the corpus was encoded from. Its
+        size and modification time are recorded so that load_or_encode can
+        detect a stale corpus.
+    """
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, _TOKENS_FILE), self.tokens)
+    np.save(os.path.join(path, _OFFSETS_FILE), self.offsets)
+    np.save(os.path.join(path, _VOCABULARY_FILE),
+            np.asarray(self.vocabulary, dtype=str))
+    with open(os.path.join(path, _SOURCE_FILE), 'w', encoding='utf-8') as f:
+      json.dump(_source_signature(source_path), f)
+
+  @classmethod
+  def load(cls, path: str, mmap_mode: Optional[str] = 'r') -> 'EncodedCorpus':
+    """Loads a corpus saved by save.
+
+    Args:
+      path: A directory path of the saved corpus.
+      mmap_mode: A memory map mode of the token and offset arrays, or None to
+        load them into memory.
+
+    Returns:
+      A loaded corpus.
+
+    Raises:
+      IOError: if the path is not found.
+    """
+    if not os.path.exists(os.path.join(path, _TOKENS_FILE)):
+      raise IOError(error_messages.NOT_EXISTS_INPUT_FILE)
+    return cls(
+        np.load(os.path.join(path, _VOCABULARY_FILE)).tolist(),
+        np.load(os.path.join(path, _TOKENS_FILE), mmap_mode=mmap_mode),
+        np.load(os.path.join(path, _OFFSETS_FILE), mmap_mode=mmap_mode),
+    )
+
+
+def _source_signature(source_path: Optional[str]) -> Dict[str, object]:
+  """Returns the path, size and modification time of a source file."""
+  if source_path is None:
+    return {}
+  stat = os.stat(source_path)
+  return {'path': os.path.abspath(source_path), 'size': stat.st_size,
+          'mtime': stat.st_mtime}
+
+
+def load_or_encode(
+    encoded_path: str,
+    source_path: str,
+    chunk_size: int = _DEFAULT_CHUNK_SIZE,
+) -> EncodedCorpus:
+  """Loads an encoded corpus, encoding and saving it first if needed.
+
+  The saved corpus is reused only if it was encoded from source_path with the
+  same size and modification time.
+
+  Args:
+    encoded_path: A directory path of the encoded corpus.
+    source_path: A CSV format file path of training data.
+    chunk_size: A number of CSV rows read at once when encoding.
+
+  Returns:
+    An encoded corpus with memory-mapped arrays.
+  """
+  source_file = os.path.join(encoded_path, _SOURCE_FILE)
+  if os.path.exists(source_file):
+    with open(source_file, encoding='utf-8') as f:
+      if json.load(f) == _source_signature(source_path):
+        logging.info('Loaded encoded corpus from %s.', encoded_path)
+        return EncodedCorpus.load(encoded_path)
+
+  EncodedCorpus.from_csv(source_path, chunk_size).save(encoded_path,
+                                                       source_path)
+  return EncodedCorpus.load(encoded_path)
+
+
+def synthetic_corpus(
+    num_sessions: int,
+    vocabulary_size: int,
+    session_length: int,
+    seed: int = 0,
+) -> EncodedCorpus:
+  """Generates an encoded corpus of sessions with a long tail popularity.
+
+  Sessions are generated directly as integer ids, so corpora of tens of
+  millions of sessions fit in memory.
+
+  Args:
+    num_sessions: A number of sessions.
+    vocabulary_size: A number of distinct content ids.
+    session_length: A mean number of content ids per session.
+    seed: A seed for the random number generator.
+
+  Returns:
+    An encoded corpus of content ids ITEM_0 to ITEM_{vocabulary_size - 1}.
+  """
+  rng = np.random.default_rng(seed)
+  popularity = 1.0 / np.arange(1, vocabulary_size + 1)
+  popularity /= popularity.sum()
+  lengths = np.maximum(rng.poisson(session_length, num_sessions), 2)
+  tokens = rng.choice(vocabulary_size, lengths.sum(),
+                      p=popularity).astype(np.int32)
+  return EncodedCorpus(
+      [f'ITEM_{i}' for i in range(vocabulary_size)],
+      tokens,
+      np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]),
+  )
+
+
+def synthetic_sessions(
+    num_sessions: int,
+    vocabulary_size: int,
+    session_length: int,
+    seed: int = 0,
+) -> List[List[str]]:
+  """Generates sessions of content ids with a long tail popularity.
+
+  Args:
+    num_sessions: A number of sessions.
+    vocabulary_size: A number of distinct content ids.
+    session_length: A mean number of content ids per session.
+    seed: A seed for the random number generator.
+
+  Returns:
+    A list of sessions as lists of content ids.
+  """
+  return list(synthetic_corpus(num_sessions, vocabulary_size, session_length,
+                               seed))
+
+
+def write_line_sentence_file(
+    training_data: Iterable[Sequence[str]],
+    path: str,
+) -> int:
+  """Writes sessions into a LineSentence format file.
+
+  The file has one session per line with content ids separated by a single
+  space, which is the format of gensim's corpus_file training mode. Content
+  ids must not be empty or contain whitespace, as gensim would split them
+  into different content ids.
+
+  Args:
+    training_data: An iterable of sessions as lists of content ids.
+    path: A file path to write.
+
+  Returns:
+    A number of content ids written.
+
+  Raises:
+    ValueError: A content id is empty or contains whitespace.
+  """
+  num_words = 0
+  with open(path, 'w', encoding='utf-8') as f:
+    for session in training_data:
+      line = ' '.join(session)
+      if len(line.split()) != len(session):
+        invalid = next(item for item in session
+                       if not item or item.split() != [item])
+        raise ValueError(
+            f'Content id {invalid!r} is empty or contains whitespace.')
+      f.write(line)
+      f.write('\n')
+      num_words += len(session)
+
+  return num_words
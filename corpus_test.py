@@ -0,0 +1,173 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for corpus.py."""
+
+import os
+import tempfile
+import unittest
+
+from absl.testing import parameterized
+import corpus
+import numpy as np
+import pandas as pd
+
+
+_FAKE_DF_TRAINING = pd.DataFrame({
+    'user_id': ['user_a', 'user_b', 'user_c'],
+    'item_list': ['ITEM_A,ITEM_B,ITEM_C', 'ITEM_B', 'ITEM_C,ITEM_A'],
+    'cnt': [3, 1, 2],
+})
+_FAKE_SESSIONS = [['ITEM_A', 'ITEM_B', 'ITEM_C'],
+                  ['ITEM_B'],
+                  ['ITEM_C', 'ITEM_A']]
+_FAKE_WRONG_FILEPATH = '/faile_file_path'
+
+
+class ItemListCorpusTest(parameterized.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    self.temp_dir = temp_dir.name
+
+  @parameterized.named_parameters([
+      {'testcase_name': 'plain_csv', 'file_name': 'input.csv'},
+      {'testcase_name': 'gzip_csv', 'file_name': 'input.csv.gz'},
+  ])
+  def test_iter_yields_sessions(self, file_name):
+    path = os.path.join(self.temp_dir, file_name)
+    _FAKE_DF_TRAINING.to_csv(path, index=False)
+
+    actual = list(corpus.ItemListCorpus(path, chunk_size=2))
+
+    self.assertEqual(actual, _FAKE_SESSIONS)
+
+  def test_iter_is_restartable(self):
+    path = os.path.join(self.temp_dir, 'input.csv')
+    _FAKE_DF_TRAINING.to_csv(path, index=False)
+    training_data = corpus.ItemListCorpus(path, chunk_size=1)
+
+    self.assertEqual(list(training_data), list(training_data))
+
+  def test_init_with_failure_wrong_file_path(self):
+    with self.assertRaisesRegex(IOError, 'The input file dose not exist.'):
+      corpus.ItemListCorpus(_FAKE_WRONG_FILEPATH)
+
+  def test_init_with_failure_invalid_chunk_size(self):
+    path = os.path.join(self.temp_dir, 'input.csv')
+    _FAKE_DF_TRAINING.to_csv(path, index=False)
+
+    with self.assertRaisesRegex(ValueError, 'chunk_size must be positive'):
+      corpus.ItemListCorpus(path, chunk_size=0)
+
+
+class EncodedCorpusTest(parameterized.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    self.temp_dir = temp_dir.name
+    self.input_path = os.path.join(self.temp_dir, 'input.csv')
+    _FAKE_DF_TRAINING.to_csv(self.input_path, index=False)
+
+  def test_from_sessions(self):
+    actual = corpus.EncodedCorpus.from_sessions(_FAKE_SESSIONS)
+
+    self.assertEqual(actual.vocabulary.tolist(),
+                     ['ITEM_A', 'ITEM_B', 'ITEM_C'])
+    np.testing.assert_array_equal(actual.tokens, [0, 1, 2, 1, 2, 0])
+    np.testing.assert_array_equal(actual.offsets, [0, 3, 4, 6])
+    self.assertEqual(actual.tokens.dtype, np.int32)
+    self.assertEqual(list(actual), _FAKE_SESSIONS)
+
+  @parameterized.named_parameters([
+      {'testcase_name': 'one_chunk', 'chunk_size': 100},
+      {'testcase_name': 'many_chunks', 'chunk_size': 1},
+  ])
+  def test_from_csv_matches_from_sessions(self, chunk_size):
+    actual = corpus.EncodedCorpus.from_csv(self.input_path, chunk_size)
+
+    expected = corpus.EncodedCorpus.from_sessions(_FAKE_SESSIONS)
+    self.assertEqual(actual.vocabulary.tolist(), expected.vocabulary.tolist())
+    np.testing.assert_array_equal(actual.tokens, expected.tokens)
+    np.testing.assert_array_equal(actual.offsets, expected.offsets)
+
+  def test_save_and_load(self):
+    encoded = corpus.EncodedCorpus.from_sessions(_FAKE_SESSIONS)
+    path = os.path.join(self.temp_dir, 'encoded')
+
+    encoded.save(path)
+    actual = corpus.EncodedCorpus.load(path)
+
+    self.assertIsInstance(actual.tokens, np.memmap)
+    self.assertEqual(list(actual), _FAKE_SESSIONS)
+    np.testing.assert_array_equal(actual.session(2), [2, 0])
+
+  def test_load_or_encode_reencodes_stale_corpus(self):
+    path = os.path.join(self.temp_dir, 'encoded')
+    corpus.load_or_encode(path, self.input_path)
+    _FAKE_DF_TRAINING.iloc[:1].to_csv(self.input_path, index=False)
+
+    actual = corpus.load_or_encode(path, self.input_path)
+
+    self.assertEqual(list(actual), _FAKE_SESSIONS[:1])
+
+  def test_load_with_failure_wrong_file_path(self):
+    with self.assertRaisesRegex(IOError, 'The input file dose not exist.'):
+      corpus.EncodedCorpus.load(_FAKE_WRONG_FILEPATH)
+
+
+class SyntheticCorpusTest(unittest.TestCase):
+
+  def test_synthetic_corpus(self):
+    actual = corpus.synthetic_corpus(100, 20, 5)
+
+    self.assertEqual(len(actual.vocabulary), 20)
+    self.assertEqual(len(actual.offsets), 101)
+    self.assertGreaterEqual(np.diff(actual.offsets).min(), 2)
+    self.assertLess(actual.tokens.max(), 20)
+
+  def test_synthetic_sessions_is_deterministic(self):
+    self.assertEqual(corpus.synthetic_sessions(10, 20, 5, seed=1),
+                     corpus.synthetic_sessions(10, 20, 5, seed=1))
+
+
+class WriteLineSentenceFileTest(unittest.TestCase):
+
+  def test_write_line_sentence_file(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    path = os.path.join(temp_dir.name, 'corpus.txt')
+
+    num_words = corpus.write_line_sentence_file(_FAKE_SESSIONS, path)
+
+    with open(path, encoding='utf-8') as f:
+      self.assertEqual(f.read(),
+                       'ITEM_A ITEM_B ITEM_C\nITEM_B\nITEM_C ITEM_A\n')
+    self.assertEqual(num_words, 6)
+
+  def test_write_line_sentence_file_with_failure_whitespace(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    path = os.path.join(temp_dir.name, 'corpus.txt')
+
+    with self.assertRaisesRegex(ValueError, "'ITEM B' is empty or contains"):
+      corpus.write_line_sentence_file([['ITEM_A'], ['ITEM_A', 'ITEM B']], path)
+
+
+if __name__ == '__main__':
+  unittest.main()
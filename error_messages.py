@@ -19,3 +19,9 @@ from typing import Final
 NOT_EXISTS_INPUT_FILE: Final[str] = (
     'The input file dose not exist.'
 )
+NOT_EXISTS_MODEL_FILE: Final[str] = (
+    'The model file dose not exist.'
+)
+NOT_INSTALLED_FIRESTORE: Final[str] = (
+    'google-cloud-firestore is not installed.'
+)
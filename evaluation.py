@@ -0,0 +1,313 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Offline evaluation of recommendation quality and pipeline speed.
+
+The last content id of each session is held out, word2vec is trained on the
+rest, and the item-to-item recommendations of the content id before it are
+checked for the held-out one. The train, score and write stages are timed,
+and with --trace_memory their peak traced memory is recorded as well.
+Tracing slows the stages down, so their times are only comparable between
+runs without it.
+
+Run from project's root directory.
+
+Example:
+  `python evaluation.py -i sample_input_data.csv`
+  `python evaluation.py --num_sessions 10000000 --vocabulary_size 100000`
+  `python evaluation.py -i sample_input_data.csv --window 3 --negative 10`
+  `python evaluation.py -i sample_input_data.csv --trace_memory`
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+from typing import NamedTuple, Optional, Tuple
+
+import constants
+import corpus
+import instrumentation
+import main as pipeline
+import numpy as np
+import pandas as pd
+
+
+STAGE_TRAIN = 'train'
+STAGE_SCORE = 'score'
+STAGE_WRITE = 'write'
+
+logging.basicConfig(
+    format='%(asctime)s %(message)s',
+    datefmt='%m/%d/%Y %I:%M:%S %p',
+    level=logging.INFO,
+)
+
+
+class EvaluationReport(NamedTuple):
+  """Quality of recommendations against held-out content ids.
+
+  Attributes:
+    num_sessions: A number of evaluated sessions with at least two content
+      ids.
+    top_n: A number of recommendations per content id, the K of the metrics.
+    hit_rate: HitRate@K, the fraction of sessions whose held-out content id
+      is recommended for the content id before it.
+    mrr: Mean reciprocal rank of the held-out content id, counting 0 when it
+      is not recommended.
+    coverage: Catalog coverage, the fraction of content ids in the corpus
+      that are recommended for at least one content id.
+  """
+  num_sessions: int
+  top_n: int
+  hit_rate: float
+  mrr: float
+  coverage: float
+
+
+class StageStats(NamedTuple):
+  """Cost of one pipeline stage.
+
+  Attributes:
+    stage: A name of the stage.
+    seconds: Wall time in seconds.
+    peak_bytes: Peak memory allocated during the stage as traced by
+      tracemalloc, which includes NumPy arrays, or None if memory was not
+      traced.
+  """
+  stage: str
+  seconds: float
+  peak_bytes: Optional[int]
+
+
+def _stage_stats(record: instrumentation.StageRecord) -> StageStats:
+  """Returns the StageStats of a stage."""
+  return StageStats(record.stage, record.wall_seconds,
+                    record.peak_traced_bytes)
+
+
+def holdout_last_items(
+    encoded: corpus.EncodedCorpus,
+) -> Tuple[corpus.EncodedCorpus, np.ndarray, np.ndarray]:
+  """Holds out the last content id of every session.
+
+  Args:
+    encoded: An encoded corpus of sessions.
+
+  Returns:
+    A tuple of (training corpus, query ids, target ids). The training corpus
+    has every session without its last content id. For each session with at
+    least two content ids, the query id is the second to last content id and
+    the target id is the held-out one. Ids index encoded.vocabulary.
+  """
+  lengths = np.diff(encoded.offsets)
+  last = encoded.offsets[1:][lengths > 0] - 1
+  keep = np.ones(len(encoded.tokens), dtype=bool)
+  keep[last] = False
+  train_lengths = np.maximum(lengths - 1, 0)
+  train = corpus.EncodedCorpus(
+      encoded.vocabulary,
+      np.asarray(encoded.tokens)[keep],
+      np.concatenate([[0], np.cumsum(train_lengths, dtype=np.int64)]),
+  )
+  evaluable = encoded.offsets[1:][lengths >= 2] - 1
+  return (train, np.asarray(encoded.tokens[evaluable - 1]),
+          np.asarray(encoded.tokens[evaluable]))
+
+
+def evaluate_recommendations(
+    df_result: pd.DataFrame,
+    vocabulary: np.ndarray,
+    queries: np.ndarray,
+    targets: np.ndarray,
+) -> EvaluationReport:
+  """Computes HitRate@K, MRR and catalog coverage of recommendations.
+
+  Args:
+    df_result: A dataframe with key content id, recommend content id, rank,
+      score, e.g. from main.sort_recommendation_results.
+    vocabulary: Content ids of the corpus indexed by their integer id.
+    queries: Ids of the content id that each session is recommended from.
+    targets: Ids of the held-out content id of each session.
+
+  Returns:
+    An EvaluationReport. Sessions whose query has no recommendations count
+    as misses.
+  """
+  index = pd.Index(vocabulary)
+  top_n = int(df_result[constants.RANK].max()) if len(df_result) else 0
+  recommended = np.full((len(vocabulary), top_n), -1, dtype=np.int64)
+  recommended[index.get_indexer(df_result[constants.KEYWORD]),
+              df_result[constants.RANK].to_numpy() - 1] = index.get_indexer(
+                  df_result[constants.RCM_RESULT])
+
+  matches = recommended[queries] == np.asarray(targets)[:, np.newaxis]
+  is_hit = matches.any(axis=1)
+  reciprocal_ranks = np.where(is_hit, 1.0 / (matches.argmax(axis=1) + 1), 0.0)
+  recommended_ids = np.unique(recommended)
+  num_recommended = np.count_nonzero(recommended_ids >= 0)
+
+  return EvaluationReport(
+      num_sessions=len(queries),
+      top_n=top_n,
+      hit_rate=float(is_hit.mean()) if len(queries) else 0.0,
+      mrr=float(reciprocal_ranks.mean()) if len(queries) else 0.0,
+      coverage=num_recommended / len(vocabulary) if len(vocabulary) else 0.0,
+  )
+
+
+def run_evaluation(
+    encoded: corpus.EncodedCorpus,
+    params: Optional[pipeline.Word2VecParams] = None,
+    scoring_params: Optional[pipeline.ScoringParams] = None,
+    trace_memory: bool = False,
+) -> Tuple[EvaluationReport, pd.DataFrame]:
+  """Trains, scores and writes recommendations on a held-out split.
+
+  Args:
+    encoded: An encoded corpus of sessions.
+    params: Hyperparameters of word2vec. Defaults to
+      main.Word2VecParams().
+    scoring_params: Parameters of the similarity search. Defaults to
+      main.ScoringParams().
+    trace_memory: A flag whether to trace the peak memory of each stage with
+      tracemalloc. Tracing inflates the stage seconds, so leave it off when
+      the seconds are compared.
+
+  Returns:
+    A tuple of the EvaluationReport and a dataframe of StageStats of the
+    train, score and write stages.
+  """
+  scoring_params = scoring_params or pipeline.ScoringParams()
+  train, queries, targets = holdout_last_items(encoded)
+  recorder = instrumentation.RunRecorder()
+  with recorder.stage(STAGE_TRAIN, trace_memory=trace_memory):
+    model = pipeline.execute_embedding_w2v(train, params)
+  df_content = pd.DataFrame({constants.KEYWORD: model.wv.index_to_key})
+  with recorder.stage(STAGE_SCORE, trace_memory=trace_memory):
+    df_result = pipeline.sort_recommendation_results(
+        model, df_content, scoring_params.block_size,
+        num_workers=scoring_params.num_workers)
+  with tempfile.TemporaryDirectory() as temp_dir:
+    with recorder.stage(STAGE_WRITE, trace_memory=trace_memory):
+      df_result.to_csv(os.path.join(temp_dir, 'output.csv'), index=False)
+
+  report = evaluate_recommendations(df_result, encoded.vocabulary, queries,
+                                    targets)
+  logging.info('HitRate@%d %.4f, MRR %.4f and coverage %.4f over %d '
+               'sessions.', report.top_n, report.hit_rate, report.mrr,
+               report.coverage, report.num_sessions)
+
+  return report, pd.DataFrame([_stage_stats(record)
+                                for record in recorder.stages])
+
+
+def parse_cli_args() -> argparse.Namespace:
+  """Parses command line arguments.
+
+  Returns:
+    An instance of argparse.Namespace with arg values.
+  """
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+      '--input', '-i',
+      help='Input data file path. Synthetic sessions are used if omitted.',
+      default=None,
+      type=str,
+      )
+  parser.add_argument(
+      '--num_sessions',
+      help='Number of synthetic sessions.',
+      default=corpus.SYNTHETIC_NUM_SESSIONS,
+      type=int,
+      )
+  parser.add_argument(
+      '--vocabulary_size',
+      help='Number of distinct synthetic content ids.',
+      default=corpus.SYNTHETIC_VOCABULARY_SIZE,
+      type=int,
+      )
+  parser.add_argument(
+      '--session_length',
+      help='Mean number of content ids per synthetic session.',
+      default=corpus.SYNTHETIC_SESSION_LENGTH,
+      type=int,
+      )
+  parser.add_argument(
+      '--block_size', '-b',
+      help='Number of content ids scored at once.',
+      default=constants.BLOCK_SIZE,
+      type=int,
+      )
+  parser.add_argument(
+      '--trace_memory', '-tm',
+      help=('Whether to trace the peak memory of each stage, which slows the '
+            'stages down.'),
+      default=False,
+      action=argparse.BooleanOptionalAction,
+      )
+  parser.add_argument(
+      '--scoring_workers', '-sw',
+      help='Number of processes scoring shards of content ids.',
+      default=constants.SCORING_WORKERS,
+      type=int,
+      )
+  defaults = pipeline.Word2VecParams()
+  for field in ('sg', 'window', 'min_count', 'vector_size', 'hs', 'negative',
+                'seed', 'workers', 'epochs', 'max_vocab', 'max_memory_mb'):
+    parser.add_argument(
+        f'--{field}',
+        help=f'Word2vec {field} parameter.',
+        default=getattr(defaults, field),
+        type=int,
+        )
+
+  return parser.parse_args()
+
+
+def main() -> None:
+  """Runs the evaluation and prints the metrics and stage costs."""
+  args = parse_cli_args()
+  if args.input is None:
+    encoded = corpus.synthetic_corpus(args.num_sessions,
+                                      args.vocabulary_size,
+                                      args.session_length)
+  else:
+    encoded = corpus.EncodedCorpus.from_csv(args.input)
+  params = pipeline.Word2VecParams(
+      sg=args.sg,
+      window=args.window,
+      min_count=args.min_count,
+      vector_size=args.vector_size,
+      hs=args.hs,
+      negative=args.negative,
+      seed=args.seed,
+      workers=args.workers,
+      epochs=args.epochs,
+      max_vocab=args.max_vocab,
+      max_memory_mb=args.max_memory_mb,
+  )
+  scoring_params = pipeline.ScoringParams(
+      block_size=args.block_size,
+      num_workers=args.scoring_workers,
+  )
+
+  report, df_stages = run_evaluation(encoded, params, scoring_params,
+                                     args.trace_memory)
+  print(pd.DataFrame([report]).to_string(index=False))
+  print(df_stages.to_string(index=False))
+
+
+if __name__ == '__main__':
+  main()
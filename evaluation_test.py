@@ -0,0 +1,85 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for evaluation.py."""
+
+import unittest
+
+import corpus
+import evaluation
+import main as pipeline
+import numpy as np
+import results
+
+
+_FAKE_CORPUS = corpus.EncodedCorpus.from_sessions([
+    ['ITEM_A', 'ITEM_B', 'ITEM_C'],
+    ['ITEM_D'],
+    ['ITEM_C', 'ITEM_A'],
+])
+
+
+class EvaluationTest(unittest.TestCase):
+
+  def test_holdout_last_items(self):
+    train, queries, targets = evaluation.holdout_last_items(_FAKE_CORPUS)
+
+    self.assertEqual(list(train), [['ITEM_A', 'ITEM_B'], [], ['ITEM_C']])
+    np.testing.assert_array_equal(_FAKE_CORPUS.vocabulary[queries],
+                                  ['ITEM_B', 'ITEM_C'])
+    np.testing.assert_array_equal(_FAKE_CORPUS.vocabulary[targets],
+                                  ['ITEM_C', 'ITEM_A'])
+
+  def test_evaluate_recommendations(self):
+    df_result = results.build_result_frame(
+        ['ITEM_B', 'ITEM_B', 'ITEM_C', 'ITEM_C'],
+        ['ITEM_A', 'ITEM_C', 'ITEM_B', 'ITEM_D'],
+        [1, 2, 1, 2],
+        [0.9, 0.8, 0.7, 0.6],
+    )
+    _, queries, targets = evaluation.holdout_last_items(_FAKE_CORPUS)
+
+    actual = evaluation.evaluate_recommendations(
+        df_result, _FAKE_CORPUS.vocabulary, queries, targets)
+
+    self.assertEqual(actual, evaluation.EvaluationReport(
+        num_sessions=2, top_n=2, hit_rate=0.5, mrr=0.25, coverage=1.0))
+
+  def test_run_evaluation(self):
+    encoded = corpus.synthetic_corpus(200, 20, 5)
+
+    report, df_stages = evaluation.run_evaluation(
+        encoded, pipeline.Word2VecParams(min_count=1, vector_size=8,
+                                         workers=1, epochs=1))
+
+    self.assertEqual(report.num_sessions, 200)
+    self.assertEqual(report.top_n, 7)
+    self.assertGreaterEqual(report.hit_rate, report.mrr)
+    self.assertGreater(report.coverage, 0.0)
+    self.assertEqual(list(df_stages['stage']), ['train', 'score', 'write'])
+    self.assertTrue(df_stages['peak_bytes'].isna().all())
+
+  def test_run_evaluation_with_trace_memory(self):
+    encoded = corpus.synthetic_corpus(200, 20, 5)
+
+    _, df_stages = evaluation.run_evaluation(
+        encoded, pipeline.Word2VecParams(min_count=1, vector_size=8,
+                                         workers=1, epochs=1),
+        trace_memory=True)
+
+    self.assertTrue((df_stages['peak_bytes'] > 0).all())
+
+
+if __name__ == '__main__':
+  unittest.main()
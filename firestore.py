@@ -17,14 +17,32 @@
 Run Firestore functions from project's root directory.
 
 Example:
-  `python firestore.py -i [Input data path]`
+  `python firestore.py -i [Input data path] -p [Project id] -col [Collection]`
+  `python firestore.py -i [Input data path] -p [Project id] -col [Collection]
+  --emulator_host localhost:8080`
 """
 
+import argparse
+from concurrent import futures
+import logging
 import os
+import random
+import time
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, NamedTuple,
+                    Optional, Sequence, Tuple, Type)
 
 import constants
 import error_messages
 import numpy as np
+import pandas as pd
+import results
+
+try:
+  from google.api_core import exceptions as api_exceptions  # pylint: disable=g-import-not-at-top
+  from google.cloud import firestore as firestore_client  # pylint: disable=g-import-not-at-top
+except ImportError:
+  api_exceptions = None
+  firestore_client = None
 
 
 _CSV_INPUT_DTYPES = np.dtype([
@@ -33,13 +51,98 @@ _CSV_INPUT_DTYPES = np.dtype([
     (constants.RANK, 'i2'),
     (constants.SCORE, 'f4'),
 ])
+_CHUNK_SIZE = 100000
+
+_BATCH_SIZE = 500
+_MAX_WORKERS = 8
+_MAX_RETRIES = 5
+_INITIAL_BACKOFF_SECONDS = 1.0
+_MAX_BACKOFF_SECONDS = 32.0
+_NPZ_EXTENSION = '.npz'
+_EMULATOR_HOST_ENV = 'FIRESTORE_EMULATOR_HOST'
+_DOCUMENT_ID_ESCAPES = (('%', '%25'), ('/', '%2F'))
+_RESERVED_DOCUMENT_IDS = {'.': '%2E', '..': '%2E%2E'}
+
+Document = Tuple[str, Optional[Dict[str, List[Any]]]]
+
+
+class WriteReport(NamedTuple):
+  """Summary of documents written to Firestore.
+
+  Attributes:
+    num_documents: A number of documents written or deleted.
+    num_deleted: A number of documents deleted.
+    num_batches: A number of committed batches.
+    num_retries: A number of batch commits that were retried.
+    seconds: Wall time in seconds of the whole write.
+    documents_per_second: Write throughput.
+  """
+  num_documents: int
+  num_deleted: int
+  num_batches: int
+  num_retries: int
+  seconds: float
+  documents_per_second: float
+
+
+def _frame_to_np_array(df_chunk: pd.DataFrame) -> np.ndarray:
+  """Converts a chunk of csv data to a structured array."""
+  rcm_output_data = np.empty(len(df_chunk), dtype=_CSV_INPUT_DTYPES)
+  for name in _CSV_INPUT_DTYPES.names:
+    rcm_output_data[name] = df_chunk[name].to_numpy()
+  return rcm_output_data
+
+
+def iter_csv_chunks(
+    path: str,
+    chunk_size: int = _CHUNK_SIZE,
+) -> Iterator[np.ndarray]:
+  """Reads csv data in chunks of numpy arrays.
+
+  The csv is parsed by the C parser of pandas, so quoted content ids with
+  delimiters are kept intact, and only one chunk is held in memory at once.
+  Content ids such as "NA" are read as strings, not as missing values.
+
+  Args:
+    path: A path to read csv data that you store data into Firestore.
+    chunk_size: A number of rows per chunk.
+
+  Yields:
+    Numpy arrays of _CSV_INPUT_DTYPES with up to chunk_size rows.
+
+  Raises:
+    IOError: if the path is not found, or the resource cannot be opened.
+  """
+  if not os.path.exists(path):
+    raise IOError(error_messages.NOT_EXISTS_INPUT_FILE)
+
+  with pd.read_csv(
+      path,
+      sep=constants.DELIMITER,
+      skiprows=constants.SKIPROWS,
+      header=None,
+      names=_CSV_INPUT_DTYPES.names,
+      dtype={name: _CSV_INPUT_DTYPES[name]
+             for name in _CSV_INPUT_DTYPES.names},
+      keep_default_na=False,
+      engine='c',
+      chunksize=chunk_size,
+  ) as reader:
+    for df_chunk in reader:
+      yield _frame_to_np_array(df_chunk)
 
 
-def read_csv_to_np_array(path: str) -> np.ndarray:
+def read_csv_to_np_array(
+    path: str,
+    chunk_size: int = _CHUNK_SIZE,
+) -> np.ndarray:
   """Reads csv data and returns numpy array.
 
+  Use iter_csv_chunks instead for files that do not fit in memory.
+
   Args:
     path: A path to read csv data that you store data into Firestore.
+    chunk_size: A number of rows parsed at once.
 
   Returns:
     A numpy array loded from csv path.
@@ -47,14 +150,426 @@ def read_csv_to_np_array(path: str) -> np.ndarray:
   Raises:
     IOError: if the path is not found, or the resource cannot be opened.
   """
-  if os.path.exists(path):
-    rcm_output_data = np.loadtxt(
-        path,
-        delimiter=constants.DELIMITER,
-        skiprows=constants.SKIPROWS,
-        dtype=_CSV_INPUT_DTYPES,
-    )
-  else:
+  chunks = list(iter_csv_chunks(path, chunk_size))
+  if not chunks:
+    return np.empty(0, dtype=_CSV_INPUT_DTYPES)
+
+  return np.concatenate(chunks)
+
+
+def iter_npz_chunks(
+    path: str,
+    chunk_size: int = _CHUNK_SIZE,
+) -> Iterator[np.ndarray]:
+  """Reads binary npz data in chunks of numpy arrays.
+
+  The integer-coded records are memory-mapped, and only chunk_size records
+  at a time are decoded with the keyword dictionary into arrays like the
+  ones iter_csv_chunks yields. Use results.read_npz_records to work on the
+  codes without decoding.
+
+  Args:
+    path: A path to read npz data written with the npz output format.
+    chunk_size: A number of records per chunk.
+
+  Yields:
+    Numpy arrays of _CSV_INPUT_DTYPES with up to chunk_size rows.
+
+  Raises:
+    IOError: if the path is not found, or the resource cannot be opened.
+  """
+  if not os.path.exists(path):
     raise IOError(error_messages.NOT_EXISTS_INPUT_FILE)
 
-  return rcm_output_data
+  records, vocabulary = results.read_npz_records(path)
+  vocabulary = vocabulary.astype(object)
+  for start in range(0, len(records), chunk_size):
+    chunk = records[start:start + chunk_size]
+    rcm_output_data = np.empty(len(chunk), dtype=_CSV_INPUT_DTYPES)
+    rcm_output_data[constants.KEYWORD] = vocabulary[chunk[constants.KEYWORD]]
+    rcm_output_data[constants.RCM_RESULT] = vocabulary[
+        chunk[constants.RCM_RESULT]]
+    rcm_output_data[constants.RANK] = chunk[constants.RANK]
+    rcm_output_data[constants.SCORE] = chunk[constants.SCORE]
+    yield rcm_output_data
+
+
+def read_npz_to_np_array(
+    path: str,
+    chunk_size: int = _CHUNK_SIZE,
+) -> np.ndarray:
+  """Reads binary npz data and returns numpy array.
+
+  Use iter_npz_chunks instead for files that do not fit in memory.
+
+  Args:
+    path: A path to read npz data written with the npz output format.
+    chunk_size: A number of records decoded at once.
+
+  Returns:
+    A numpy array loded from npz path.
+
+  Raises:
+    IOError: if the path is not found, or the resource cannot be opened.
+  """
+  chunks = list(iter_npz_chunks(path, chunk_size))
+  if not chunks:
+    return np.empty(0, dtype=_CSV_INPUT_DTYPES)
+
+  return np.concatenate(chunks)
+
+
+def _document(rows: np.ndarray) -> Document:
+  """Builds the document of one keyword from its rows."""
+  if np.all(rows[constants.RANK] == constants.DELETED_RANK):
+    return rows[constants.KEYWORD][0], None
+  rows = rows[np.argsort(rows[constants.RANK], kind='stable')]
+  return rows[constants.KEYWORD][0], {
+      constants.RCM_RESULT: rows[constants.RCM_RESULT].tolist(),
+      constants.SCORE: rows[constants.SCORE].tolist(),
+  }
+
+
+def iter_documents(chunks: Iterable[np.ndarray]) -> Iterator[Document]:
+  """Groups recommendation rows into one document per keyword.
+
+  Rows of one keyword must be contiguous, as written by main.py, but may be
+  split across chunks. Only one chunk and one keyword of rows are held in
+  memory, along with the set of keywords already grouped.
+
+  Args:
+    chunks: Numpy arrays of _CSV_INPUT_DTYPES, e.g. from iter_csv_chunks.
+
+  Yields:
+    Tuples of (keyword, document). The document holds the rcm_result and
+    score lists sorted by rank. It is None for a keyword with only
+    constants.DELETED_RANK rows in a differential output, which marks the
+    document to be deleted.
+
+  Raises:
+    ValueError: if the rows of a keyword are not contiguous, which would
+      overwrite its document with a partial one.
+  """
+  emitted = set()
+
+  def document(rows: np.ndarray) -> Document:
+    keyword, content = _document(rows)
+    if keyword in emitted:
+      raise ValueError(f'Rows of keyword {keyword!r} are not contiguous.')
+    emitted.add(keyword)
+    return keyword, content
+
+  pending = np.empty(0, dtype=_CSV_INPUT_DTYPES)
+  for chunk in chunks:
+    rows = np.concatenate([pending, chunk])
+    if not len(rows):
+      continue
+    keywords = rows[constants.KEYWORD]
+    starts = np.flatnonzero(
+        np.concatenate([[True], keywords[1:] != keywords[:-1]]))
+    for start, stop in zip(starts[:-1], starts[1:]):
+      yield document(rows[start:stop])
+    pending = rows[starts[-1]:]
+
+  if len(pending):
+    yield document(pending)
+
+
+def document_id(keyword: str) -> str:
+  """Returns the Firestore document id of a keyword.
+
+  Firestore document ids must not contain '/' or be '.' or '..', so these are
+  percent-encoded, as is '%' to keep the id reversible with
+  urllib.parse.unquote. Other keywords are used as they are.
+
+  Args:
+    keyword: A content id of the recommendation results.
+
+  Returns:
+    A valid document id.
+  """
+  if keyword in _RESERVED_DOCUMENT_IDS:
+    return _RESERVED_DOCUMENT_IDS[keyword]
+  for character, escape in _DOCUMENT_ID_ESCAPES:
+    keyword = keyword.replace(character, escape)
+  return keyword
+
+
+def _retryable_errors() -> Tuple[Type[Exception], ...]:
+  """Returns the errors of a batch commit that are worth retrying."""
+  errors = (ConnectionError, TimeoutError)
+  if api_exceptions is None:
+    return errors
+  return errors + (
+      api_exceptions.Aborted,
+      api_exceptions.DeadlineExceeded,
+      api_exceptions.InternalServerError,
+      api_exceptions.ResourceExhausted,
+      api_exceptions.ServiceUnavailable,
+  )
+
+
+def _commit_batch(
+    client: Any,
+    collection: str,
+    documents: Sequence[Document],
+    max_retries: int,
+    initial_backoff_seconds: float,
+    retryable_errors: Tuple[Type[Exception], ...],
+    sleep: Callable[[float], None],
+) -> int:
+  """Commits documents in one write batch and returns the number of retries.
+
+  Retries back off exponentially with full jitter up to _MAX_BACKOFF_SECONDS.
+  Set and delete writes are idempotent, so a retried batch never duplicates
+  documents.
+  """
+  collection_ref = client.collection(collection)
+  for attempt in range(max_retries + 1):
+    batch = client.batch()
+    for keyword, document in documents:
+      reference = collection_ref.document(document_id(keyword))
+      if document is None:
+        batch.delete(reference)
+      else:
+        batch.set(reference, document)
+    try:
+      batch.commit()
+      return attempt
+    except retryable_errors as e:
+      if attempt == max_retries:
+        raise
+      backoff = min(initial_backoff_seconds * 2 ** attempt,
+                    _MAX_BACKOFF_SECONDS)
+      logging.warning('Retrying a batch of %d documents after %s.',
+                      len(documents), e)
+      sleep(random.uniform(0, backoff))
+
+
+def write_documents(
+    client: Any,
+    collection: str,
+    documents: Iterable[Document],
+    batch_size: int = _BATCH_SIZE,
+    max_workers: int = _MAX_WORKERS,
+    max_retries: int = _MAX_RETRIES,
+    initial_backoff_seconds: float = _INITIAL_BACKOFF_SECONDS,
+    sleep: Callable[[float], None] = time.sleep,
+) -> WriteReport:
+  """Writes documents to Firestore in concurrent write batches.
+
+  Batches are committed from a thread pool, and at most 2 * max_workers
+  batches are in flight, so documents are consumed lazily and memory stays
+  bounded for any number of documents.
+
+  Args:
+    client: A google.cloud.firestore.Client, or any object with the same
+      collection(...).document(...) and batch() interface.
+    collection: A name of the collection to write documents into.
+    documents: Tuples of (keyword, document), e.g. from iter_documents. The
+      document id is document_id(keyword), and a None document deletes the
+      document.
+    batch_size: A number of writes per batch. Firestore allows up to 500.
+    max_workers: A number of batches committed concurrently.
+    max_retries: A number of retries of a failed batch before giving up.
+    initial_backoff_seconds: Upper bound of the first retry delay. It doubles
+      on each retry.
+    sleep: A function to wait between retries.
+
+  Returns:
+    A WriteReport of the write.
+
+  Raises:
+    ValueError: if batch_size is not between 1 and _BATCH_SIZE.
+  """
+  if not 0 < batch_size <= _BATCH_SIZE:
+    raise ValueError(f'batch_size must be between 1 and {_BATCH_SIZE}.')
+
+  retryable_errors = _retryable_errors()
+  num_documents = num_deleted = num_batches = num_retries = 0
+  in_flight = set()
+  start = time.perf_counter()
+
+  def collect(done: Iterable[futures.Future]) -> None:
+    nonlocal num_batches, num_retries
+    for future in done:
+      retries = future.result()
+      num_batches += 1
+      num_retries += bool(retries)
+
+  with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+    def submit(batch: List[Document]) -> None:
+      nonlocal num_documents, num_deleted, in_flight
+      in_flight.add(executor.submit(
+          _commit_batch, client, collection, batch, max_retries,
+          initial_backoff_seconds, retryable_errors, sleep))
+      num_documents += len(batch)
+      num_deleted += sum(document is None for _, document in batch)
+      if len(in_flight) >= 2 * max_workers:
+        done, in_flight = futures.wait(
+            in_flight, return_when=futures.FIRST_COMPLETED)
+        collect(done)
+
+    batch = []
+    for document in documents:
+      batch.append(document)
+      if len(batch) == batch_size:
+        submit(batch)
+        batch = []
+    if batch:
+      submit(batch)
+    collect(futures.as_completed(in_flight))
+
+  seconds = time.perf_counter() - start
+  report = WriteReport(
+      num_documents=num_documents,
+      num_deleted=num_deleted,
+      num_batches=num_batches,
+      num_retries=num_retries,
+      seconds=seconds,
+      documents_per_second=num_documents / seconds if seconds else 0.0,
+  )
+  logging.info('Wrote %d documents, including %d deletions, in %d batches '
+               'in %.2f seconds (%.0f documents per second).',
+               report.num_documents, report.num_deleted,
+               report.num_batches, report.seconds,
+               report.documents_per_second)
+
+  return report
+
+
+def write_recommendations(
+    client: Any,
+    collection: str,
+    path: str,
+    chunk_size: int = _CHUNK_SIZE,
+    batch_size: int = _BATCH_SIZE,
+    max_workers: int = _MAX_WORKERS,
+    max_retries: int = _MAX_RETRIES,
+) -> WriteReport:
+  """Writes recommendation results to Firestore, one document per keyword.
+
+  Args:
+    client: A google.cloud.firestore.Client or a compatible fake.
+    collection: A name of the collection to write documents into.
+    path: A path of recommendation results in csv or npz format.
+    chunk_size: A number of csv rows parsed, or npz records decoded, at once.
+    batch_size: A number of writes per batch.
+    max_workers: A number of batches committed concurrently.
+    max_retries: A number of retries of a failed batch before giving up.
+
+  Returns:
+    A WriteReport of the write.
+
+  Raises:
+    IOError: if the path is not found, or the resource cannot be opened.
+  """
+  if path.endswith(_NPZ_EXTENSION):
+    chunks = iter_npz_chunks(path, chunk_size)
+  else:
+    chunks = iter_csv_chunks(path, chunk_size)
+
+  return write_documents(client, collection, iter_documents(chunks),
+                         batch_size, max_workers, max_retries)
+
+
+def parse_cli_args() -> argparse.Namespace:
+  """Parses command line arguments.
+
+  Returns:
+    An instance of argparse.Namespace with arg values.
+  """
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+      '--input', '-i',
+      help='Recommendation results file path in csv or npz format.',
+      required=True,
+      type=str,
+      )
+  parser.add_argument(
+      '--project', '-p',
+      help='Google Cloud project id of the Firestore database.',
+      default=None,
+      required=False,
+      type=str,
+      )
+  parser.add_argument(
+      '--collection', '-col',
+      help='Firestore collection to write one document per keyword into.',
+      required=True,
+      type=str,
+      )
+  parser.add_argument(
+      '--database', '-db',
+      help='Firestore database id. The default database is used if omitted.',
+      default=None,
+      required=False,
+      type=str,
+      )
+  parser.add_argument(
+      '--emulator_host', '-eh',
+      help='Host:port of a local Firestore emulator to write into instead.',
+      default=None,
+      required=False,
+      type=str,
+      )
+  parser.add_argument(
+      '--chunk_size', '-cs',
+      help='Number of csv rows parsed at once.',
+      default=_CHUNK_SIZE,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--batch_size', '-b',
+      help='Number of writes per batch, up to 500.',
+      default=_BATCH_SIZE,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--max_workers', '-w',
+      help='Number of batches committed concurrently.',
+      default=_MAX_WORKERS,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--max_retries',
+      help='Number of retries of a failed batch before giving up.',
+      default=_MAX_RETRIES,
+      required=False,
+      type=int,
+      )
+
+  return parser.parse_args()
+
+
+def main() -> None:
+  """Writes recommendation results into Firestore."""
+  logging.basicConfig(
+      format='%(asctime)s %(message)s',
+      datefmt='%m/%d/%Y %I:%M:%S %p',
+      level=logging.INFO,
+  )
+  args = parse_cli_args()
+  if firestore_client is None:
+    raise ImportError(error_messages.NOT_INSTALLED_FIRESTORE)
+  if args.emulator_host:
+    os.environ[_EMULATOR_HOST_ENV] = args.emulator_host
+
+  client = firestore_client.Client(project=args.project,
+                                   database=args.database)
+  write_recommendations(client,
+                        args.collection,
+                        args.input,
+                        args.chunk_size,
+                        args.batch_size,
+                        args.max_workers,
+                        args.max_retries,
+                        )
+
+
+if __name__ == '__main__':
+  main()
@@ -15,13 +15,18 @@
 """Tests for firestore.py."""
 
 import os
+import tempfile
+import threading
 import unittest
 from unittest import mock
+from urllib import parse
 
 from absl.testing import parameterized
 import constants
 import firestore
 import numpy as np
+import pandas as pd
+import results
 
 
 _FAKE_NP_LOADTXT_INPUT_2_LINES = np.array(
@@ -33,12 +38,94 @@ _FAKE_NP_LOADTXT_INPUT_1_LINE = np.array(
     [('key_item_1', 'rcm_item_1', 1, 0.9)],
     dtype=firestore._CSV_INPUT_DTYPES,
 )
-_FAKE_COMMON_PATH = '/path/to'
-_FAKE_INPUT_FILEPATH = os.path.join(_FAKE_COMMON_PATH, 'input.csv')
+_FAKE_NP_INPUT_QUOTED_DELIMITER = np.array(
+    [('key,item', 'NA', 1, 0.9)],
+    dtype=firestore._CSV_INPUT_DTYPES,
+)
+_FAKE_NP_INPUT_EMPTY = np.empty(0, dtype=firestore._CSV_INPUT_DTYPES)
 _FAKE_WRONG_FILEPATH = '/faile_file_path'
+_FAKE_COLLECTION = 'recommendations'
+_FAKE_NP_INPUT_2_KEYWORDS = np.array(
+    [('key_item_1', 'rcm_item_2', 2, 0.8),
+     ('key_item_1', 'rcm_item_1', 1, 0.9),
+     ('key_item_2', 'rcm_item_1', 1, 0.7)],
+    dtype=firestore._CSV_INPUT_DTYPES,
+)
+_FAKE_DOCUMENTS_2_KEYWORDS = [
+    ('key_item_1', {'rcm_result': ['rcm_item_1', 'rcm_item_2'],
+                    'score': [np.float32(0.9), np.float32(0.8)]}),
+    ('key_item_2', {'rcm_result': ['rcm_item_1'],
+                    'score': [np.float32(0.7)]}),
+]
+
+
+class _FakeWriteBatch:
+  """An in-process stand-in of google.cloud.firestore.WriteBatch."""
+
+  def __init__(self, client):
+    self._client = client
+    self._writes = []
+
+  def set(self, reference, document):
+    self._writes.append((reference, document))
+
+  def delete(self, reference):
+    self._writes.append((reference, None))
+
+  def commit(self):
+    if len(self._writes) > firestore._BATCH_SIZE:
+      raise ValueError('Too many writes in a batch.')
+    with self._client.lock:
+      if self._client.num_failures > 0:
+        self._client.num_failures -= 1
+        raise ConnectionError('Connection reset.')
+      self._client.num_commits += 1
+      for reference, document in self._writes:
+        if document is None:
+          self._client.documents.pop(reference, None)
+        else:
+          self._client.documents[reference] = document
+
+
+class _FakeCollection:
+
+  def __init__(self, name):
+    self._name = name
+
+  def document(self, document_id):
+    return (self._name, document_id)
+
+
+class _FakeClient:
+  """An in-process stand-in of google.cloud.firestore.Client."""
+
+  def __init__(self, num_failures=0):
+    self.lock = threading.Lock()
+    self.num_failures = num_failures
+    self.num_commits = 0
+    self.documents = {}
+
+  def collection(self, name):
+    return _FakeCollection(name)
+
+  def batch(self):
+    return _FakeWriteBatch(self)
+
+
+def _fake_documents(num_documents):
+  return [(f'key_item_{i}', {'rcm_result': [f'rcm_item_{i}'], 'score': [0.5]})
+          for i in range(num_documents)]
 
 
 class FirestoreTest(parameterized.TestCase):
+
+  def _write_csv(self, np_array):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    csv_path = os.path.join(temp_dir.name, 'output.csv')
+    pd.DataFrame(np_array).to_csv(csv_path, index=False)
+    return csv_path
+
   @parameterized.named_parameters([
       {
           'testcase_name': '2_rows_file_success',
@@ -47,39 +134,46 @@ class FirestoreTest(parameterized.TestCase):
       {
           'testcase_name': '1_row_file_success',
           'loadtxt_input_data': _FAKE_NP_LOADTXT_INPUT_1_LINE,
-      }
+      },
+      {
+          'testcase_name': 'quoted_delimiter_success',
+          'loadtxt_input_data': _FAKE_NP_INPUT_QUOTED_DELIMITER,
+      },
+      {
+          'testcase_name': 'header_only_file_success',
+          'loadtxt_input_data': _FAKE_NP_INPUT_EMPTY,
+      },
   ])
-  @mock.patch.object(firestore.os.path, 'exists', return_value=True)
   def test_read_csv_to_np_array_with_success(
       self,
-      _,
       loadtxt_input_data,
   ):
-    mock_np_loadtxt = mock.patch.object(
-        firestore.np,
-        'loadtxt',
-        return_value=loadtxt_input_data
-    ).start()
-    csv_path = _FAKE_INPUT_FILEPATH
+    csv_path = self._write_csv(loadtxt_input_data)
 
     actual = firestore.read_csv_to_np_array(csv_path)
 
-    mock_np_loadtxt.assert_called_with(
-        _FAKE_INPUT_FILEPATH,
-        delimiter=constants.DELIMITER,
-        skiprows=constants.SKIPROWS,
-        dtype=np.dtype(
-            [(constants.KEYWORD, 'O'),
-             (constants.RCM_RESULT, 'O'),
-             (constants.RANK, 'i2'),
-             (constants.SCORE, 'f4')]
-        )
-    )
+    self.assertEqual(actual.dtype, firestore._CSV_INPUT_DTYPES)
     np.testing.assert_array_equal(
         loadtxt_input_data,
         actual,
     )
 
+  def test_iter_csv_chunks(self):
+    csv_path = self._write_csv(_FAKE_NP_LOADTXT_INPUT_2_LINES)
+
+    actual = list(firestore.iter_csv_chunks(csv_path, chunk_size=1))
+
+    self.assertLen(actual, 2)
+    np.testing.assert_array_equal(np.concatenate(actual),
+                                  _FAKE_NP_LOADTXT_INPUT_2_LINES)
+
+  def test_iter_csv_chunks_with_failure_wrong_file_path(self):
+    with self.assertRaisesRegex(
+        IOError,
+        'The input file dose not exist.'
+    ):
+      next(firestore.iter_csv_chunks(_FAKE_WRONG_FILEPATH))
+
   @mock.patch.object(firestore.os.path, 'exists', return_value=False)
   def test_read_csv_to_np_array_with_failure_wrong_file_path(
       self,
@@ -91,6 +185,162 @@ class FirestoreTest(parameterized.TestCase):
     ):
       firestore.read_csv_to_np_array(_FAKE_WRONG_FILEPATH)
 
+  def test_read_npz_to_np_array_with_success(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    npz_path = os.path.join(temp_dir.name, 'output.npz')
+    results.write_npz(pd.DataFrame(_FAKE_NP_LOADTXT_INPUT_2_LINES), npz_path)
+
+    actual = firestore.read_npz_to_np_array(npz_path)
+
+    self.assertEqual(actual.dtype, firestore._CSV_INPUT_DTYPES)
+    np.testing.assert_array_equal(actual, _FAKE_NP_LOADTXT_INPUT_2_LINES)
+
+  def test_iter_npz_chunks(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    npz_path = os.path.join(temp_dir.name, 'output.npz')
+    results.write_npz(pd.DataFrame(_FAKE_NP_INPUT_2_KEYWORDS), npz_path)
+
+    actual = list(firestore.iter_npz_chunks(npz_path, chunk_size=2))
+
+    self.assertEqual([len(chunk) for chunk in actual], [2, 1])
+    np.testing.assert_array_equal(np.concatenate(actual),
+                                  _FAKE_NP_INPUT_2_KEYWORDS)
+
+  @mock.patch.object(firestore.os.path, 'exists', return_value=False)
+  def test_read_npz_to_np_array_with_failure_wrong_file_path(
+      self,
+      _
+  ):
+    with self.assertRaisesRegex(
+        IOError,
+        'The input file dose not exist.'
+    ):
+      firestore.read_npz_to_np_array(_FAKE_WRONG_FILEPATH)
+
+  def test_iter_documents_groups_keywords_across_chunks(self):
+    chunks = [_FAKE_NP_INPUT_2_KEYWORDS[:1], _FAKE_NP_INPUT_2_KEYWORDS[1:]]
+
+    actual = list(firestore.iter_documents(chunks))
+
+    self.assertEqual(actual, _FAKE_DOCUMENTS_2_KEYWORDS)
+
+  def test_iter_documents_with_failure_split_keyword(self):
+    chunks = [_FAKE_NP_INPUT_2_KEYWORDS, _FAKE_NP_INPUT_2_KEYWORDS[:1]]
+
+    with self.assertRaisesRegex(ValueError, 'key_item_1'):
+      list(firestore.iter_documents(chunks))
+
+  def test_write_documents(self):
+    client = _FakeClient()
+    documents = _fake_documents(1201)
+
+    report = firestore.write_documents(client, _FAKE_COLLECTION, documents,
+                                       max_workers=2)
+
+    self.assertEqual(client.documents,
+                     {(_FAKE_COLLECTION, keyword): document
+                      for keyword, document in documents})
+    self.assertEqual(report.num_documents, 1201)
+    self.assertEqual(report.num_batches, 3)
+    self.assertEqual(client.num_commits, 3)
+    self.assertEqual(report.num_retries, 0)
+
+  @parameterized.named_parameters([
+      {'testcase_name': 'plain', 'keyword': 'key_item_1',
+       'expected': 'key_item_1'},
+      {'testcase_name': 'slash', 'keyword': '/page/a%b',
+       'expected': '%2Fpage%2Fa%25b'},
+      {'testcase_name': 'dot', 'keyword': '.', 'expected': '%2E'},
+      {'testcase_name': 'dot_dot', 'keyword': '..', 'expected': '%2E%2E'},
+  ])
+  def test_document_id(self, keyword, expected):
+    actual = firestore.document_id(keyword)
+
+    self.assertEqual(actual, expected)
+    self.assertEqual(parse.unquote(actual), keyword)
+
+  def test_write_documents_escapes_document_ids(self):
+    client = _FakeClient()
+
+    firestore.write_documents(client, _FAKE_COLLECTION,
+                              [('/page/a', {'rcm_result': [], 'score': []})])
+
+    self.assertEqual(list(client.documents),
+                     [(_FAKE_COLLECTION, '%2Fpage%2Fa')])
+
+  def test_write_documents_retries_failed_batches(self):
+    client = _FakeClient(num_failures=2)
+    mock_sleep = mock.Mock()
+
+    report = firestore.write_documents(client, _FAKE_COLLECTION,
+                                       _fake_documents(10), batch_size=5,
+                                       sleep=mock_sleep)
+
+    self.assertLen(client.documents, 10)
+    self.assertEqual(mock_sleep.call_count, 2)
+    self.assertBetween(report.num_retries, 1, 2)
+
+  def test_write_documents_with_failure_after_max_retries(self):
+    client = _FakeClient(num_failures=3)
+
+    with self.assertRaises(ConnectionError):
+      firestore.write_documents(client, _FAKE_COLLECTION, _fake_documents(1),
+                                max_retries=2, sleep=mock.Mock())
+
+  def test_write_documents_with_failure_batch_size(self):
+    with self.assertRaisesRegex(ValueError, 'batch_size'):
+      firestore.write_documents(_FakeClient(), _FAKE_COLLECTION, [],
+                                batch_size=firestore._BATCH_SIZE + 1)
+
+  def test_write_recommendations(self):
+    client = _FakeClient()
+    csv_path = self._write_csv(_FAKE_NP_INPUT_2_KEYWORDS)
+
+    report = firestore.write_recommendations(client, _FAKE_COLLECTION,
+                                             csv_path, chunk_size=1)
+
+    self.assertEqual(client.documents,
+                     {(_FAKE_COLLECTION, keyword): document
+                      for keyword, document in _FAKE_DOCUMENTS_2_KEYWORDS})
+    self.assertEqual(report.num_documents, 2)
+
+  def test_write_recommendations_from_npz_in_chunks(self):
+    client = _FakeClient()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    npz_path = os.path.join(temp_dir.name, 'output.npz')
+    results.write_npz(pd.DataFrame(_FAKE_NP_INPUT_2_KEYWORDS), npz_path)
+
+    with mock.patch.object(firestore, 'read_npz_to_np_array') as mock_read:
+      report = firestore.write_recommendations(client, _FAKE_COLLECTION,
+                                               npz_path, chunk_size=1)
+
+    mock_read.assert_not_called()
+    self.assertEqual(client.documents,
+                     {(_FAKE_COLLECTION, keyword): document
+                      for keyword, document in _FAKE_DOCUMENTS_2_KEYWORDS})
+    self.assertEqual(report.num_documents, 2)
+
+  def test_write_recommendations_deletes_tombstones(self):
+    client = _FakeClient()
+    client.documents[(_FAKE_COLLECTION, 'key_item_3')] = {}
+    csv_path = self._write_csv(np.concatenate([
+        _FAKE_NP_INPUT_2_KEYWORDS,
+        np.array([('key_item_3', '', constants.DELETED_RANK, 0.0)],
+                 dtype=firestore._CSV_INPUT_DTYPES),
+    ]))
+
+    report = firestore.write_recommendations(client, _FAKE_COLLECTION,
+                                             csv_path)
+
+    self.assertEqual(client.documents,
+                     {(_FAKE_COLLECTION, keyword): document
+                      for keyword, document in _FAKE_DOCUMENTS_2_KEYWORDS})
+    self.assertEqual(report.num_documents, 3)
+    self.assertEqual(report.num_deleted, 1)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,238 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-stage timing, memory and throughput of pipeline runs.
+
+Pipeline functions wrap their work in stage(), which logs the wall time, CPU
+time and peak RSS of the stage. Inside recording(), the stages are also
+collected into a run report written as JSON, and each top-level stage can be
+profiled with cProfile.
+
+Example:
+  with instrumentation.recording('report.json', profile_dir='profiles'):
+    with instrumentation.stage('read_csv') as record:
+      df = pd.read_csv(path)
+      record.rows_out = len(df)
+"""
+
+import contextlib
+import cProfile
+import dataclasses
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional
+
+from gensim.models import callbacks
+
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+_RSS_UNIT_BYTES = 1 if sys.platform == 'darwin' else 1024
+_PROFILE_SUFFIX = '.prof'
+
+
+@dataclasses.dataclass
+class StageRecord:
+  """Measurements of one stage of a run.
+
+  Attributes:
+    stage: A name of the stage.
+    depth: A number of stages that enclose this stage.
+    wall_seconds: Wall time in seconds.
+    cpu_seconds: User and system CPU time of this process in seconds.
+    peak_rss_bytes: Peak resident set size of this process at the end of the
+      stage. It never decreases over a run.
+    rows_in: A number of input rows, sessions or content ids of the stage,
+      if known.
+    rows_out: A number of output rows or content ids of the stage, if known.
+    words_per_second: Training throughput of word2vec, if the stage trained.
+    peak_traced_bytes: Peak memory allocated during the stage as traced by
+      tracemalloc, if tracing was requested.
+  """
+  stage: str
+  depth: int = 0
+  wall_seconds: float = 0.0
+  cpu_seconds: float = 0.0
+  peak_rss_bytes: int = 0
+  rows_in: Optional[int] = None
+  rows_out: Optional[int] = None
+  words_per_second: Optional[float] = None
+  peak_traced_bytes: Optional[int] = None
+
+
+class EpochTimer(callbacks.CallbackAny2Vec):
+  """Times word2vec epochs to compute training throughput."""
+
+  def __init__(self) -> None:
+    self.epoch_seconds: List[float] = []
+    self._start = 0.0
+    self._words_per_epoch = 0
+
+  def on_epoch_begin(self, model: Any) -> None:
+    self._start = time.perf_counter()
+
+  def on_epoch_end(self, model: Any) -> None:
+    self.epoch_seconds.append(time.perf_counter() - self._start)
+    self._words_per_epoch = model.corpus_total_words
+
+  def words_per_second(self) -> Optional[float]:
+    """Returns raw corpus words trained per second, or None before training."""
+    seconds = sum(self.epoch_seconds)
+    if not seconds:
+      return None
+    return self._words_per_epoch * len(self.epoch_seconds) / seconds
+
+
+def _peak_rss_bytes() -> int:
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT_BYTES
+
+
+class RunRecorder:
+  """Collects the stage records of one run."""
+
+  def __init__(self, profile_dir: Optional[str] = None) -> None:
+    """Initializes the recorder.
+
+    Args:
+      profile_dir: A directory to write cProfile stats of each top-level
+        stage into, or None not to profile.
+    """
+    self.stages: List[StageRecord] = []
+    self._profile_dir = profile_dir
+    self._depth = 0
+    self._start = time.perf_counter()
+
+  @contextlib.contextmanager
+  def stage(
+      self,
+      name: str,
+      rows_in: Optional[int] = None,
+      trace_memory: bool = False,
+  ) -> Iterator[StageRecord]:
+    """Measures the enclosed block as a stage.
+
+    Args:
+      name: A name of the stage.
+      rows_in: A number of rows or sessions the stage consumes, if known.
+      trace_memory: A flag whether to trace the peak allocated memory with
+        tracemalloc, which slows the stage down. It is ignored if tracemalloc
+        is already tracing.
+
+    Yields:
+      The StageRecord of the stage. Its rows and throughput may be set inside
+      the block, and its measurements are filled in when the block exits.
+    """
+    record = StageRecord(name, depth=self._depth, rows_in=rows_in)
+    index = len(self.stages)
+    self.stages.append(record)
+    profiler = None
+    if self._profile_dir and self._depth == 0:
+      profiler = cProfile.Profile()
+    is_tracing = trace_memory and not tracemalloc.is_tracing()
+    if is_tracing:
+      tracemalloc.start()
+
+    self._depth += 1
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    if profiler:
+      profiler.enable()
+    try:
+      yield record
+    finally:
+      if profiler:
+        profiler.disable()
+      record.wall_seconds = time.perf_counter() - start
+      record.cpu_seconds = time.process_time() - start_cpu
+      record.peak_rss_bytes = _peak_rss_bytes()
+      self._depth -= 1
+      if is_tracing:
+        _, record.peak_traced_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+      if profiler:
+        os.makedirs(self._profile_dir, exist_ok=True)
+        profiler.dump_stats(os.path.join(
+            self._profile_dir,
+            f'{index:02d}_{name}{_PROFILE_SUFFIX}'))
+
+    logging.info('%s stage took %.2f seconds (%.2f CPU seconds) with %d peak '
+                 'RSS bytes.', name, record.wall_seconds, record.cpu_seconds,
+                 record.peak_rss_bytes)
+
+  def report(self) -> Dict[str, Any]:
+    """Returns the run report as a JSON serializable dict."""
+    return {
+        'wall_seconds': time.perf_counter() - self._start,
+        'peak_rss_bytes': _peak_rss_bytes(),
+        'stages': [dataclasses.asdict(record) for record in self.stages],
+    }
+
+  def write_report(self, path: str) -> None:
+    """Writes the run report to a JSON file."""
+    with open(path, 'w') as f:
+      json.dump(self.report(), f, indent=2)
+    logging.info('Wrote run report of %d stages to %s.', len(self.stages),
+                 path)
+
+
+_active_recorder: Optional[RunRecorder] = None
+
+
+@contextlib.contextmanager
+def recording(
+    run_report_path: Optional[str] = None,
+    profile_dir: Optional[str] = None,
+) -> Iterator[RunRecorder]:
+  """Collects the stages of the enclosed block into one run.
+
+  Args:
+    run_report_path: A file path to write the JSON run report to when the
+      block exits, even if it raises, or None not to write it.
+    profile_dir: A directory to write cProfile stats of each top-level stage
+      into, or None not to profile.
+
+  Yields:
+    The RunRecorder of the run.
+  """
+  global _active_recorder
+  previous = _active_recorder
+  _active_recorder = RunRecorder(profile_dir)
+  try:
+    yield _active_recorder
+  finally:
+    recorder, _active_recorder = _active_recorder, previous
+    if run_report_path:
+      recorder.write_report(run_report_path)
+
+
+def stage(
+    name: str,
+    rows_in: Optional[int] = None,
+) -> contextlib.AbstractContextManager[StageRecord]:
+  """Measures the enclosed block as a stage of the active run.
+
+  Outside recording(), the stage is only logged.
+
+  Args:
+    name: A name of the stage.
+    rows_in: A number of rows or sessions the stage consumes, if known.
+
+  Returns:
+    A context manager yielding the StageRecord of the stage.
+  """
+  return (_active_recorder or RunRecorder()).stage(name, rows_in)
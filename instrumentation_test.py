@@ -0,0 +1,92 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for instrumentation.py."""
+
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+from gensim.models import word2vec
+import instrumentation
+
+
+class InstrumentationTest(unittest.TestCase):
+
+  def test_stage_records_measurements(self):
+    recorder = instrumentation.RunRecorder()
+
+    with recorder.stage('outer', rows_in=3) as outer:
+      with recorder.stage('inner', trace_memory=True) as inner:
+        _ = [0] * 100000
+      outer.rows_out = 2
+
+    self.assertEqual([record.stage for record in recorder.stages],
+                     ['outer', 'inner'])
+    self.assertEqual((outer.depth, outer.rows_in, outer.rows_out), (0, 3, 2))
+    self.assertEqual(inner.depth, 1)
+    self.assertGreaterEqual(outer.wall_seconds, inner.wall_seconds)
+    self.assertGreater(outer.peak_rss_bytes, 0)
+    self.assertGreaterEqual(inner.peak_traced_bytes, 800000)
+    self.assertIsNone(outer.peak_traced_bytes)
+
+  def test_stage_records_on_error(self):
+    recorder = instrumentation.RunRecorder()
+
+    with self.assertRaises(ValueError):
+      with recorder.stage('failing'):
+        raise ValueError()
+
+    self.assertEqual(len(recorder.stages), 1)
+    self.assertGreater(recorder.stages[0].peak_rss_bytes, 0)
+
+  def test_recording_writes_report_and_profiles(self):
+    with tempfile.TemporaryDirectory() as temp_dir:
+      report_path = os.path.join(temp_dir, 'report.json')
+      profile_dir = os.path.join(temp_dir, 'profiles')
+
+      with instrumentation.recording(report_path, profile_dir):
+        with instrumentation.stage('outer'):
+          with instrumentation.stage('inner'):
+            sorted(range(1000))
+      with instrumentation.stage('unrecorded'):
+        pass
+
+      with open(report_path) as f:
+        report = json.load(f)
+      profiles = os.listdir(profile_dir)
+      stats = pstats.Stats(os.path.join(profile_dir, profiles[0]))
+
+    self.assertEqual([stage['stage'] for stage in report['stages']],
+                     ['outer', 'inner'])
+    self.assertGreater(report['peak_rss_bytes'], 0)
+    self.assertEqual(profiles, ['00_outer.prof'])
+    self.assertTrue(any(function == '<built-in method builtins.sorted>'
+                        for _, _, function in stats.stats))
+
+  def test_epoch_timer(self):
+    timer = instrumentation.EpochTimer()
+    self.assertIsNone(timer.words_per_second())
+
+    _ = word2vec.Word2Vec([['a', 'b', 'c']] * 10, min_count=1, vector_size=4,
+                          workers=1, epochs=3, callbacks=[timer])
+
+    self.assertEqual(len(timer.epoch_seconds), 3)
+    self.assertGreater(timer.words_per_second(), 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -20,20 +20,38 @@ Example:
   `python -i [Input data path] -c [Content data path] -o [Output path]`
   `python -i [Input data path] -c [Content data path] -o [Output path] -r -ri
   [Item name to call ranking results]`
+  `python -s train -i [Input data path] -kv [Keyed vectors path]`
+  `python -s predict -kv [Keyed vectors path] -c [Content data path] -o
+  [Output path]`
 
 Please check README.md and sample data in the root project for the format of
 input data and content data.
 """
 
 import argparse
-import collections
-import itertools
+import dataclasses
 import logging
-from typing import Collection
+import os
+import tempfile
+from typing import Iterable, Optional, Sequence, Union
 
+import ann
+import cold_start
 import constants
+import cooccurrence
+import corpus
 import gensim
+import instrumentation
+import model_store
 import pandas as pd
+import preprocessing
+import publish
+import quantization
+import ranking
+import results
+import session_recommendations
+import similarity
+import vocab_budget
 
 
 _SG = 1
@@ -43,8 +61,36 @@ _VECTOR_SIZE = 100
 _HS = 0
 _NEGATIVE = 5
 _SEED = 1
+_WORKERS = 3
+_EPOCHS = 5
 
-_TOP_N = 7
+_CHUNK_SIZE = 100000
+_ANN_CLUSTERS = 0
+_ANN_PROBES = 8
+_COLD_START_NEIGHBOURS = 0
+_RERANK_CANDIDATES = 50
+_COOCCURRENCE_WINDOW = 5
+_COOCCURRENCE_MIN_PAIR_COUNT = 2
+_COOCCURRENCE_WEIGHT = 0.0
+_MAX_SESSION_LENGTH = 0
+_MIN_SESSION_LENGTH = 0
+_RECENT_ITEMS = 10
+_RECENT_HALF_LIFE = 3.0
+
+_STAGE_ALL = 'all'
+_STAGE_TRAIN = 'train'
+_STAGE_PREDICT = 'predict'
+_STAGE_USERS = 'users'
+_STAGE_COOCCURRENCE = 'cooccurrence'
+
+# Names of the pipeline steps in instrumentation run reports.
+_PHASE_READ_CSV = 'read_csv'
+_PHASE_PREPROCESS = 'preprocess'
+_PHASE_TRAIN = 'train'
+_PHASE_SCORE = 'score'
+_PHASE_RANKING = 'ranking'
+_PHASE_COOCCURRENCE = 'cooccurrence'
+_PHASE_WRITE = 'write'
 
 logging.basicConfig(
     format='%(asctime)s %(message)s',
@@ -53,6 +99,134 @@ logging.basicConfig(
 )
 
 
+@dataclasses.dataclass(frozen=True)
+class Word2VecParams:
+  """Hyperparameters of gensim word2vec training.
+
+  Attributes:
+    sg: Training algorithm, 1 for skip-gram and 0 for CBOW.
+    window: Maximum distance between the current and predicted content id.
+    min_count: Ignores content ids with lower total frequency than this.
+    vector_size: Dimensionality of the embedding vectors.
+    hs: 1 for hierarchical softmax, 0 for negative sampling.
+    negative: A number of noise content ids drawn for negative sampling.
+    seed: A seed for the random number generator.
+    workers: A number of worker threads to train the model.
+    epochs: A number of iterations over the training data.
+    max_vocab: A maximum number of content ids in the vocabulary, or None for
+      no limit. min_count is raised until the vocabulary fits.
+    max_memory_mb: A memory budget of the model in MiB, or None for no
+      limit. It is converted into a maximum vocabulary size from
+      vector_size, hs and negative.
+  """
+  sg: int = _SG
+  window: int = _WINDOWS
+  min_count: int = _MIN_COUNT
+  vector_size: int = _VECTOR_SIZE
+  hs: int = _HS
+  negative: int = _NEGATIVE
+  seed: int = _SEED
+  workers: int = _WORKERS
+  epochs: int = _EPOCHS
+  max_vocab: Optional[int] = None
+  max_memory_mb: Optional[int] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class PreprocessingParams:
+  """Parameters of shrinking the training data before word2vec training.
+
+  Attributes:
+    collapse_repeats: A flag whether to collapse consecutive repeats of a
+      content id in a session into one.
+    max_session_length: A maximum number of content ids per session, or 0
+      for no limit. Longer sessions keep their last content ids.
+    split_long_sessions: A flag whether to split sessions longer than
+      max_session_length into pieces instead of truncating them.
+    min_session_length: Sessions with fewer content ids than this are
+      dropped.
+  """
+  collapse_repeats: bool = False
+  max_session_length: int = _MAX_SESSION_LENGTH
+  split_long_sessions: bool = False
+  min_session_length: int = _MIN_SESSION_LENGTH
+
+
+@dataclasses.dataclass(frozen=True)
+class ScoringParams:
+  """Parameters of the similarity search for recommendation results.
+
+  Attributes:
+    block_size: A number of content ids scored at once. Peak memory of the
+      scoring step is proportional to block_size * vocabulary size.
+    ann_clusters: A number of k-means clusters of an approximate nearest
+      neighbour index, or 0 for exact search.
+    ann_probes: A number of closest clusters scored for each content id in
+      approximate search.
+    num_workers: A number of processes scoring shards of content ids in
+      exact search.
+    cold_start_neighbours: A number of most text-similar content ids that the
+      vector of a content id without a word2vec vector is averaged from, or
+      0 to skip such content ids.
+    quantization: A precision of the vectors in exact search,
+      quantization.NONE for float32, or quantization.FLOAT16 or
+      quantization.INT8 to keep 2 or about 4 times less vector memory.
+    rerank_candidates: A number of best quantized candidates of each content
+      id that are re-ranked with the float32 vectors.
+  """
+  block_size: int = constants.BLOCK_SIZE
+  ann_clusters: int = _ANN_CLUSTERS
+  ann_probes: int = _ANN_PROBES
+  num_workers: int = constants.SCORING_WORKERS
+  cold_start_neighbours: int = _COLD_START_NEIGHBOURS
+  quantization: str = quantization.NONE
+  rerank_candidates: int = _RERANK_CANDIDATES
+
+
+@dataclasses.dataclass(frozen=True)
+class RankingParams:
+  """Parameters of the popularity count in the ranking process.
+
+  Attributes:
+    half_life: A number of later content ids in a user's item_list after
+      which a view counts half, or None for no time decay.
+    deduplicate_users: A flag whether each user counts a content id at most
+      once.
+  """
+  half_life: Optional[float] = None
+  deduplicate_users: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class SessionParams:
+  """Parameters of the session-context recommendations for users.
+
+  Attributes:
+    num_recent_items: A number of latest content ids in a user's item_list
+      that the user's query vector is built from.
+    half_life: A number of earlier content ids after which a content id
+      weighs half in the query vector, or None for equal weights.
+  """
+  num_recent_items: int = _RECENT_ITEMS
+  half_life: Optional[float] = _RECENT_HALF_LIFE
+
+
+@dataclasses.dataclass(frozen=True)
+class CooccurrenceParams:
+  """Parameters of the session co-occurrence recommendations.
+
+  Attributes:
+    window: A maximum distance in a session between co-occurring content
+      ids.
+    min_pair_count: A minimum number of co-occurrences of a recommended pair.
+    weight: A weight in [0, 1] of the co-occurrence score blended into the
+      word2vec similarity, or 0 not to blend.
+  """
+  window: int = _COOCCURRENCE_WINDOW
+  min_pair_count: int = _COOCCURRENCE_MIN_PAIR_COUNT
+  weight: float = _COOCCURRENCE_WEIGHT
+
+
 def _read_csv(path: str) -> pd.DataFrame:
   """Read csv data and return dataframe.
 
@@ -65,177 +239,811 @@ def _read_csv(path: str) -> pd.DataFrame:
   Raises:
     IOError: if the path is not found, or the resource cannot be opened.
   """
-  try:
-    df = pd.read_csv(path)
-  except IOError as e:
-    logging.exception('Can not load csv data with %s.', path)
-    raise e
+  with instrumentation.stage(_PHASE_READ_CSV) as record:
+    try:
+      df = pd.read_csv(path)
+    except IOError as e:
+      logging.exception('Can not load csv data with %s.', path)
+      raise e
+    record.rows_out = len(df)
 
   return df
 
 
 def execute_embedding_w2v(
-    training_data: pd.DataFrame,
+    training_data: Optional[Iterable[Sequence[str]]],
+    params: Optional[Word2VecParams] = None,
+    corpus_file: Optional[str] = None,
     ) -> gensim.models.word2vec.Word2Vec:
   """Executes embedding content data by word2vec.
 
   Args:
-    training_data: A DataFrame of training data that the content ID
+    training_data: A re-iterable corpus of training data that the content ID
       is for each line each user in the order that a certain user saw the
       content as the list type. Example is [['ITEM_A', 'ITEM_B', 'ITEM_C'],
-      ['ITEM_B', 'ITEM_A', 'ITEM_B'], ['ITEM_C', 'ITEM_D', 'ITEM_E']].
+      ['ITEM_B', 'ITEM_A', 'ITEM_B'], ['ITEM_C', 'ITEM_D', 'ITEM_E']] or a
+      corpus.ItemListCorpus. Ignored when corpus_file is set.
+    params: Hyperparameters of word2vec. Defaults to Word2VecParams().
+    corpus_file: A LineSentence format file path of training data. When set,
+      gensim trains in corpus_file mode, which releases the GIL and scales
+      with params.workers.
   Returns:
-    A model of embedding resul by word2vec.
+    A model of embedding resul by word2vec. Its pruned_items attribute lists
+    the (content id, count) dropped from the vocabulary, most frequent
+    first.
   """
-  model = gensim.models.word2vec.Word2Vec(
-      sentences=training_data,
-      sg=_SG,
-      window=_WINDOWS,
-      min_count=_MIN_COUNT,
-      vector_size=_VECTOR_SIZE,
-      hs=_HS,
-      negative=_NEGATIVE,
-      seed=_SEED,
-  )
+  params = params or Word2VecParams()
+  if corpus_file is None:
+    corpus_args = {'sentences': training_data}
+  else:
+    corpus_args = {'corpus_file': corpus_file}
+
+  epoch_timer = instrumentation.EpochTimer()
+  pruned_items = vocab_budget.PrunedItems()
+  with instrumentation.stage(_PHASE_TRAIN) as record:
+    model = gensim.models.word2vec.Word2Vec(
+        **corpus_args,
+        sg=params.sg,
+        window=params.window,
+        min_count=params.min_count,
+        vector_size=params.vector_size,
+        hs=params.hs,
+        negative=params.negative,
+        seed=params.seed,
+        workers=params.workers,
+        epochs=params.epochs,
+        max_final_vocab=vocab_budget.max_final_vocab(
+            params.max_vocab, params.max_memory_mb, params.vector_size,
+            params.hs, params.negative),
+        trim_rule=pruned_items,
+        callbacks=[epoch_timer],
+    )
+    # Saved models must not depend on the timer.
+    model.callbacks = ()
+    record.rows_in = model.corpus_count
+    record.rows_out = len(model.wv)
+    record.words_per_second = epoch_timer.words_per_second()
+  pruned_items.log(model.effective_min_count)
+  # Saved next to the model by _train_and_save for cold-start handling.
+  model.pruned_items = pruned_items.most_frequent()
   logging.info('Finished training of gensim word2vec.')
 
   return model
 
 
 def sort_recommendation_results(
-    model: gensim.models.word2vec.Word2Vec,
+    model: Union[gensim.models.word2vec.Word2Vec, gensim.models.KeyedVectors],
     df_content: pd.DataFrame,
+    block_size: int = constants.BLOCK_SIZE,
+    ann_index: Optional[ann.IVFIndex] = None,
+    num_workers: int = constants.SCORING_WORKERS,
+    cold_start_neighbours: int = _COLD_START_NEIGHBOURS,
+    quantized_vectors: Optional[quantization.QuantizedVectors] = None,
+    rerank_candidates: int = _RERANK_CANDIDATES,
 ) -> pd.DataFrame:
   """Sorts recommendation results for easy use as output data.
 
+  The vector norms are computed once and the content ids are scored in
+  blocks of block_size with one matrix product per block. The vectors are
+  not copied, so memory-mapped keyed vectors stay shared between processes.
+
   Args:
-    model: A model that was trained by gensin word2vec.
+    model: A model that was trained by gensin word2vec, or its keyed vectors.
     df_content: A DataFrame of content data with content id,
       content title and content URL.
+    block_size: A number of content ids scored at once. Peak memory of the
+      scoring step is proportional to block_size * vocabulary size.
+    ann_index: An approximate nearest neighbour index built over the vectors
+      of model. Exact search is used when it is None.
+    num_workers: A number of processes scoring shards of content ids in
+      exact search. The results do not depend on it.
+    cold_start_neighbours: When positive, content ids missing from the
+      vocabulary are embedded from the title and URL columns of df_content
+      with cold_start.embed_cold_items, averaging this many warm content ids,
+      and scored in blocks like the others. When 0, they are skipped.
+    quantized_vectors: Quantized vectors of model to score exact search
+      with instead of the float32 vectors. num_workers is ignored then.
+    rerank_candidates: A number of best quantized candidates of each content
+      id that are re-ranked with the float32 vectors.
 
   Returns:
     A dataframe sorted recommendation data with key content id, recommend
     content id, rank, score.
   """
-  df_result = pd.DataFrame({
-      constants.KEYWORD: pd.Series(dtype='object'),
-      constants.RCM_RESULT: pd.Series(dtype='object'),
-      constants.RANK: pd.Series(dtype='int64'),
-      constants.SCORE: pd.Series(dtype='float64'),
-  })
-
-  for _, content in df_content.iterrows():
-    try:
-      ret = model.wv.most_similar(positive=content[0], topn=_TOP_N)
-    except KeyError as e:
-      logging.debug(
-          'Error happend during loading content item id: %s, %s', content[0], e
-          )
-      continue
-    for i, (rcm_result, score) in enumerate(ret):
-      record = pd.DataFrame(
-          [[content[0],
-            rcm_result,
-            int(i + 1),
-            score]],
-          columns=df_result.columns
-      )
-      df_result = pd.concat([df_result, record])
+  keyed_vectors = getattr(model, 'wv', model)
+  with instrumentation.stage(_PHASE_SCORE, len(df_content)) as record:
+    content_ids = []
+    query_indices = []
+    for content_id in df_content.iloc[:, 0]:
+      index = keyed_vectors.key_to_index.get(content_id)
+      if index is None:
+        logging.debug(
+            'Error happend during loading content item id: %s, %s',
+            content_id,
+            'not present in vocabulary',
+        )
+        continue
+      content_ids.append(content_id)
+      query_indices.append(index)
+
+    if ann_index is None and quantized_vectors is not None:
+      keyed_vectors.fill_norms()
+      indices, scores = quantization.top_n_similar(
+          quantized_vectors, query_indices, constants.TOP_N, block_size,
+          keyed_vectors.vectors, keyed_vectors.norms, rerank_candidates)
+    elif ann_index is None:
+      keyed_vectors.fill_norms()
+      indices, scores = similarity.parallel_top_n_similar(
+          keyed_vectors.vectors, query_indices, constants.TOP_N, block_size,
+          norms=keyed_vectors.norms, num_workers=num_workers,
+      )
+    else:
+      indices, scores = ann_index.search(query_indices, constants.TOP_N,
+                                         block_size)
+    df_result = results.build_top_n_frame(
+        content_ids, keyed_vectors.index_to_key, indices, scores
+    )
+
+    if cold_start_neighbours > 0:
+      keyed_vectors.fill_norms()
+      positions, cold_vectors = cold_start.embed_cold_items(
+          df_content, keyed_vectors, cold_start_neighbours,
+          block_size=block_size)
+      cold_indices, cold_scores = similarity.top_n_for_query_vectors(
+          keyed_vectors.vectors, cold_vectors, constants.TOP_N, block_size,
+          norms=keyed_vectors.norms)
+      df_cold = results.build_top_n_frame(
+          df_content.iloc[positions, 0], keyed_vectors.index_to_key,
+          cold_indices, cold_scores)
+      df_result = pd.concat([df_result, df_cold])
+    record.rows_out = len(df_result)
 
   logging.info('Completed process to sort embedding data.')
   return df_result
 
 
 def execute_ranking_process(
-    training_data: Collection[Collection[str]],
-    ranking_item_name: str
+    training_data: Iterable[Sequence[str]],
+    ranking_item_name: str,
+    ranking_params: Optional[RankingParams] = None,
 ) -> pd.DataFrame:
   """Calculate rank of item ids.
 
+  The content ids are counted in a streaming pass without flattening the
+  training data. Counts collected by a ranking.CountingCorpus during word2vec
+  training are reused without another pass.
+
   Args:
     training_data: An input data to calculate rank.
     ranking_item_name: A name of the item that calls the ranking data in the
     output.
+    ranking_params: Parameters of the popularity count. Defaults to
+      RankingParams().
 
   Returns:
     A dataframe of ranking result top_n.
   """
+  ranking_params = ranking_params or RankingParams()
+  with instrumentation.stage(_PHASE_RANKING) as record:
+    counts = ranking.count_items(
+        training_data,
+        ranking_params.half_life,
+        ranking_params.deduplicate_users,
+    )
+    ranking_data = counts.most_common(constants.TOP_N)
 
-  ranking_data = collections.Counter(list(
-      itertools.chain.from_iterable(training_data)
-  ))
-  ranking_data = ranking_data.most_common(_TOP_N)
-
-  df_ranking = pd.DataFrame({
-      constants.KEYWORD: pd.Series(dtype='object'),
-      constants.RCM_RESULT: pd.Series(dtype='object'),
-      constants.RANK: pd.Series(dtype='int64'),
-      constants.SCORE: pd.Series(dtype='float64'),
-  })
-
-  for i, tuple_items in enumerate(ranking_data):
-    try:
-      record = pd.DataFrame([[ranking_item_name,
-                              tuple_items[0],
-                              int(i + 1),
-                              0]
-                             ], columns=df_ranking.columns
-                            )
-      df_ranking = pd.concat([df_ranking, record])
-    except KeyError as e:
-      logging.debug(
-          'Error happend during loading content item id: %s, %s',
-          tuple_items[0],
-          e,
-      )
-      continue
+    df_ranking = results.build_result_frame(
+        [ranking_item_name] * len(ranking_data),
+        [item for item, _ in ranking_data],
+        range(1, len(ranking_data) + 1),
+        [0] * len(ranking_data),
+    )
+    record.rows_in = len(counts)
+    record.rows_out = len(df_ranking)
   logging.info('Completed process to execute calculation of ranking.')
 
   return df_ranking
 
 
-def execute_content_recommendation_w2v_from_csv(
-    input_file_path: str,
+def execute_cooccurrence_process(
+    training_data: Iterable[Sequence[str]],
+    cooccurrence_params: Optional[CooccurrenceParams] = None,
+    keywords: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+  """Recommends the content ids that co-occur most in sessions.
+
+  Args:
+    training_data: A re-iterable corpus of sessions. A corpus.EncodedCorpus
+      is used as is, and other corpora are encoded in one pass.
+    cooccurrence_params: Parameters of the co-occurrence count. Defaults to
+      CooccurrenceParams().
+    keywords: Content ids to keep recommendations for, or None for all.
+
+  Returns:
+    A dataframe with key content id, recommend content id, rank, NPMI score.
+  """
+  cooccurrence_params = cooccurrence_params or CooccurrenceParams()
+  if isinstance(training_data, corpus.EncodedCorpus):
+    encoded = training_data
+  else:
+    encoded = corpus.EncodedCorpus.from_sessions(training_data)
+
+  with instrumentation.stage(_PHASE_COOCCURRENCE, len(encoded)) as record:
+    df_cooccurrence = cooccurrence.recommend(
+        encoded, cooccurrence_params.window,
+        cooccurrence_params.min_pair_count, constants.TOP_N)
+    if keywords is not None:
+      df_cooccurrence = df_cooccurrence[
+          df_cooccurrence.iloc[:, 0].isin(keywords)]
+    record.rows_out = len(df_cooccurrence)
+
+  return df_cooccurrence
+
+
+def _train_model(
+    training_data: Iterable[Sequence[str]],
+    params: Optional[Word2VecParams],
+    use_corpus_file: bool,
+    base_model_path: Optional[str],
+) -> gensim.models.word2vec.Word2Vec:
+  """Trains a new model or updates a saved model with training data.
+
+  Args:
+    training_data: A re-iterable corpus of sessions as lists of content ids.
+    params: Hyperparameters of word2vec for a new model.
+    use_corpus_file: A flag whether to train in gensim corpus_file mode.
+    base_model_path: A file path of a saved model to update, or None to train
+      from scratch.
+
+  Returns:
+    A trained word2vec model.
+  """
+  def train(corpus_file: Optional[str]) -> gensim.models.word2vec.Word2Vec:
+    if base_model_path:
+      model = model_store.load_model(base_model_path)
+      if params is not None:
+        model.workers = params.workers
+      epoch_timer = instrumentation.EpochTimer()
+      with instrumentation.stage(_PHASE_TRAIN) as record:
+        model = model_store.update_model(model, training_data, corpus_file,
+                                         callbacks=[epoch_timer])
+        record.rows_in = model.corpus_count
+        record.rows_out = len(model.wv)
+        record.words_per_second = epoch_timer.words_per_second()
+      # Content ids pruned before may have entered the vocabulary now.
+      model.pruned_items = [
+          (word, count) for word, count in getattr(model, 'pruned_items', [])
+          if word not in model.wv.key_to_index]
+      return model
+    return execute_embedding_w2v(training_data, params, corpus_file)
+
+  if not use_corpus_file:
+    return train(None)
+
+  with tempfile.TemporaryDirectory() as temp_dir:
+    corpus_file = os.path.join(temp_dir, 'corpus.txt')
+    corpus.write_line_sentence_file(training_data, corpus_file)
+    logging.info('Converted training data into %s.', corpus_file)
+    return train(corpus_file)
+
+
+def _write_recommendations(
+    keyed_vectors: gensim.models.KeyedVectors,
     content_file_path: str,
     output_file_path: str,
-    is_ranking_process: bool = False,
-    ranking_item_name: str = 'undefined',
-    ) -> None:
-  """Trains and predicts contensts recommendation with word2vec.
+    scoring_params: Optional[ScoringParams],
+    training_data: Optional[Iterable[Sequence[str]]],
+    is_ranking_process: bool,
+    ranking_item_name: str,
+    ranking_params: Optional[RankingParams],
+    output_format: str,
+    previous_output_path: Optional[str] = None,
+    diff_output_path: Optional[str] = None,
+    cooccurrence_params: Optional[CooccurrenceParams] = None,
+    keyed_vectors_path: Optional[str] = None,
+) -> None:
+  """Predicts recommendations for content data and writes them as output.
 
   Args:
-    input_file_path: A CSV format file path of training data that the content ID
-      is for each line each user in the order that a certain user saw the
-      content.
+    keyed_vectors: Vectors of a model that was trained by gensim word2vec.
     content_file_path: A CSV format file path of content data with content id,
       content title and content URL.
     output_file_path: A CSV format file path of output.
+    scoring_params: Parameters of the similarity search. Defaults to
+      ScoringParams().
+    training_data: A re-iterable corpus of sessions for the ranking process.
     is_ranking_process: A flag whether to run the ranking process.
     ranking_item_name: A keyword to call the ranking result in outputs.
+    ranking_params: Parameters of the popularity count in the ranking
+      process.
+    output_format: A format of output, results.OUTPUT_FORMAT_CSV or
+      results.OUTPUT_FORMAT_NPZ.
+    previous_output_path: An output file path of the previous run to compare
+      the results with. It may be the same as output_file_path.
+    diff_output_path: A file path to write the inserted, changed and deleted
+      keywords against previous_output_path in output_format.
+    cooccurrence_params: Parameters of the co-occurrence recommendations
+      blended into the word2vec results of training_data.
+    keyed_vectors_path: A file path that keyed_vectors were saved to, whose
+      quantized copy is memory-mapped if it is up to date.
   """
-  df_training = _read_csv(input_file_path)
-  logging.info('Loaded training data with %s.', input_file_path)
-  training_data = df_training['item_list'].apply(lambda x: x.split(',')
-                                                 ).tolist()
-  logging.info(
-      'Completed a process of loaded data into training data for'
-      'gensim word2vec.'
-  )
-
   df_content = _read_csv(content_file_path)
   logging.info('Loaded content data.')
 
-  model = execute_embedding_w2v(training_data)
+  scoring_params = scoring_params or ScoringParams()
+  ann_index = None
+  if scoring_params.ann_clusters > 0:
+    keyed_vectors.fill_norms()
+    ann_index = ann.IVFIndex(
+        scoring_params.ann_clusters, scoring_params.ann_probes
+    ).build(keyed_vectors.vectors, keyed_vectors.norms,
+            scoring_params.block_size)
+    logging.info('Estimated recall@%d of approximate search: %.4f.',
+                 constants.TOP_N,
+                 ann.sampled_recall(ann_index, constants.TOP_N))
+
+  quantized_vectors = None
+  if ann_index is None and scoring_params.quantization != quantization.NONE:
+    quantized_vectors = _quantize_keyed_vectors(
+        keyed_vectors, scoring_params.quantization, keyed_vectors_path)
+    logging.info(
+        'Estimated top-%d overlap of %s search with float32 search: %.4f.',
+        constants.TOP_N, scoring_params.quantization,
+        quantization.sampled_overlap(quantized_vectors, keyed_vectors.vectors,
+                                     keyed_vectors.norms, constants.TOP_N,
+                                     scoring_params.rerank_candidates))
+
+  df_result = sort_recommendation_results(
+      keyed_vectors, df_content, scoring_params.block_size, ann_index,
+      scoring_params.num_workers, scoring_params.cold_start_neighbours,
+      quantized_vectors, scoring_params.rerank_candidates)
 
-  df_result = sort_recommendation_results(model, df_content)
+  cooccurrence_params = cooccurrence_params or CooccurrenceParams()
+  if cooccurrence_params.weight > 0:
+    df_cooccurrence = execute_cooccurrence_process(
+        training_data, cooccurrence_params, df_content.iloc[:, 0])
+    df_result = cooccurrence.blend_results(
+        df_result, df_cooccurrence, cooccurrence_params.weight, constants.TOP_N)
 
   if is_ranking_process:
-    df_ranking = execute_ranking_process(training_data, ranking_item_name)
+    df_ranking = execute_ranking_process(training_data, ranking_item_name,
+                                         ranking_params)
     df_result = pd.concat([df_result, df_ranking])
 
-  df_result.to_csv(output_file_path, index=False)
+  df_outputs = [(df_result, output_file_path)]
+  if previous_output_path:
+    df_outputs.append((publish.diff_with_previous_output(
+        df_result, previous_output_path), diff_output_path))
+
+  for df_output, path in df_outputs:
+    _write_result_frame(df_output, path, output_format)
   logging.info('Completed exportion of predicted data.')
 
+
+def _quantize_keyed_vectors(
+    keyed_vectors: gensim.models.KeyedVectors,
+    method: str,
+    keyed_vectors_path: Optional[str] = None,
+) -> quantization.QuantizedVectors:
+  """Loads the saved quantized copy of keyed vectors or quantizes them.
+
+  Args:
+    keyed_vectors: Vectors of a model that was trained by gensim word2vec.
+    method: quantization.FLOAT16 or quantization.INT8.
+    keyed_vectors_path: A file path that keyed_vectors were saved to, or
+      None if they were not saved.
+
+  Returns:
+    Quantized vectors of keyed_vectors.
+  """
+  keyed_vectors.fill_norms()
+  if keyed_vectors_path:
+    path = quantization.quantized_path(keyed_vectors_path, method)
+    if (quantization.exists(path) and quantization.modified_time(path)
+        >= os.path.getmtime(keyed_vectors_path)):
+      quantized_vectors = quantization.load(path)
+      if quantized_vectors.values.shape == keyed_vectors.vectors.shape:
+        logging.info('Loaded %s vectors from %s.', method, path)
+        return quantized_vectors
+
+  quantized_vectors = quantization.quantize(keyed_vectors.vectors, method,
+                                            keyed_vectors.norms)
+  logging.info('Quantized vectors of %d bytes into %s vectors of %d bytes.',
+               keyed_vectors.vectors.nbytes, method, quantized_vectors.nbytes)
+  return quantized_vectors
+
+
+def _write_result_frame(
+    df_output: pd.DataFrame,
+    path: str,
+    output_format: str,
+) -> None:
+  """Writes recommendation results in output_format."""
+  with instrumentation.stage(_PHASE_WRITE, len(df_output)) as record:
+    if output_format == results.OUTPUT_FORMAT_NPZ:
+      results.write_npz(df_output, path)
+    else:
+      df_output.to_csv(path, index=False)
+    record.rows_out = len(df_output)
+
+
+def _open_training_data(
+    input_file_path: str,
+    chunk_size: int,
+    encoded_corpus_path: Optional[str],
+    encode: bool = False,
+) -> Union[corpus.ItemListCorpus, corpus.EncodedCorpus]:
+  """Opens training data as a streaming or an integer-encoded corpus.
+
+  Args:
+    input_file_path: A CSV format file path of training data.
+    chunk_size: A number of training data rows read at once.
+    encoded_corpus_path: A directory path of an encoded corpus of
+      input_file_path, or None to stream the CSV. The corpus is encoded and
+      saved there if it is missing or stale.
+    encode: A flag whether to encode the CSV in memory instead of streaming
+      it when encoded_corpus_path is None.
+
+  Returns:
+    A re-iterable corpus of sessions as lists of content ids.
+  """
+  if encoded_corpus_path:
+    return corpus.load_or_encode(encoded_corpus_path, input_file_path,
+                                 chunk_size)
+  if encode:
+    return corpus.EncodedCorpus.from_csv(input_file_path, chunk_size)
+  training_data = corpus.ItemListCorpus(input_file_path, chunk_size)
+  logging.info('Opened streaming training data with %s.', input_file_path)
+  return training_data
+
+
+def _is_preprocessing(
+    preprocessing_params: Optional[PreprocessingParams],
+) -> bool:
+  """Returns whether preprocessing_params change the training data."""
+  return preprocessing_params not in (None, PreprocessingParams())
+
+
+def _preprocess_training_data(
+    training_data: Union[corpus.ItemListCorpus, corpus.EncodedCorpus],
+    preprocessing_params: Optional[PreprocessingParams],
+) -> Union[corpus.ItemListCorpus, corpus.EncodedCorpus]:
+  """Shrinks an encoded corpus before training if requested.
+
+  Args:
+    training_data: A corpus opened by _open_training_data, encoded if
+      preprocessing_params change the training data.
+    preprocessing_params: Parameters of the preprocessing, or None.
+
+  Returns:
+    The preprocessed corpus, or training_data if there is nothing to do.
+  """
+  if not _is_preprocessing(preprocessing_params):
+    return training_data
+
+  with instrumentation.stage(_PHASE_PREPROCESS,
+                             len(training_data.tokens)) as record:
+    training_corpus, _ = preprocessing.preprocess(
+        training_data,
+        collapse=preprocessing_params.collapse_repeats,
+        max_length=preprocessing_params.max_session_length,
+        split_long=preprocessing_params.split_long_sessions,
+        min_length=preprocessing_params.min_session_length,
+    )
+    record.rows_out = len(training_corpus.tokens)
+  return training_corpus
+
+
+def _train_and_save(
+    training_data: Iterable[Sequence[str]],
+    keyed_vectors_path: Optional[str],
+    params: Optional[Word2VecParams],
+    use_corpus_file: bool,
+    base_model_path: Optional[str],
+    save_model_path: Optional[str],
+    quantization_method: str = quantization.NONE,
+) -> gensim.models.word2vec.Word2Vec:
+  """Trains a model and saves the model and keyed vectors if requested.
+
+  See execute_training_from_csv for the arguments.
+  """
+  model = _train_model(training_data, params, use_corpus_file,
+                       base_model_path)
+  pruned_items = getattr(model, 'pruned_items', [])
+  if save_model_path:
+    model_store.save_model(model, save_model_path)
+    vocab_budget.save_pruned_items(
+        pruned_items, vocab_budget.pruned_items_path(save_model_path))
+  if keyed_vectors_path:
+    model_store.save_keyed_vectors(model.wv, keyed_vectors_path)
+    vocab_budget.save_pruned_items(
+        pruned_items, vocab_budget.pruned_items_path(keyed_vectors_path))
+    if quantization_method != quantization.NONE:
+      path = quantization.quantized_path(keyed_vectors_path,
+                                         quantization_method)
+      quantization.save(_quantize_keyed_vectors(model.wv, quantization_method),
+                        path)
+      logging.info('Saved %s vectors into %s.', quantization_method, path)
+
+  return model
+
+
+def execute_training_from_csv(
+    input_file_path: str,
+    keyed_vectors_path: Optional[str],
+    chunk_size: int = _CHUNK_SIZE,
+    params: Optional[Word2VecParams] = None,
+    use_corpus_file: bool = False,
+    base_model_path: Optional[str] = None,
+    save_model_path: Optional[str] = None,
+    encoded_corpus_path: Optional[str] = None,
+    preprocessing_params: Optional[PreprocessingParams] = None,
+    quantization_method: str = quantization.NONE,
+    ) -> gensim.models.word2vec.Word2Vec:
+  """Trains a word2vec model and saves it for later prediction.
+
+  Args:
+    input_file_path: A CSV format file path of training data that the content ID
+      is for each line each user in the order that a certain user saw the
+      content. Gzip compressed files with .gz extension are also supported.
+    keyed_vectors_path: A file path to save the keyed vectors for
+      execute_prediction_from_keyed_vectors, or None not to save them.
+    chunk_size: A number of training data rows read at once.
+    params: Hyperparameters of word2vec. Defaults to Word2VecParams().
+    use_corpus_file: A flag whether to convert the training data into a
+      temporary LineSentence format file and train in gensim corpus_file
+      mode.
+    base_model_path: A file path of a model saved with save_model_path. When
+      set, the model continues training only on input_file_path instead of
+      training from scratch, and the hyperparameters of the saved model are
+      reused.
+    save_model_path: A file path to save the trained model for later
+      incremental updates.
+    encoded_corpus_path: A directory path of an integer-encoded corpus of
+      input_file_path. The corpus is encoded and saved there if it is missing
+      or stale, and reloaded instantly otherwise.
+    preprocessing_params: Parameters of shrinking the training data before
+      training. The training data is encoded in memory if they change it.
+    quantization_method: quantization.FLOAT16 or quantization.INT8 to also
+      save a quantized copy of the keyed vectors for the predict stage.
+
+  Returns:
+    A trained word2vec model.
+  """
+  training_data = _open_training_data(
+      input_file_path, chunk_size, encoded_corpus_path,
+      _is_preprocessing(preprocessing_params))
+  training_data = _preprocess_training_data(training_data,
+                                            preprocessing_params)
+
+  return _train_and_save(training_data, keyed_vectors_path, params,
+                         use_corpus_file, base_model_path, save_model_path,
+                         quantization_method)
+
+
+def execute_prediction_from_keyed_vectors(
+    keyed_vectors_path: str,
+    content_file_path: str,
+    output_file_path: str,
+    scoring_params: Optional[ScoringParams] = None,
+    input_file_path: Optional[str] = None,
+    is_ranking_process: bool = False,
+    ranking_item_name: str = 'undefined',
+    chunk_size: int = _CHUNK_SIZE,
+    ranking_params: Optional[RankingParams] = None,
+    encoded_corpus_path: Optional[str] = None,
+    output_format: str = results.OUTPUT_FORMAT_CSV,
+    previous_output_path: Optional[str] = None,
+    diff_output_path: Optional[str] = None,
+    cooccurrence_params: Optional[CooccurrenceParams] = None,
+    ) -> None:
+  """Predicts contents recommendation with saved word2vec keyed vectors.
+
+  The keyed vectors are memory-mapped read-only, so several prediction
+  processes on one host share a single physical copy of the vectors.
+
+  Args:
+    keyed_vectors_path: A file path of keyed vectors saved by
+      execute_training_from_csv.
+    content_file_path: A CSV format file path of content data with content id,
+      content title and content URL.
+    output_file_path: A CSV format file path of output.
+    scoring_params: Parameters of the similarity search. Defaults to
+      ScoringParams().
+    input_file_path: A CSV format file path of training data for the ranking
+      process.
+    is_ranking_process: A flag whether to run the ranking process. It
+      requires input_file_path.
+    ranking_item_name: A keyword to call the ranking result in outputs.
+    chunk_size: A number of training data rows read at once.
+    ranking_params: Parameters of the popularity count in the ranking
+      process. Defaults to RankingParams().
+    encoded_corpus_path: A directory path of an integer-encoded corpus of
+      input_file_path for the ranking process.
+    output_format: A format of output. results.OUTPUT_FORMAT_NPZ writes a
+      binary columnar .npz file instead of CSV.
+    previous_output_path: An output file path of the previous run. Only the
+      keywords whose recommendations changed against it are written to
+      diff_output_path.
+    diff_output_path: A file path of the differential output to publish.
+    cooccurrence_params: Parameters of the co-occurrence recommendations. A
+      positive weight blends them into the results and requires
+      input_file_path.
+  """
+  keyed_vectors = model_store.load_keyed_vectors(keyed_vectors_path)
+  cooccurrence_params = cooccurrence_params or CooccurrenceParams()
+  training_data = None
+  if is_ranking_process or cooccurrence_params.weight > 0:
+    training_data = _open_training_data(input_file_path, chunk_size,
+                                        encoded_corpus_path)
+
+  _write_recommendations(keyed_vectors, content_file_path, output_file_path,
+                         scoring_params, training_data, is_ranking_process,
+                         ranking_item_name, ranking_params, output_format,
+                         previous_output_path, diff_output_path,
+                         cooccurrence_params, keyed_vectors_path)
+  logging.info('Completed process.')
+
+
+def execute_user_recommendation_from_keyed_vectors(
+    keyed_vectors_path: str,
+    input_file_path: str,
+    output_file_path: str,
+    session_params: Optional[SessionParams] = None,
+    scoring_params: Optional[ScoringParams] = None,
+    chunk_size: int = _CHUNK_SIZE,
+    ) -> None:
+  """Predicts contents recommendation for each user from recent sessions.
+
+  Args:
+    keyed_vectors_path: A file path of keyed vectors saved by
+      execute_training_from_csv.
+    input_file_path: A CSV format file path of training data with user_id and
+      item_list.
+    output_file_path: A CSV format file path of output with the user id in
+      the keyword column.
+    session_params: Parameters of the users' query vectors. Defaults to
+      SessionParams().
+    scoring_params: Parameters of the similarity search. Defaults to
+      ScoringParams().
+    chunk_size: A number of users read and scored at once.
+  """
+  session_params = session_params or SessionParams()
+  scoring_params = scoring_params or ScoringParams()
+  keyed_vectors = model_store.load_keyed_vectors(keyed_vectors_path)
+  session_recommendations.recommend_for_users(
+      input_file_path,
+      keyed_vectors,
+      output_file_path,
+      num_recent_items=session_params.num_recent_items,
+      half_life=session_params.half_life,
+      top_n=constants.TOP_N,
+      chunk_size=chunk_size,
+      block_size=scoring_params.block_size,
+  )
+  logging.info('Completed process.')
+
+
+def execute_cooccurrence_recommendation_from_csv(
+    input_file_path: str,
+    output_file_path: str,
+    cooccurrence_params: Optional[CooccurrenceParams] = None,
+    chunk_size: int = _CHUNK_SIZE,
+    encoded_corpus_path: Optional[str] = None,
+    output_format: str = results.OUTPUT_FORMAT_CSV,
+    ) -> None:
+  """Recommends contents by session co-occurrence without word2vec.
+
+  Args:
+    input_file_path: A CSV format file path of training data.
+    output_file_path: A file path of output.
+    cooccurrence_params: Parameters of the co-occurrence count. Defaults to
+      CooccurrenceParams().
+    chunk_size: A number of training data rows read at once.
+    encoded_corpus_path: A directory path of an integer-encoded corpus of
+      input_file_path.
+    output_format: A format of output. results.OUTPUT_FORMAT_NPZ writes a
+      binary columnar .npz file instead of CSV.
+  """
+  training_data = _open_training_data(input_file_path, chunk_size,
+                                      encoded_corpus_path)
+  df_result = execute_cooccurrence_process(training_data, cooccurrence_params)
+  _write_result_frame(df_result, output_file_path, output_format)
+  logging.info('Completed process.')
+
+
+def execute_content_recommendation_w2v_from_csv(
+    input_file_path: str,
+    content_file_path: str,
+    output_file_path: str,
+    is_ranking_process: bool = False,
+    ranking_item_name: str = 'undefined',
+    scoring_params: Optional[ScoringParams] = None,
+    chunk_size: int = _CHUNK_SIZE,
+    params: Optional[Word2VecParams] = None,
+    use_corpus_file: bool = False,
+    base_model_path: Optional[str] = None,
+    save_model_path: Optional[str] = None,
+    keyed_vectors_path: Optional[str] = None,
+    ranking_params: Optional[RankingParams] = None,
+    encoded_corpus_path: Optional[str] = None,
+    output_format: str = results.OUTPUT_FORMAT_CSV,
+    previous_output_path: Optional[str] = None,
+    diff_output_path: Optional[str] = None,
+    cooccurrence_params: Optional[CooccurrenceParams] = None,
+    preprocessing_params: Optional[PreprocessingParams] = None,
+    ) -> None:
+  """Trains and predicts contensts recommendation with word2vec.
+
+  The training data is streamed from input_file_path in chunks on every pass,
+  so memory use does not grow with the size of the input.
+
+  Args:
+    input_file_path: A CSV format file path of training data that the content ID
+      is for each line each user in the order that a certain user saw the
+      content. Gzip compressed files with .gz extension are also supported.
+    content_file_path: A CSV format file path of content data with content id,
+      content title and content URL.
+    output_file_path: A CSV format file path of output.
+    is_ranking_process: A flag whether to run the ranking process.
+    ranking_item_name: A keyword to call the ranking result in outputs.
+    scoring_params: Parameters of the similarity search. Defaults to
+      ScoringParams().
+    chunk_size: A number of training data rows read at once.
+    params: Hyperparameters of word2vec. Defaults to Word2VecParams().
+    use_corpus_file: A flag whether to convert the training data into a
+      temporary LineSentence format file and train in gensim corpus_file
+      mode.
+    base_model_path: A file path of a model saved with save_model_path. When
+      set, the model continues training only on input_file_path instead of
+      training from scratch, and the hyperparameters of the saved model are
+      reused.
+    save_model_path: A file path to save the trained model for later
+      incremental updates.
+    keyed_vectors_path: A file path to also save the keyed vectors for
+      execute_prediction_from_keyed_vectors. A quantized copy is saved next
+      to them if scoring_params set a quantization.
+    ranking_params: Parameters of the popularity count in the ranking
+      process. Defaults to RankingParams(). The count is folded into the
+      pass that builds the word2vec vocabulary.
+    encoded_corpus_path: A directory path of an integer-encoded corpus of
+      input_file_path. The corpus is encoded and saved there if it is missing
+      or stale, and reloaded instantly otherwise.
+    output_format: A format of output. results.OUTPUT_FORMAT_NPZ writes a
+      binary columnar .npz file instead of CSV.
+    previous_output_path: An output file path of the previous run. Only the
+      keywords whose recommendations changed against it are written to
+      diff_output_path.
+    diff_output_path: A file path of the differential output to publish.
+    cooccurrence_params: Parameters of the co-occurrence recommendations. A
+      positive weight blends them into the word2vec results.
+    preprocessing_params: Parameters of shrinking the training data before
+      training. The training data is encoded in memory if they change it,
+      and the ranking and co-occurrence processes still use all of it.
+  """
+  training_data = _open_training_data(
+      input_file_path, chunk_size, encoded_corpus_path,
+      _is_preprocessing(preprocessing_params))
+  if is_ranking_process and not isinstance(training_data,
+                                           corpus.EncodedCorpus):
+    ranking_params = ranking_params or RankingParams()
+    training_data = ranking.CountingCorpus(
+        training_data,
+        ranking_params.half_life,
+        ranking_params.deduplicate_users,
+    )
+
+  scoring_params = scoring_params or ScoringParams()
+  model = _train_and_save(
+      _preprocess_training_data(training_data, preprocessing_params),
+      keyed_vectors_path, params, use_corpus_file, base_model_path,
+      save_model_path, scoring_params.quantization)
+
+  _write_recommendations(model.wv, content_file_path, output_file_path,
+                         scoring_params, training_data, is_ranking_process,
+                         ranking_item_name, ranking_params, output_format,
+                         previous_output_path, diff_output_path,
+                         cooccurrence_params, keyed_vectors_path)
   logging.info('Completed process.')
 
 
@@ -246,25 +1054,64 @@ def parse_cli_args() -> argparse.Namespace:
     An instance of argparse.Namespace with arg values.
   """
   parser = argparse.ArgumentParser()
+  parser.add_argument(
+      '--stage', '-s',
+      help=('Pipeline stage to run. "train" saves keyed vectors, "predict" '
+            'loads them and "all" runs both in one process. "users" loads '
+            'them and recommends content to each user in the input. '
+            '"cooccurrence" recommends by session co-occurrence without '
+            'word2vec.'),
+      default=_STAGE_ALL,
+      required=False,
+      choices=(_STAGE_ALL, _STAGE_TRAIN, _STAGE_PREDICT, _STAGE_USERS,
+               _STAGE_COOCCURRENCE),
+      type=str,
+      )
   parser.add_argument(
       '--input', '-i',
       help='Input data file path to train models.',
       default=None,
-      required=True,
+      required=False,
       type=str,
       )
   parser.add_argument(
       '--content', '-c',
       help='Content file path to macth content id with URL in the outputs.',
       default=None,
-      required=True,
+      required=False,
       type=str,
       )
   parser.add_argument(
       '--output', '-o',
       help='Output file path for prediction results.',
       default=None,
-      required=True,
+      required=False,
+      type=str,
+      )
+  parser.add_argument(
+      '--output_format', '-of',
+      help=('Format of the output file. "npz" writes integer-coded binary '
+            'records that load without parsing.'),
+      default=results.OUTPUT_FORMAT_CSV,
+      required=False,
+      choices=(results.OUTPUT_FORMAT_CSV, results.OUTPUT_FORMAT_NPZ),
+      type=str,
+      )
+  parser.add_argument(
+      '--previous_output', '-po',
+      help=('Output file path of the previous run. Keywords whose '
+            'recommendations changed against it are written to '
+            '--diff_output.'),
+      default=None,
+      required=False,
+      type=str,
+      )
+  parser.add_argument(
+      '--diff_output', '-do',
+      help=('File path of the differential output with inserted, changed '
+            'and deleted keywords for firestore.py.'),
+      default=None,
+      required=False,
       type=str,
       )
   parser.add_argument(
@@ -281,19 +1128,423 @@ def parse_cli_args() -> argparse.Namespace:
       required=False,
       type=str,
       )
+  parser.add_argument(
+      '--ranking_half_life', '-rh',
+      help=('Number of later content ids in a user\'s item_list after which '
+            'a view counts half in the ranking. No decay if omitted.'),
+      default=None,
+      required=False,
+      type=float,
+      )
+  parser.add_argument(
+      '--ranking_per_user', '-ru',
+      help='Whether each user counts a content id at most once in the ranking.',
+      default=False,
+      required=False,
+      action=argparse.BooleanOptionalAction,
+      )
+  parser.add_argument(
+      '--recent_items', '-ki',
+      help=('Number of latest content ids in a user\'s item_list that the '
+            'users stage builds the user\'s query from.'),
+      default=_RECENT_ITEMS,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--recent_half_life', '-kh',
+      help=('Number of earlier content ids after which a content id weighs '
+            'half in the users stage.'),
+      default=_RECENT_HALF_LIFE,
+      required=False,
+      type=float,
+      )
+  parser.add_argument(
+      '--block_size', '-b',
+      help='Number of content ids scored at once in the similarity search.',
+      default=constants.BLOCK_SIZE,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--ann_clusters', '-ac',
+      help=('Number of k-means clusters of an approximate nearest neighbour '
+            'index. 0 uses exact search.'),
+      default=_ANN_CLUSTERS,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--ann_probes', '-ap',
+      help='Number of closest clusters scored in approximate search.',
+      default=_ANN_PROBES,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--scoring_workers', '-sw',
+      help='Number of processes scoring shards of content ids.',
+      default=constants.SCORING_WORKERS,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--cold_start_neighbours', '-csn',
+      help=('Number of text-similar content ids that content ids missing '
+            'from the vocabulary are embedded from, by the title and URL in '
+            'the content data. 0 skips them.'),
+      default=_COLD_START_NEIGHBOURS,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--quantization', '-q',
+      help=('Precision of the vectors in exact search. float16 and int8 '
+            'keep 2 and about 4 times less vector memory, are upcast in '
+            'chunks to score, and re-rank the best candidates with float32 '
+            'vectors. The train stage also saves a quantized copy of the '
+            'keyed vectors.'),
+      default=quantization.NONE,
+      required=False,
+      choices=quantization.METHODS,
+      )
+  parser.add_argument(
+      '--rerank_candidates', '-rc',
+      help=('Number of best quantized candidates of each content id that '
+            'are re-ranked with float32 vectors.'),
+      default=_RERANK_CANDIDATES,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--cooccurrence_window', '-cw',
+      help='Maximum distance in a session between co-occurring content ids.',
+      default=_COOCCURRENCE_WINDOW,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--cooccurrence_min_count', '-cmc',
+      help='Minimum number of co-occurrences of a recommended pair.',
+      default=_COOCCURRENCE_MIN_PAIR_COUNT,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--cooccurrence_weight', '-cwt',
+      help=('Weight in [0, 1] of the co-occurrence score blended into the '
+            'word2vec similarity. 0 does not blend.'),
+      default=_COOCCURRENCE_WEIGHT,
+      required=False,
+      type=float,
+      )
+  parser.add_argument(
+      '--chunk_size', '-cs',
+      help='Number of training data rows read at once.',
+      default=_CHUNK_SIZE,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--use_corpus_file', '-cf',
+      help=('Whether to train in gensim corpus_file mode through a temporary '
+            'LineSentence format file.'),
+      default=False,
+      required=False,
+      action=argparse.BooleanOptionalAction,
+      )
+  parser.add_argument(
+      '--sg',
+      help='Training algorithm of word2vec, 1 for skip-gram and 0 for CBOW.',
+      default=_SG,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--window',
+      help='Maximum distance between the current and predicted content id.',
+      default=_WINDOWS,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--min_count',
+      help='Ignores content ids with lower total frequency than this.',
+      default=_MIN_COUNT,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--vector_size',
+      help='Dimensionality of the embedding vectors.',
+      default=_VECTOR_SIZE,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--hs',
+      help='1 for hierarchical softmax, 0 for negative sampling.',
+      default=_HS,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--negative',
+      help='Number of noise content ids drawn for negative sampling.',
+      default=_NEGATIVE,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--seed',
+      help='Seed for the random number generator of word2vec.',
+      default=_SEED,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--workers', '-w',
+      help='Number of worker threads to train word2vec.',
+      default=_WORKERS,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--epochs',
+      help='Number of iterations over the training data.',
+      default=_EPOCHS,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--max_vocab', '-mv',
+      help=('Maximum number of content ids in the word2vec vocabulary. The '
+            'rarest content ids are pruned to fit.'),
+      default=None,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--max_memory', '-mm',
+      help=('Memory budget of the word2vec model in MiB. The rarest content '
+            'ids are pruned so that their vectors fit.'),
+      default=None,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--collapse_repeats',
+      help=('Whether to collapse consecutive repeats of a content id before '
+            'training.'),
+      default=False,
+      required=False,
+      action=argparse.BooleanOptionalAction,
+      )
+  parser.add_argument(
+      '--max_session_length',
+      help=('Maximum number of content ids per session for training. Longer '
+            'sessions keep their last content ids. 0 means no limit.'),
+      default=_MAX_SESSION_LENGTH,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--split_long_sessions',
+      help=('Whether to split sessions longer than --max_session_length into '
+            'pieces instead of truncating them.'),
+      default=False,
+      required=False,
+      action=argparse.BooleanOptionalAction,
+      )
+  parser.add_argument(
+      '--min_session_length',
+      help='Drop sessions with fewer content ids than this before training.',
+      default=_MIN_SESSION_LENGTH,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--base_model', '-bm',
+      help=('Saved model file path to continue training only on the input '
+            'data instead of training from scratch.'),
+      default=None,
+      required=False,
+      type=str,
+      )
+  parser.add_argument(
+      '--save_model', '-sm',
+      help='File path to save the trained model for incremental updates.',
+      default=None,
+      required=False,
+      type=str,
+      )
+  parser.add_argument(
+      '--encoded_corpus', '-ec',
+      help=('Directory path of an integer-encoded copy of the input data. It '
+            'is created if missing or stale and reloaded instantly otherwise.'),
+      default=None,
+      required=False,
+      type=str,
+      )
+  parser.add_argument(
+      '--keyed_vectors', '-kv',
+      help=('File path of the keyed vectors saved by the train stage and '
+            'memory-mapped by the predict stage.'),
+      default=None,
+      required=False,
+      type=str,
+      )
+  parser.add_argument(
+      '--run_report', '-rr',
+      help=('File path of a JSON report with the wall time, CPU time, peak '
+            'RSS and row counts of each pipeline step.'),
+      default=None,
+      required=False,
+      type=str,
+      )
+  parser.add_argument(
+      '--profile', '-pf',
+      help='Directory to write cProfile stats of each pipeline step into.',
+      default=None,
+      required=False,
+      type=str,
+      )
 
-  return parser.parse_args()
+  args = parser.parse_args()
+  required_args = {
+      _STAGE_ALL: ('input', 'content', 'output'),
+      _STAGE_TRAIN: ('input', 'keyed_vectors'),
+      _STAGE_PREDICT: ('content', 'output', 'keyed_vectors'),
+      _STAGE_USERS: ('input', 'output', 'keyed_vectors'),
+      _STAGE_COOCCURRENCE: ('input', 'output'),
+  }[args.stage]
+  if args.stage == _STAGE_PREDICT and (args.is_ranking
+                                       or args.cooccurrence_weight > 0):
+    required_args += ('input',)
+  missing_args = [name for name in required_args
+                  if getattr(args, name) is None]
+  if missing_args:
+    parser.error(
+        'the following arguments are required for the %s stage: %s' % (
+            args.stage, ', '.join('--' + name for name in missing_args)))
+  if (args.previous_output is None) != (args.diff_output is None):
+    parser.error('--previous_output and --diff_output must be set together.')
+  if not 0 <= args.cooccurrence_weight <= 1:
+    parser.error('--cooccurrence_weight must be in [0, 1].')
+
+  return args
 
 
 def main() -> None:
   """Executes contenst recommendation using word2vec for file type."""
   args = parse_cli_args()
-  execute_content_recommendation_w2v_from_csv(args.input,
-                                              args.content,
-                                              args.output,
-                                              args.is_ranking,
-                                              args.ranking_item_name,
-                                              )
+  params = Word2VecParams(
+      sg=args.sg,
+      window=args.window,
+      min_count=args.min_count,
+      vector_size=args.vector_size,
+      hs=args.hs,
+      negative=args.negative,
+      seed=args.seed,
+      workers=args.workers,
+      epochs=args.epochs,
+      max_vocab=args.max_vocab,
+      max_memory_mb=args.max_memory,
+  )
+  scoring_params = ScoringParams(
+      block_size=args.block_size,
+      ann_clusters=args.ann_clusters,
+      ann_probes=args.ann_probes,
+      num_workers=args.scoring_workers,
+      cold_start_neighbours=args.cold_start_neighbours,
+      quantization=args.quantization,
+      rerank_candidates=args.rerank_candidates,
+  )
+  ranking_params = RankingParams(
+      half_life=args.ranking_half_life,
+      deduplicate_users=args.ranking_per_user,
+  )
+  session_params = SessionParams(
+      num_recent_items=args.recent_items,
+      half_life=args.recent_half_life,
+  )
+  preprocessing_params = PreprocessingParams(
+      collapse_repeats=args.collapse_repeats,
+      max_session_length=args.max_session_length,
+      split_long_sessions=args.split_long_sessions,
+      min_session_length=args.min_session_length,
+  )
+  cooccurrence_params = CooccurrenceParams(
+      window=args.cooccurrence_window,
+      min_pair_count=args.cooccurrence_min_count,
+      weight=args.cooccurrence_weight,
+  )
+  with instrumentation.recording(args.run_report, args.profile):
+    if args.stage == _STAGE_TRAIN:
+      execute_training_from_csv(args.input,
+                                args.keyed_vectors,
+                                args.chunk_size,
+                                params,
+                                args.use_corpus_file,
+                                args.base_model,
+                                args.save_model,
+                                args.encoded_corpus,
+                                preprocessing_params,
+                                args.quantization,
+                                )
+    elif args.stage == _STAGE_PREDICT:
+      execute_prediction_from_keyed_vectors(args.keyed_vectors,
+                                            args.content,
+                                            args.output,
+                                            scoring_params,
+                                            args.input,
+                                            args.is_ranking,
+                                            args.ranking_item_name,
+                                            args.chunk_size,
+                                            ranking_params,
+                                            args.encoded_corpus,
+                                            args.output_format,
+                                            args.previous_output,
+                                            args.diff_output,
+                                            cooccurrence_params,
+                                            )
+    elif args.stage == _STAGE_USERS:
+      execute_user_recommendation_from_keyed_vectors(args.keyed_vectors,
+                                                     args.input,
+                                                     args.output,
+                                                     session_params,
+                                                     scoring_params,
+                                                     args.chunk_size,
+                                                     )
+    elif args.stage == _STAGE_COOCCURRENCE:
+      execute_cooccurrence_recommendation_from_csv(args.input,
+                                                   args.output,
+                                                   cooccurrence_params,
+                                                   args.chunk_size,
+                                                   args.encoded_corpus,
+                                                   args.output_format,
+                                                   )
+    else:
+      execute_content_recommendation_w2v_from_csv(args.input,
+                                                  args.content,
+                                                  args.output,
+                                                  args.is_ranking,
+                                                  args.ranking_item_name,
+                                                  scoring_params,
+                                                  args.chunk_size,
+                                                  params,
+                                                  args.use_corpus_file,
+                                                  args.base_model,
+                                                  args.save_model,
+                                                  args.keyed_vectors,
+                                                  ranking_params,
+                                                  args.encoded_corpus,
+                                                  args.output_format,
+                                                  args.previous_output,
+                                                  args.diff_output,
+                                                  cooccurrence_params,
+                                                  preprocessing_params,
+                                                  )
 
 
 if __name__ == '__main__':
@@ -14,11 +14,16 @@
 
 """Tests for main.py."""
 import argparse
+import json
 import os
 import sys
+import tempfile
 import unittest
 from unittest import mock
+import constants
+import instrumentation
 import main
+import numpy as np
 import pandas as pd
 
 _USER_ID = 'user_id'
@@ -36,6 +41,50 @@ _DUMMY_RANKING_PROCESS_FALSE = False
 _DUMMY_RANKING_ITEN_NAME = 'Dummy_Ranking'
 _DEFAULT_RANKING_ITEM_NAME = 'undefined'
 
+_DEFAULT_OPTIONAL_ARGS = {
+    'stage': main._STAGE_ALL,
+    'output_format': main.results.OUTPUT_FORMAT_CSV,
+    'previous_output': None,
+    'diff_output': None,
+    'ranking_half_life': None,
+    'ranking_per_user': False,
+    'recent_items': main._RECENT_ITEMS,
+    'recent_half_life': main._RECENT_HALF_LIFE,
+    'block_size': constants.BLOCK_SIZE,
+    'ann_clusters': main._ANN_CLUSTERS,
+    'ann_probes': main._ANN_PROBES,
+    'scoring_workers': constants.SCORING_WORKERS,
+    'cold_start_neighbours': main._COLD_START_NEIGHBOURS,
+    'quantization': main.quantization.NONE,
+    'rerank_candidates': main._RERANK_CANDIDATES,
+    'cooccurrence_window': main._COOCCURRENCE_WINDOW,
+    'cooccurrence_min_count': main._COOCCURRENCE_MIN_PAIR_COUNT,
+    'cooccurrence_weight': main._COOCCURRENCE_WEIGHT,
+    'chunk_size': main._CHUNK_SIZE,
+    'use_corpus_file': False,
+    'sg': main._SG,
+    'window': main._WINDOWS,
+    'min_count': main._MIN_COUNT,
+    'vector_size': main._VECTOR_SIZE,
+    'hs': main._HS,
+    'negative': main._NEGATIVE,
+    'seed': main._SEED,
+    'workers': main._WORKERS,
+    'epochs': main._EPOCHS,
+    'max_vocab': None,
+    'max_memory': None,
+    'collapse_repeats': False,
+    'max_session_length': main._MAX_SESSION_LENGTH,
+    'split_long_sessions': False,
+    'min_session_length': main._MIN_SESSION_LENGTH,
+    'base_model': None,
+    'save_model': None,
+    'encoded_corpus': None,
+    'keyed_vectors': None,
+    'run_report': None,
+    'profile': None,
+}
+
 _DUMMY_COMMON_PATH = '/path/to'
 _DUMMY_INPUT_FILEPATH = os.path.join(_DUMMY_COMMON_PATH, 'input.csv')
 _DUMMY_CONTENT_FILEPATH = os.path.join(_DUMMY_COMMON_PATH, 'content.csv')
@@ -134,32 +183,41 @@ class MainTest(unittest.TestCase):
     with self.assertRaisesRegex(FileNotFoundError, 'No such file or directory'):
       _ = main._read_csv('')
 
-  @mock.patch('main.pd.read_csv', side_effect=[_DUMMY_DF_TRAINNG,
-                                               _DUMMY_DF_CONTENTS,
-                                               ])
+  def _create_tempdir(self):
+    """Creates a temporary directory removed after the test."""
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    return temp_dir.name
+
+  def _write_dummy_csv_files(self):
+    """Writes dummy training and content data and returns their paths."""
+    temp_dir = self._create_tempdir()
+    input_file_path = os.path.join(temp_dir, 'input.csv')
+    content_file_path = os.path.join(temp_dir, 'content.csv')
+    _DUMMY_DF_TRAINNG.to_csv(input_file_path, index=False)
+    _DUMMY_DF_CONTENTS.to_csv(content_file_path, index=False)
+    return input_file_path, content_file_path
+
   def test_execute_content_recommendation_w2v_from_csv_with_required_params(
       self,
-      _,
       ):
     """Ensures success with correct csv."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
     with mock.patch('main.pd.DataFrame.to_csv') as mock_to_csv:
-      main.execute_content_recommendation_w2v_from_csv(_DUMMY_INPUT_FILEPATH,
-                                                       _DUMMY_CONTENT_FILEPATH,
+      main.execute_content_recommendation_w2v_from_csv(input_file_path,
+                                                       content_file_path,
                                                        _DUMMY_OUTPUT_FILEPATH,
                                                       )
 
       mock_to_csv.assert_called_once_with(_DUMMY_OUTPUT_FILEPATH, index=False)
 
-
-  @mock.patch('main.pd.read_csv', side_effect=[_DUMMY_DF_TRAINNG,
-                                               _DUMMY_DF_CONTENTS,
-                                               ])
-  def test_execute_content_recommendation_w2v_from_csv_with_all_params(self, _):
+  def test_execute_content_recommendation_w2v_from_csv_with_all_params(self):
     """Ensures success with correct csv."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
     with mock.patch('main.pd.DataFrame.to_csv') as mock_to_csv:
       main.execute_content_recommendation_w2v_from_csv(
-          _DUMMY_INPUT_FILEPATH,
-          _DUMMY_CONTENT_FILEPATH,
+          input_file_path,
+          content_file_path,
           _DUMMY_OUTPUT_FILEPATH,
           _DUMMY_RANKING_PROCESS_TRUE,
           _DUMMY_RANKING_ITEN_NAME,
@@ -167,6 +225,358 @@ class MainTest(unittest.TestCase):
 
       mock_to_csv.assert_called_once_with(_DUMMY_OUTPUT_FILEPATH, index=False)
 
+  def test_execute_content_recommendation_w2v_from_csv_with_corpus_file(
+      self,
+      ):
+    """Ensures corpus_file mode trains the model from a converted file."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    output_file_path = os.path.join(self._create_tempdir(), 'output.csv')
+
+    main.execute_content_recommendation_w2v_from_csv(
+        input_file_path,
+        content_file_path,
+        output_file_path,
+        params=main.Word2VecParams(workers=2),
+        use_corpus_file=True,
+        )
+
+    actual_df = pd.read_csv(output_file_path)
+    self.assertEqual(set(actual_df[_KEYWORD]),
+                     set(_DUMMY_DF_RESULTS[_KEYWORD]))
+
+  def test_execute_content_recommendation_w2v_from_csv_with_base_model(
+      self,
+      ):
+    """Ensures a saved model is updated instead of trained from scratch."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    temp_dir = self._create_tempdir()
+    model_path = os.path.join(temp_dir, 'model.w2v')
+    main.model_store.save_model(_DUMMY_MODEL, model_path)
+    updated_model_path = os.path.join(temp_dir, 'updated_model.w2v')
+
+    with mock.patch('main.gensim.models.word2vec.Word2Vec.train',
+                    autospec=True) as mock_train, mock.patch(
+                        'main.pd.DataFrame.to_csv'):
+      main.execute_content_recommendation_w2v_from_csv(
+          input_file_path,
+          content_file_path,
+          _DUMMY_OUTPUT_FILEPATH,
+          base_model_path=model_path,
+          save_model_path=updated_model_path,
+          )
+
+      mock_train.assert_called_once()
+    self.assertTrue(os.path.exists(updated_model_path))
+
+  def test_execute_training_from_csv_saves_pruned_items(self):
+    """Ensures the content ids pruned from the vocabulary are saved."""
+    input_file_path, _ = self._write_dummy_csv_files()
+    keyed_vectors_path = os.path.join(self._create_tempdir(), 'vectors.kv')
+
+    main.execute_training_from_csv(
+        input_file_path, keyed_vectors_path,
+        params=main.Word2VecParams(min_count=1, max_vocab=3, workers=1))
+
+    self.assertEqual(
+        main.vocab_budget.load_pruned_items(
+            main.vocab_budget.pruned_items_path(keyed_vectors_path)),
+        [('ITEM_D', 2), ('ITEM_E', 1)])
+
+  def test_execute_training_and_prediction_stages(self):
+    """Ensures predicting from saved keyed vectors matches one process."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    temp_dir = self._create_tempdir()
+    keyed_vectors_path = os.path.join(temp_dir, 'vectors.kv')
+    output_file_path = os.path.join(temp_dir, 'output.csv')
+    expected_output_file_path = os.path.join(temp_dir, 'expected.csv')
+
+    main.execute_training_from_csv(input_file_path, keyed_vectors_path)
+    main.execute_prediction_from_keyed_vectors(keyed_vectors_path,
+                                               content_file_path,
+                                               output_file_path,
+                                               input_file_path=input_file_path,
+                                               is_ranking_process=True,
+                                               )
+    main.execute_content_recommendation_w2v_from_csv(
+        input_file_path,
+        content_file_path,
+        expected_output_file_path,
+        is_ranking_process=True,
+        )
+
+    pd.testing.assert_frame_equal(pd.read_csv(output_file_path),
+                                  pd.read_csv(expected_output_file_path))
+
+  def test_execute_training_and_prediction_stages_with_quantization(self):
+    """Ensures quantized vectors are saved and give the float32 results."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    temp_dir = self._create_tempdir()
+    keyed_vectors_path = os.path.join(temp_dir, 'vectors.kv')
+    output_file_path = os.path.join(temp_dir, 'output.csv')
+    expected_output_file_path = os.path.join(temp_dir, 'expected.csv')
+
+    main.execute_training_from_csv(
+        input_file_path, keyed_vectors_path,
+        quantization_method=main.quantization.INT8)
+    with self.assertLogs(level='INFO') as log_output:
+      main.execute_prediction_from_keyed_vectors(
+          keyed_vectors_path, content_file_path, output_file_path,
+          main.ScoringParams(quantization=main.quantization.INT8))
+    main.execute_prediction_from_keyed_vectors(
+        keyed_vectors_path, content_file_path, expected_output_file_path)
+
+    self.assertTrue(main.quantization.exists(main.quantization.quantized_path(
+        keyed_vectors_path, main.quantization.INT8)))
+    self.assertTrue(any('Loaded int8 vectors' in line
+                        for line in log_output.output))
+    pd.testing.assert_frame_equal(pd.read_csv(output_file_path),
+                                  pd.read_csv(expected_output_file_path))
+
+  def test_execute_user_recommendation_from_keyed_vectors(self):
+    """Ensures users are recommended only content they did not see."""
+    input_file_path, _ = self._write_dummy_csv_files()
+    temp_dir = self._create_tempdir()
+    keyed_vectors_path = os.path.join(temp_dir, 'vectors.kv')
+    output_file_path = os.path.join(temp_dir, 'output.csv')
+
+    main.execute_training_from_csv(input_file_path, keyed_vectors_path)
+    main.execute_user_recommendation_from_keyed_vectors(keyed_vectors_path,
+                                                        input_file_path,
+                                                        output_file_path,
+                                                        chunk_size=2,
+                                                        )
+
+    actual_df = pd.read_csv(output_file_path)
+    self.assertEqual(
+        list(zip(actual_df[_KEYWORD], actual_df[_RCM_RESULTS],
+                 actual_df[_RANK])),
+        [('user_d', 'ITEM_B', 1)],
+        )
+
+  def test_execute_content_recommendation_w2v_from_csv_with_encoded_corpus(
+      self,
+      ):
+    """Ensures an encoded corpus gives the same output and is reused."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    temp_dir = self._create_tempdir()
+    encoded_corpus_path = os.path.join(temp_dir, 'encoded')
+    output_file_path = os.path.join(temp_dir, 'output.csv')
+    expected_output_file_path = os.path.join(temp_dir, 'expected.csv')
+
+    main.execute_content_recommendation_w2v_from_csv(
+        input_file_path,
+        content_file_path,
+        expected_output_file_path,
+        is_ranking_process=True,
+        )
+    for _ in range(2):
+      main.execute_content_recommendation_w2v_from_csv(
+          input_file_path,
+          content_file_path,
+          output_file_path,
+          is_ranking_process=True,
+          encoded_corpus_path=encoded_corpus_path,
+          )
+
+      pd.testing.assert_frame_equal(pd.read_csv(output_file_path),
+                                    pd.read_csv(expected_output_file_path))
+
+  def test_execute_content_recommendation_w2v_from_csv_output(self):
+    """Ensures the streamed pipeline writes recommendations and ranking."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    output_file_path = os.path.join(self._create_tempdir(), 'output.csv')
+
+    main.execute_content_recommendation_w2v_from_csv(
+        input_file_path,
+        content_file_path,
+        output_file_path,
+        _DUMMY_RANKING_PROCESS_TRUE,
+        _DUMMY_RANKING_ITEN_NAME,
+        chunk_size=1,
+        )
+
+    actual_df = pd.read_csv(output_file_path)
+    pd.testing.assert_frame_equal(
+        actual_df.drop(columns=[_SCORE]),
+        pd.concat([_DUMMY_DF_RESULTS, _DUMMY_DF_RANKING]).drop(
+            columns=[_SCORE]).reset_index(drop=True),
+        )
+
+  def test_execute_content_recommendation_w2v_from_csv_with_preprocessing(
+      self,
+      ):
+    """Ensures only training uses the preprocessed sessions."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    output_file_path = os.path.join(self._create_tempdir(), 'output.csv')
+
+    with mock.patch.object(main, 'execute_embedding_w2v',
+                           wraps=main.execute_embedding_w2v) as mock_embedding:
+      main.execute_content_recommendation_w2v_from_csv(
+          input_file_path,
+          content_file_path,
+          output_file_path,
+          _DUMMY_RANKING_PROCESS_TRUE,
+          _DUMMY_RANKING_ITEN_NAME,
+          params=main.Word2VecParams(min_count=1),
+          preprocessing_params=main.PreprocessingParams(
+              collapse_repeats=True, max_session_length=3),
+          )
+
+    training_data = mock_embedding.call_args.args[0]
+    self.assertIsInstance(training_data, main.corpus.EncodedCorpus)
+    self.assertTrue((np.diff(training_data.offsets) == 3).all())
+    actual_df = pd.read_csv(output_file_path)
+    pd.testing.assert_frame_equal(
+        actual_df[actual_df[_KEYWORD] == _DUMMY_RANKING_ITEN_NAME].drop(
+            columns=[_SCORE]).reset_index(drop=True),
+        _DUMMY_DF_RANKING.drop(columns=[_SCORE]),
+        )
+
+  def test_execute_content_recommendation_w2v_from_csv_npz_output(self):
+    """Ensures the npz output format holds the same rows as CSV output."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    output_file_path = os.path.join(self._create_tempdir(), 'output.npz')
+
+    main.execute_content_recommendation_w2v_from_csv(
+        input_file_path,
+        content_file_path,
+        output_file_path,
+        _DUMMY_RANKING_PROCESS_TRUE,
+        _DUMMY_RANKING_ITEN_NAME,
+        output_format=main.results.OUTPUT_FORMAT_NPZ,
+        )
+
+    records, vocabulary = main.results.read_npz_records(output_file_path)
+    expected_df = pd.concat([_DUMMY_DF_RESULTS, _DUMMY_DF_RANKING])
+    self.assertEqual(list(vocabulary[records[_KEYWORD]]),
+                     list(expected_df[_KEYWORD]))
+    self.assertEqual(list(vocabulary[records[_RCM_RESULTS]]),
+                     list(expected_df[_RCM_RESULTS]))
+    self.assertEqual(list(records[_RANK]), list(expected_df[_RANK]))
+
+  def test_execute_content_recommendation_w2v_from_csv_diff_output(self):
+    """Ensures only changed keywords and deletions are in the diff output."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    temp_dir = self._create_tempdir()
+    output_file_path = os.path.join(temp_dir, 'output.csv')
+    diff_output_path = os.path.join(temp_dir, 'diff.csv')
+    pd.concat([_DUMMY_DF_RANKING, pd.DataFrame({
+        _KEYWORD: ['ITEM_GONE'],
+        _RCM_RESULTS: ['ITEM_A'],
+        _RANK: [1],
+        _SCORE: [0.5],
+    })]).to_csv(output_file_path, index=False)
+
+    main.execute_content_recommendation_w2v_from_csv(
+        input_file_path,
+        content_file_path,
+        output_file_path,
+        _DUMMY_RANKING_PROCESS_TRUE,
+        _DUMMY_RANKING_ITEN_NAME,
+        previous_output_path=output_file_path,
+        diff_output_path=diff_output_path,
+        )
+
+    actual_df = pd.read_csv(diff_output_path, keep_default_na=False)
+    self.assertEqual(
+        list(zip(actual_df[_KEYWORD], actual_df[_RCM_RESULTS],
+                 actual_df[_RANK])),
+        list(zip(_DUMMY_DF_RESULTS[_KEYWORD], _DUMMY_DF_RESULTS[_RCM_RESULTS],
+                 _DUMMY_DF_RESULTS[_RANK]))
+        + [('ITEM_GONE', '', constants.DELETED_RANK)],
+        )
+    self.assertEqual(len(pd.read_csv(output_file_path)), 11)
+
+  def test_execute_content_recommendation_w2v_from_csv_run_report(self):
+    """Ensures each pipeline step is recorded into the run report."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    temp_dir = self._create_tempdir()
+    report_path = os.path.join(temp_dir, 'report.json')
+    profile_dir = os.path.join(temp_dir, 'profiles')
+
+    with instrumentation.recording(report_path, profile_dir):
+      main.execute_content_recommendation_w2v_from_csv(
+          input_file_path,
+          content_file_path,
+          os.path.join(temp_dir, 'output.csv'),
+          _DUMMY_RANKING_PROCESS_TRUE,
+          _DUMMY_RANKING_ITEN_NAME,
+          )
+
+    with open(report_path) as f:
+      stages = {stage['stage']: stage for stage in json.load(f)['stages']}
+    self.assertEqual(list(stages),
+                     ['train', 'read_csv', 'score', 'ranking', 'write'])
+    self.assertEqual(stages['score']['rows_out'], len(_DUMMY_DF_RESULTS))
+    self.assertEqual(stages['write']['rows_in'],
+                     len(_DUMMY_DF_RESULTS) + len(_DUMMY_DF_RANKING))
+    self.assertGreater(stages['train']['words_per_second'], 0)
+    self.assertEqual(len(os.listdir(profile_dir)), len(stages))
+
+  def test_execute_content_recommendation_w2v_from_csv_update_run_report(
+      self,
+      ):
+    """Ensures updating a saved model is recorded as the train stage."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    temp_dir = self._create_tempdir()
+    model_path = os.path.join(temp_dir, 'model.w2v')
+    main.model_store.save_model(_DUMMY_MODEL, model_path)
+    report_path = os.path.join(temp_dir, 'report.json')
+
+    with instrumentation.recording(report_path):
+      main.execute_content_recommendation_w2v_from_csv(
+          input_file_path,
+          content_file_path,
+          os.path.join(temp_dir, 'output.csv'),
+          base_model_path=model_path,
+          )
+
+    with open(report_path) as f:
+      stages = {stage['stage']: stage for stage in json.load(f)['stages']}
+    self.assertEqual(list(stages), ['train', 'read_csv', 'score', 'write'])
+    self.assertEqual(stages['train']['rows_out'], len(_DUMMY_MODEL.wv))
+    self.assertGreater(stages['train']['words_per_second'], 0)
+
+  def test_execute_cooccurrence_recommendation_from_csv(self):
+    """Ensures the cooccurrence stage writes results without word2vec."""
+    input_file_path, _ = self._write_dummy_csv_files()
+    output_file_path = os.path.join(self._create_tempdir(), 'output.csv')
+
+    with mock.patch('main.gensim.models.word2vec.Word2Vec') as mock_gensim:
+      main.execute_cooccurrence_recommendation_from_csv(
+          input_file_path, output_file_path)
+
+    mock_gensim.assert_not_called()
+    pd.testing.assert_frame_equal(
+        pd.read_csv(output_file_path),
+        main.cooccurrence.recommend(
+            main.corpus.EncodedCorpus.from_csv(input_file_path)),
+        check_dtype=False,
+        )
+
+  def test_execute_prediction_from_keyed_vectors_with_cooccurrence(self):
+    """Ensures co-occurrence scores are blended into the results."""
+    input_file_path, content_file_path = self._write_dummy_csv_files()
+    temp_dir = self._create_tempdir()
+    keyed_vectors_path = os.path.join(temp_dir, 'vectors.kv')
+    output_file_path = os.path.join(temp_dir, 'output.csv')
+    main.model_store.save_keyed_vectors(_DUMMY_MODEL.wv, keyed_vectors_path)
+
+    main.execute_prediction_from_keyed_vectors(
+        keyed_vectors_path,
+        content_file_path,
+        output_file_path,
+        input_file_path=input_file_path,
+        cooccurrence_params=main.CooccurrenceParams(weight=1.0),
+        )
+
+    pd.testing.assert_frame_equal(
+        pd.read_csv(output_file_path),
+        main.cooccurrence.recommend(
+            main.corpus.EncodedCorpus.from_csv(input_file_path)),
+        check_dtype=False,
+        )
+
   def test_execute_embedding_w2v(self):
     """Ensures success with correct trainin_data."""
     with mock.patch('main.gensim.models.word2vec.Word2Vec') as mock_gensim:
@@ -180,8 +590,46 @@ class MainTest(unittest.TestCase):
                                           hs=main._HS,
                                           negative=main._NEGATIVE,
                                           seed=main._SEED,
+                                          workers=main._WORKERS,
+                                          epochs=main._EPOCHS,
+                                          max_final_vocab=None,
+                                          trim_rule=mock.ANY,
+                                          callbacks=mock.ANY,
                                           )
 
+  def test_execute_embedding_w2v_with_params_and_corpus_file(self):
+    """Ensures corpus_file mode passes the file and hyperparameters."""
+    params = main.Word2VecParams(window=3, workers=4, epochs=10)
+    with mock.patch('main.gensim.models.word2vec.Word2Vec') as mock_gensim:
+      _ = main.execute_embedding_w2v(None, params, _DUMMY_INPUT_FILEPATH)
+
+      mock_gensim.assert_called_once_with(corpus_file=_DUMMY_INPUT_FILEPATH,
+                                          sg=main._SG,
+                                          window=3,
+                                          min_count=main._MIN_COUNT,
+                                          vector_size=main._VECTOR_SIZE,
+                                          hs=main._HS,
+                                          negative=main._NEGATIVE,
+                                          seed=main._SEED,
+                                          workers=4,
+                                          epochs=10,
+                                          max_final_vocab=None,
+                                          trim_rule=mock.ANY,
+                                          callbacks=mock.ANY,
+                                          )
+
+  def test_execute_embedding_w2v_with_max_vocab(self):
+    """Ensures the rarest content ids are pruned and logged."""
+    params = main.Word2VecParams(min_count=1, max_vocab=3, workers=1)
+    with self.assertLogs(level='INFO') as log_output:
+      model = main.execute_embedding_w2v(_DUMMY_TRAINING_DATA, params)
+
+    self.assertCountEqual(model.wv.index_to_key,
+                          ['ITEM_A', 'ITEM_B', 'ITEM_C'])
+    self.assertTrue(any('Pruned 2 content ids' in line
+                        and 'ITEM_D (2), ITEM_E (1)' in line
+                        for line in log_output.output))
+
   def test_sort_recommendation_result(self):
     """Ensures success with sort_recommendation_result function."""
     actual_df_result = main.sort_recommendation_results(_DUMMY_MODEL,
@@ -192,6 +640,66 @@ class MainTest(unittest.TestCase):
         _DUMMY_DF_RESULTS.reset_index(drop=True).drop(columns=[_SCORE]),
         )
 
+  def test_sort_recommendation_result_matches_most_similar(self):
+    """Ensures batched scoring returns the same items as most_similar."""
+    actual_df_result = main.sort_recommendation_results(_DUMMY_MODEL,
+                                                        _DUMMY_DF_CONTENTS,
+                                                        block_size=1,
+                                                        )
+    for keyword, df_keyword in actual_df_result.groupby(_KEYWORD):
+      expected = _DUMMY_MODEL.wv.most_similar(positive=keyword,
+                                              topn=constants.TOP_N)
+      self.assertEqual(df_keyword[_RCM_RESULTS].tolist(),
+                       [rcm_result for rcm_result, _ in expected])
+      for actual_score, (_, expected_score) in zip(df_keyword[_SCORE],
+                                                    expected):
+        self.assertAlmostEqual(actual_score, expected_score, places=5)
+
+  def test_sort_recommendation_result_with_ann_index(self):
+    """Ensures approximate search probing every cluster is exact."""
+    ann_index = main.ann.IVFIndex(num_clusters=2, num_probes=2).build(
+        _DUMMY_MODEL.wv.vectors)
+
+    actual_df_result = main.sort_recommendation_results(_DUMMY_MODEL,
+                                                        _DUMMY_DF_CONTENTS,
+                                                        ann_index=ann_index,
+                                                        )
+
+    pd.testing.assert_frame_equal(
+        actual_df_result.reset_index(drop=True).drop(columns=[_SCORE]),
+        _DUMMY_DF_RESULTS.reset_index(drop=True).drop(columns=[_SCORE]),
+        )
+
+  def test_sort_recommendation_result_with_workers(self):
+    """Ensures parallel scoring returns the same results."""
+    actual_df_result = main.sort_recommendation_results(_DUMMY_MODEL,
+                                                        _DUMMY_DF_CONTENTS,
+                                                        block_size=1,
+                                                        num_workers=2,
+                                                        )
+
+    pd.testing.assert_frame_equal(
+        actual_df_result,
+        main.sort_recommendation_results(_DUMMY_MODEL, _DUMMY_DF_CONTENTS),
+        )
+
+  def test_sort_recommendation_result_with_cold_start(self):
+    """Ensures content ids missing from the vocabulary get results."""
+    actual_df_result = main.sort_recommendation_results(
+        _DUMMY_MODEL, _DUMMY_DF_CONTENTS, cold_start_neighbours=2)
+
+    pd.testing.assert_frame_equal(
+        actual_df_result[actual_df_result[_KEYWORD].isin(
+            ['ITEM_A', 'ITEM_B', 'ITEM_C'])].drop(columns=[_SCORE]),
+        _DUMMY_DF_RESULTS.drop(columns=[_SCORE]),
+        )
+    df_cold = actual_df_result[actual_df_result[_KEYWORD].isin(
+        ['ITEM_D', 'ITEM_E'])]
+    self.assertEqual(df_cold[_KEYWORD].tolist(), ['ITEM_D'] * 3
+                     + ['ITEM_E'] * 3)
+    self.assertEqual(sorted(df_cold[_RCM_RESULTS].unique()),
+                     ['ITEM_A', 'ITEM_B', 'ITEM_C'])
+
   def test_sort_recommendation_result_with_keyerror(self):
     """Ensures keyerror with sort_recommendation_result function."""
     with self.assertLogs(level='DEBUG') as log_output:
@@ -218,6 +726,7 @@ class MainTest(unittest.TestCase):
         output=_DUMMY_OUTPUT_FILEPATH,
         is_ranking=_DUMMY_RANKING_PROCESS_FALSE,
         ranking_item_name=_DEFAULT_RANKING_ITEM_NAME,
+        **_DEFAULT_OPTIONAL_ARGS,
         )
 
     with mock.patch.object(sys, 'argv', test_args):
@@ -245,7 +754,8 @@ class MainTest(unittest.TestCase):
         content=_DUMMY_CONTENT_FILEPATH,
         output=_DUMMY_OUTPUT_FILEPATH,
         is_ranking=_DUMMY_RANKING_PROCESS_TRUE,
-        ranking_item_name=_DUMMY_RANKING_ITEN_NAME
+        ranking_item_name=_DUMMY_RANKING_ITEN_NAME,
+        **_DEFAULT_OPTIONAL_ARGS,
         )
 
     with mock.patch.object(sys, 'argv', test_args):
@@ -254,6 +764,40 @@ class MainTest(unittest.TestCase):
     self.assertIsInstance(actual, argparse.Namespace)
     self.assertEqual(actual, expected)
 
+  def test_parse_cli_args_with_failure_missing_stage_args(self):
+    """Ensures the predict stage requires keyed vectors."""
+    test_args = [
+        'main.py',
+        '-s',
+        main._STAGE_PREDICT,
+        '-c',
+        _DUMMY_CONTENT_FILEPATH,
+        '-o',
+        _DUMMY_OUTPUT_FILEPATH,
+        ]
+
+    with mock.patch.object(sys, 'argv', test_args), mock.patch.object(
+        sys, 'stderr'), self.assertRaises(SystemExit):
+      main.parse_cli_args()
+
+  def test_parse_cli_args_with_failure_previous_output_only(self):
+    """Ensures --previous_output requires --diff_output."""
+    test_args = [
+        'main.py',
+        '-i',
+        _DUMMY_INPUT_FILEPATH,
+        '-c',
+        _DUMMY_CONTENT_FILEPATH,
+        '-o',
+        _DUMMY_OUTPUT_FILEPATH,
+        '-po',
+        _DUMMY_OUTPUT_FILEPATH,
+        ]
+
+    with mock.patch.object(sys, 'argv', test_args), mock.patch.object(
+        sys, 'stderr'), self.assertRaises(SystemExit):
+      main.parse_cli_args()
+
   def test_execute_ranking_process(self):
     actual_df = main.execute_ranking_process(
         _DUMMY_TRAINING_DATA,
@@ -264,6 +808,31 @@ class MainTest(unittest.TestCase):
                                   _DUMMY_DF_RANKING.reset_index(drop=True),
                                   )
 
+  def test_execute_ranking_process_with_ranking_params(self):
+    actual_df = main.execute_ranking_process(
+        [['ITEM_A', 'ITEM_A', 'ITEM_A', 'ITEM_B'], ['ITEM_B', 'ITEM_C']],
+        _DUMMY_RANKING_ITEN_NAME,
+        main.RankingParams(deduplicate_users=True),
+    )
+
+    self.assertEqual(actual_df[_RCM_RESULTS].tolist(),
+                     ['ITEM_B', 'ITEM_A', 'ITEM_C'])
+
+  def test_execute_ranking_process_reuses_counting_corpus(self):
+    training_data = main.ranking.CountingCorpus(_DUMMY_TRAINING_DATA)
+    _ = list(training_data)
+
+    with mock.patch.object(main.ranking.ItemCounter, 'add') as mock_add:
+      actual_df = main.execute_ranking_process(
+          training_data,
+          _DUMMY_RANKING_ITEN_NAME,
+      )
+
+      mock_add.assert_not_called()
+    pd.testing.assert_frame_equal(actual_df.reset_index(drop=True),
+                                  _DUMMY_DF_RANKING.reset_index(drop=True),
+                                  )
+
 
 if __name__ == '__main__':
   unittest.main()
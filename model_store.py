@@ -0,0 +1,209 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for saving, loading and incrementally updating word2vec models."""
+
+import logging
+import os
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+import error_messages
+import gensim
+import numpy as np
+import similarity
+
+
+class DriftReport(NamedTuple):
+  """Differences of item vectors between two models.
+
+  Attributes:
+    num_shared_items: A number of content ids in both vocabularies.
+    mean_aligned_cosine: Mean cosine similarity of the shared item vectors
+      after an orthogonal alignment of the two embedding spaces. 1.0 means no
+      drift.
+    mean_neighbour_overlap: Mean fraction of the top_n most similar items
+      that are the same in both models.
+  """
+  num_shared_items: int
+  mean_aligned_cosine: float
+  mean_neighbour_overlap: float
+
+
+def save_model(model: gensim.models.word2vec.Word2Vec, path: str) -> None:
+  """Saves a full word2vec model that can continue training.
+
+  Args:
+    model: A model that was trained by gensim word2vec.
+    path: A file path to save the model.
+  """
+  model.save(path)
+  logging.info('Saved word2vec model into %s.', path)
+
+
+def load_model(path: str) -> gensim.models.word2vec.Word2Vec:
+  """Loads a full word2vec model saved by save_model.
+
+  Args:
+    path: A file path of the saved model.
+
+  Returns:
+    A loaded word2vec model.
+
+  Raises:
+    IOError: if the path is not found.
+  """
+  if not os.path.exists(path):
+    raise IOError(error_messages.NOT_EXISTS_MODEL_FILE)
+  model = gensim.models.word2vec.Word2Vec.load(path)
+  logging.info('Loaded word2vec model from %s.', path)
+  return model
+
+
+def save_keyed_vectors(
+    keyed_vectors: gensim.models.KeyedVectors,
+    path: str,
+) -> None:
+  """Saves keyed vectors with the NumPy arrays stored in separate files.
+
+  The vector norms are computed before saving, so processes loading the
+  vectors with load_keyed_vectors do not need to compute a private copy.
+
+  Args:
+    keyed_vectors: Vectors of a model that was trained by gensim word2vec.
+    path: A file path to save the keyed vectors. The arrays, such as
+      vectors and norms, are saved next to it as separate .npy files.
+  """
+  keyed_vectors.fill_norms()
+  keyed_vectors.save(path, sep_limit=0)
+  logging.info('Saved keyed vectors into %s.', path)
+
+
+def load_keyed_vectors(
+    path: str,
+    mmap: Optional[str] = 'r',
+) -> gensim.models.KeyedVectors:
+  """Loads keyed vectors saved by save_keyed_vectors.
+
+  With the default read-only memory map, every process on a host that loads
+  the same path shares one physical copy of the vectors in the page cache.
+
+  Args:
+    path: A file path of the saved keyed vectors.
+    mmap: A memory map mode for the NumPy arrays, or None to load them into
+      memory.
+
+  Returns:
+    Loaded keyed vectors.
+
+  Raises:
+    IOError: if the path is not found.
+  """
+  if not os.path.exists(path):
+    raise IOError(error_messages.NOT_EXISTS_MODEL_FILE)
+  keyed_vectors = gensim.models.KeyedVectors.load(path, mmap=mmap)
+  logging.info('Loaded keyed vectors from %s.', path)
+  return keyed_vectors
+
+
+def update_model(
+    model: gensim.models.word2vec.Word2Vec,
+    training_data: Optional[Iterable[Sequence[str]]],
+    corpus_file: Optional[str] = None,
+    callbacks: Sequence[gensim.models.callbacks.CallbackAny2Vec] = (),
+) -> gensim.models.word2vec.Word2Vec:
+  """Continues training of a model only on new training data.
+
+  The vocabulary is extended with the new content ids, and the existing
+  vectors are used as the starting point, so the cost is proportional to the
+  size of the new data rather than the full history.
+
+  Args:
+    model: A model that was trained by gensim word2vec.
+    training_data: A re-iterable corpus of new sessions as lists of content
+      ids. Ignored when corpus_file is set.
+    corpus_file: A LineSentence format file path of new training data.
+    callbacks: Callbacks run during training only, which are not saved with
+      the model.
+
+  Returns:
+    The updated model.
+  """
+  vocabulary_size = len(model.wv)
+  if corpus_file is None:
+    model.build_vocab(training_data, update=True)
+    model.train(
+        training_data,
+        total_examples=model.corpus_count,
+        epochs=model.epochs,
+        callbacks=callbacks,
+    )
+  else:
+    model.build_vocab(corpus_file=corpus_file, update=True)
+    model.train(
+        corpus_file=corpus_file,
+        total_words=model.corpus_total_words,
+        epochs=model.epochs,
+        callbacks=callbacks,
+    )
+  logging.info('Updated word2vec model with %d new content ids.',
+               len(model.wv) - vocabulary_size)
+
+  return model
+
+
+def vector_drift(
+    keyed_vectors: gensim.models.KeyedVectors,
+    reference_vectors: gensim.models.KeyedVectors,
+    top_n: int,
+) -> DriftReport:
+  """Measures how far item vectors drifted from a reference model.
+
+  Two independently trained models are only equal up to a rotation, so the
+  vectors are aligned with orthogonal Procrustes before comparison. The
+  neighbour overlap is rotation invariant and is what matters for the
+  recommendation output.
+
+  Args:
+    keyed_vectors: Vectors of the model to check, e.g. an updated model.
+    reference_vectors: Vectors of the reference, e.g. a full retrain.
+    top_n: A number of most similar items to compare.
+
+  Returns:
+    A DriftReport of the shared content ids.
+  """
+  shared_keys = [key for key in keyed_vectors.index_to_key
+                 if key in reference_vectors.key_to_index]
+  if not shared_keys:
+    return DriftReport(0, 0.0, 0.0)
+
+  vectors = similarity.normalize_vectors(
+      keyed_vectors.vectors[[keyed_vectors.key_to_index[key]
+                             for key in shared_keys]])
+  reference = similarity.normalize_vectors(
+      reference_vectors.vectors[[reference_vectors.key_to_index[key]
+                                 for key in shared_keys]])
+
+  u, _, vt = np.linalg.svd(vectors.T @ reference)
+  aligned = vectors @ (u @ vt)
+  mean_aligned_cosine = float(np.mean(np.sum(aligned * reference, axis=1)))
+
+  query_indices = np.arange(len(shared_keys))
+  neighbours, _ = similarity.top_n_similar(vectors, query_indices, top_n)
+  reference_neighbours, _ = similarity.top_n_similar(
+      reference, query_indices, top_n)
+  overlaps = [len(set(a) & set(b)) / max(len(a), 1)
+              for a, b in zip(neighbours, reference_neighbours)]
+
+  return DriftReport(len(shared_keys), mean_aligned_cosine,
+                     float(np.mean(overlaps)))
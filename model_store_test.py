@@ -0,0 +1,98 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for model_store.py."""
+
+import os
+import tempfile
+import unittest
+
+import gensim
+import model_store
+import numpy as np
+
+
+_FAKE_TRAINING_DATA = [['ITEM_A', 'ITEM_B', 'ITEM_C', 'ITEM_B', 'ITEM_A'],
+                       ['ITEM_B', 'ITEM_A', 'ITEM_B', 'ITEM_A', 'ITEM_C'],
+                       ['ITEM_C', 'ITEM_D', 'ITEM_C', 'ITEM_D', 'ITEM_A']]
+_FAKE_NEW_TRAINING_DATA = [['ITEM_E', 'ITEM_A', 'ITEM_E', 'ITEM_B'],
+                           ['ITEM_E', 'ITEM_C', 'ITEM_E', 'ITEM_D']]
+_FAKE_WRONG_FILEPATH = '/faile_file_path'
+
+
+def _train_fake_model() -> gensim.models.word2vec.Word2Vec:
+  return gensim.models.word2vec.Word2Vec(
+      sentences=_FAKE_TRAINING_DATA,
+      min_count=1,
+      vector_size=8,
+      sample=0,
+      seed=1,
+      workers=1,
+  )
+
+
+class ModelStoreTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    self.model_path = os.path.join(temp_dir.name, 'model.w2v')
+
+  def test_save_and_load_model(self):
+    model = _train_fake_model()
+
+    model_store.save_model(model, self.model_path)
+    actual = model_store.load_model(self.model_path)
+
+    self.assertEqual(actual.wv.index_to_key, model.wv.index_to_key)
+    np.testing.assert_array_equal(actual.wv.vectors, model.wv.vectors)
+
+  def test_load_model_with_failure_wrong_file_path(self):
+    with self.assertRaisesRegex(IOError, 'The model file dose not exist.'):
+      model_store.load_model(_FAKE_WRONG_FILEPATH)
+
+  def test_update_model_extends_vocabulary(self):
+    model = _train_fake_model()
+    vectors_before = model.wv['ITEM_D'].copy()
+
+    actual = model_store.update_model(model, _FAKE_NEW_TRAINING_DATA)
+
+    self.assertIn('ITEM_E', actual.wv.key_to_index)
+    self.assertFalse(np.array_equal(actual.wv['ITEM_D'], vectors_before))
+
+  def test_vector_drift_of_same_model(self):
+    model = _train_fake_model()
+
+    actual = model_store.vector_drift(model.wv, model.wv, 2)
+
+    self.assertEqual(actual.num_shared_items, 4)
+    self.assertAlmostEqual(actual.mean_aligned_cosine, 1.0, places=5)
+    self.assertAlmostEqual(actual.mean_neighbour_overlap, 1.0)
+
+  def test_vector_drift_is_rotation_invariant(self):
+    model = _train_fake_model()
+    rotated = gensim.models.KeyedVectors(vector_size=8)
+    rotation, _ = np.linalg.qr(
+        np.random.default_rng(0).normal(size=(8, 8)))
+    rotated.add_vectors(model.wv.index_to_key, model.wv.vectors @ rotation)
+
+    actual = model_store.vector_drift(model.wv, rotated, 2)
+
+    self.assertAlmostEqual(actual.mean_aligned_cosine, 1.0, places=5)
+    self.assertAlmostEqual(actual.mean_neighbour_overlap, 1.0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,172 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for shrinking an encoded corpus of sessions before training.
+
+Every step is a vectorized pass over the token and offset arrays of a
+corpus.EncodedCorpus and returns a new corpus with the same vocabulary.
+"""
+
+import logging
+from typing import NamedTuple, Tuple
+
+import corpus
+import numpy as np
+
+
+class PreprocessingReport(NamedTuple):
+  """Size of a corpus before and after preprocessing.
+
+  Attributes:
+    num_sessions_in: A number of sessions before preprocessing.
+    num_sessions_out: A number of sessions after preprocessing.
+    num_tokens_in: A number of content ids before preprocessing.
+    num_tokens_out: A number of content ids after preprocessing.
+  """
+  num_sessions_in: int
+  num_sessions_out: int
+  num_tokens_in: int
+  num_tokens_out: int
+
+
+def _positions(encoded: corpus.EncodedCorpus) -> np.ndarray:
+  """Returns the position of every token within its session."""
+  return (np.arange(len(encoded.tokens), dtype=np.int64)
+          - np.repeat(np.asarray(encoded.offsets[:-1]),
+                      np.diff(encoded.offsets)))
+
+
+def _keep_tokens(
+    encoded: corpus.EncodedCorpus,
+    keep: np.ndarray,
+) -> corpus.EncodedCorpus:
+  """Returns the corpus with only the tokens where keep is True."""
+  lengths = np.bincount(encoded.session_ids()[keep], minlength=len(encoded))
+  return corpus.EncodedCorpus(
+      encoded.vocabulary,
+      np.asarray(encoded.tokens)[keep],
+      np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]),
+  )
+
+
+def collapse_repeats(encoded: corpus.EncodedCorpus) -> corpus.EncodedCorpus:
+  """Collapses consecutive repeats of a content id in a session into one."""
+  tokens = np.asarray(encoded.tokens)
+  keep = np.ones(len(tokens), dtype=bool)
+  keep[1:] = tokens[1:] != tokens[:-1]
+  keep[np.asarray(encoded.offsets[:-1])[np.diff(encoded.offsets) > 0]] = True
+  return _keep_tokens(encoded, keep)
+
+
+def truncate_sessions(
+    encoded: corpus.EncodedCorpus,
+    max_length: int,
+) -> corpus.EncodedCorpus:
+  """Keeps only the last max_length content ids of every session."""
+  lengths = np.diff(encoded.offsets)
+  keep = _positions(encoded) >= np.repeat(lengths - max_length, lengths)
+  return _keep_tokens(encoded, keep)
+
+
+def split_sessions(
+    encoded: corpus.EncodedCorpus,
+    is_start: np.ndarray,
+) -> corpus.EncodedCorpus:
+  """Splits sessions before the marked content ids.
+
+  Args:
+    encoded: An encoded corpus of sessions.
+    is_start: A boolean array, one per token, True where a new session
+      starts, e.g. after a gap in time. The first token of every session
+      always starts a session.
+
+  Returns:
+    A corpus whose sessions are the pieces of the input sessions. Empty input
+    sessions are dropped.
+  """
+  is_start = np.array(is_start, dtype=bool)
+  is_start[np.asarray(encoded.offsets[:-1])[np.diff(encoded.offsets) > 0]] = (
+      True)
+  return corpus.EncodedCorpus(
+      encoded.vocabulary,
+      encoded.tokens,
+      np.append(np.flatnonzero(is_start),
+                len(encoded.tokens)).astype(np.int64),
+  )
+
+
+def split_long_sessions(
+    encoded: corpus.EncodedCorpus,
+    max_length: int,
+) -> corpus.EncodedCorpus:
+  """Splits every session into pieces of at most max_length content ids."""
+  return split_sessions(encoded, _positions(encoded) % max_length == 0)
+
+
+def drop_short_sessions(
+    encoded: corpus.EncodedCorpus,
+    min_length: int,
+) -> corpus.EncodedCorpus:
+  """Drops the sessions with fewer than min_length content ids."""
+  lengths = np.diff(encoded.offsets)
+  is_kept = lengths >= min_length
+  return corpus.EncodedCorpus(
+      encoded.vocabulary,
+      np.asarray(encoded.tokens)[np.repeat(is_kept, lengths)],
+      np.concatenate([[0], np.cumsum(lengths[is_kept], dtype=np.int64)]),
+  )
+
+
+def preprocess(
+    encoded: corpus.EncodedCorpus,
+    collapse: bool = False,
+    max_length: int = 0,
+    split_long: bool = False,
+    min_length: int = 0,
+) -> Tuple[corpus.EncodedCorpus, PreprocessingReport]:
+  """Shrinks a corpus for training.
+
+  The steps run in the order of the arguments.
+
+  Args:
+    encoded: An encoded corpus of sessions.
+    collapse: A flag whether to collapse consecutive repeats of a content id.
+    max_length: A maximum number of content ids per session, or 0 for no
+      limit. Longer sessions keep their last max_length content ids.
+    split_long: A flag whether to split sessions longer than max_length into
+      pieces instead of truncating them.
+    min_length: A minimum number of content ids per session. Word2vec learns
+      nothing from sessions of fewer than 2 content ids.
+
+  Returns:
+    A tuple of the preprocessed corpus and a PreprocessingReport.
+  """
+  result = encoded
+  if collapse:
+    result = collapse_repeats(result)
+  if max_length > 0:
+    if split_long:
+      result = split_long_sessions(result, max_length)
+    else:
+      result = truncate_sessions(result, max_length)
+  if min_length > 0:
+    result = drop_short_sessions(result, min_length)
+
+  report = PreprocessingReport(len(encoded), len(result), len(encoded.tokens),
+                               len(result.tokens))
+  logging.info('Preprocessing removed %d of %d tokens and kept %d of %d '
+               'sessions.', report.num_tokens_in - report.num_tokens_out,
+               report.num_tokens_in, report.num_sessions_out,
+               report.num_sessions_in)
+  return result, report
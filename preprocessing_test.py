@@ -0,0 +1,85 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for preprocessing.py."""
+
+import unittest
+
+import corpus
+import numpy as np
+import preprocessing
+
+
+_FAKE_CORPUS = corpus.EncodedCorpus.from_sessions([
+    ['ITEM_A', 'ITEM_A', 'ITEM_B', 'ITEM_B', 'ITEM_B', 'ITEM_A'],
+    ['ITEM_A', 'ITEM_C'],
+    [],
+    ['ITEM_C', 'ITEM_C'],
+])
+
+
+class PreprocessingTest(unittest.TestCase):
+
+  def test_collapse_repeats(self):
+    actual = preprocessing.collapse_repeats(_FAKE_CORPUS)
+
+    self.assertEqual(list(actual), [['ITEM_A', 'ITEM_B', 'ITEM_A'],
+                                    ['ITEM_A', 'ITEM_C'], [], ['ITEM_C']])
+
+  def test_truncate_sessions(self):
+    actual = preprocessing.truncate_sessions(_FAKE_CORPUS, 2)
+
+    self.assertEqual(list(actual), [['ITEM_B', 'ITEM_A'],
+                                    ['ITEM_A', 'ITEM_C'], [],
+                                    ['ITEM_C', 'ITEM_C']])
+
+  def test_split_long_sessions(self):
+    actual = preprocessing.split_long_sessions(_FAKE_CORPUS, 4)
+
+    self.assertEqual(list(actual), [
+        ['ITEM_A', 'ITEM_A', 'ITEM_B', 'ITEM_B'], ['ITEM_B', 'ITEM_A'],
+        ['ITEM_A', 'ITEM_C'], ['ITEM_C', 'ITEM_C']])
+
+  def test_split_sessions(self):
+    is_start = np.zeros(len(_FAKE_CORPUS.tokens), dtype=bool)
+    is_start[[2, 9]] = True
+
+    actual = preprocessing.split_sessions(_FAKE_CORPUS, is_start)
+
+    self.assertEqual(list(actual), [
+        ['ITEM_A', 'ITEM_A'], ['ITEM_B', 'ITEM_B', 'ITEM_B', 'ITEM_A'],
+        ['ITEM_A', 'ITEM_C'], ['ITEM_C'], ['ITEM_C']])
+
+  def test_drop_short_sessions(self):
+    actual = preprocessing.drop_short_sessions(
+        preprocessing.collapse_repeats(_FAKE_CORPUS), 2)
+
+    self.assertEqual(list(actual), [['ITEM_A', 'ITEM_B', 'ITEM_A'],
+                                    ['ITEM_A', 'ITEM_C']])
+
+  def test_preprocess(self):
+    actual, report = preprocessing.preprocess(
+        _FAKE_CORPUS, collapse=True, max_length=2, split_long=True,
+        min_length=2)
+
+    self.assertEqual(list(actual), [['ITEM_A', 'ITEM_B'],
+                                    ['ITEM_A', 'ITEM_C']])
+    self.assertEqual(report, preprocessing.PreprocessingReport(
+        num_sessions_in=4, num_sessions_out=2, num_tokens_in=10,
+        num_tokens_out=4))
+    np.testing.assert_array_equal(actual.vocabulary, _FAKE_CORPUS.vocabulary)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,157 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for publishing only the recommendations that changed.
+
+Each keyword's ranked recommendation list is reduced to one 64-bit content
+hash, and the hashes of two runs are compared to find the keywords that were
+inserted, changed or deleted. The differential output holds the rows of
+inserted and changed keywords, plus one tombstone row of
+constants.DELETED_RANK per deleted keyword.
+"""
+
+import logging
+from typing import NamedTuple
+
+import constants
+import numpy as np
+import pandas as pd
+import results
+
+
+class ResultDiff(NamedTuple):
+  """Keywords whose recommendations differ between two runs.
+
+  Attributes:
+    inserted: Keywords only in the current results.
+    changed: Keywords in both results with a different recommendation list.
+    deleted: Keywords only in the previous results.
+  """
+  inserted: np.ndarray
+  changed: np.ndarray
+  deleted: np.ndarray
+
+
+def keyword_hashes(df_result: pd.DataFrame) -> pd.Series:
+  """Computes a content hash of the ranked recommendations of each keyword.
+
+  A hash covers the recommended content ids and their ranks, not the scores,
+  so retraining that only moves scores does not change it. Rows may be in
+  any order.
+
+  Args:
+    df_result: A dataframe with key content id, recommend content id, rank,
+      score.
+
+  Returns:
+    A uint64 series of hashes indexed by keyword.
+  """
+  row_hashes = pd.util.hash_pandas_object(
+      pd.DataFrame({
+          constants.RCM_RESULT: df_result[constants.RCM_RESULT].astype(object),
+          constants.RANK: df_result[constants.RANK].astype(np.int64),
+      }),
+      index=False,
+  ).to_numpy()
+  codes, keywords = pd.factorize(df_result[constants.KEYWORD])
+  if not len(keywords):
+    return pd.Series(dtype=np.uint64, index=pd.Index([], dtype=object))
+
+  order = np.argsort(codes, kind='stable')
+  starts = np.searchsorted(codes[order], np.arange(len(keywords)))
+  hashes = np.bitwise_xor.reduceat(row_hashes[order], starts)
+  return pd.Series(hashes, index=pd.Index(keywords, dtype=object))
+
+
+def diff_results(
+    df_previous: pd.DataFrame,
+    df_current: pd.DataFrame,
+) -> ResultDiff:
+  """Compares the recommendations of two runs by keyword content hash.
+
+  Args:
+    df_previous: Results of the previous run.
+    df_current: Results of the current run.
+
+  Returns:
+    A ResultDiff of the current results against the previous ones.
+  """
+  previous = keyword_hashes(df_previous)
+  current = keyword_hashes(df_current)
+  shared = current.index.intersection(previous.index)
+  is_changed = current[shared].to_numpy() != previous[shared].to_numpy()
+
+  diff = ResultDiff(
+      inserted=current.index.difference(previous.index).to_numpy(),
+      changed=shared[is_changed].to_numpy(),
+      deleted=previous.index.difference(current.index).to_numpy(),
+  )
+  logging.info('%d keywords inserted, %d changed, %d deleted and %d '
+               'unchanged.', len(diff.inserted), len(diff.changed),
+               len(diff.deleted), len(shared) - len(diff.changed))
+
+  return diff
+
+
+def build_diff_frame(
+    df_current: pd.DataFrame,
+    diff: ResultDiff,
+) -> pd.DataFrame:
+  """Builds the differential output to publish.
+
+  Args:
+    df_current: Results of the current run.
+    diff: A ResultDiff of df_current against the previous results.
+
+  Returns:
+    A dataframe in the format of results.build_result_frame with the rows of
+    inserted and changed keywords, followed by one row per deleted keyword
+    with rank constants.DELETED_RANK and an empty recommend content id.
+  """
+  is_upserted = df_current[constants.KEYWORD].isin(
+      np.concatenate([diff.inserted, diff.changed]))
+  num_deleted = len(diff.deleted)
+  df_deleted = results.build_result_frame(
+      diff.deleted,
+      np.full(num_deleted, '', dtype=object),
+      np.full(num_deleted, constants.DELETED_RANK),
+      np.zeros(num_deleted),
+  )
+  return pd.concat([df_current[is_upserted], df_deleted], ignore_index=True)
+
+
+def diff_with_previous_output(
+    df_current: pd.DataFrame,
+    previous_output_path: str,
+) -> pd.DataFrame:
+  """Compares results with a previous output file and builds their diff.
+
+  A missing previous output is treated as empty, so the first run publishes
+  every keyword.
+
+  Args:
+    df_current: Results of the current run.
+    previous_output_path: A csv or npz output file of the previous run.
+
+  Returns:
+    The differential output of build_diff_frame.
+  """
+  try:
+    df_previous = results.read_result_frame(previous_output_path)
+  except FileNotFoundError:
+    logging.info('No previous output at %s. Publishing all keywords.',
+                 previous_output_path)
+    df_previous = df_current.iloc[:0]
+
+  return build_diff_frame(df_current, diff_results(df_previous, df_current))
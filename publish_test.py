@@ -0,0 +1,92 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for publish.py."""
+
+import os
+import tempfile
+import unittest
+
+import constants
+import pandas as pd
+import publish
+import results
+
+
+_FAKE_DF_PREVIOUS = results.build_result_frame(
+    ['ITEM_A', 'ITEM_A', 'ITEM_B', 'ITEM_B', 'ITEM_C'],
+    ['ITEM_B', 'ITEM_C', 'ITEM_A', 'ITEM_C', 'ITEM_A'],
+    [1, 2, 1, 2, 1],
+    [0.9, 0.8, 0.7, 0.6, 0.5],
+)
+_FAKE_DF_CURRENT = results.build_result_frame(
+    ['ITEM_A', 'ITEM_A', 'ITEM_B', 'ITEM_B', 'ITEM_D'],
+    ['ITEM_B', 'ITEM_C', 'ITEM_C', 'ITEM_A', 'ITEM_A'],
+    [1, 2, 1, 2, 1],
+    [0.95, 0.85, 0.7, 0.6, 0.5],
+)
+
+
+class PublishTest(unittest.TestCase):
+
+  def test_keyword_hashes_ignore_row_order_and_scores(self):
+    df_shuffled = _FAKE_DF_PREVIOUS.iloc[::-1].copy()
+    df_shuffled[constants.SCORE] = 0.0
+
+    pd.testing.assert_series_equal(
+        publish.keyword_hashes(df_shuffled).sort_index(),
+        publish.keyword_hashes(_FAKE_DF_PREVIOUS).sort_index(),
+    )
+
+  def test_diff_results(self):
+    actual = publish.diff_results(_FAKE_DF_PREVIOUS, _FAKE_DF_CURRENT)
+
+    self.assertEqual(list(actual.inserted), ['ITEM_D'])
+    self.assertEqual(list(actual.changed), ['ITEM_B'])
+    self.assertEqual(list(actual.deleted), ['ITEM_C'])
+
+  def test_build_diff_frame(self):
+    diff = publish.diff_results(_FAKE_DF_PREVIOUS, _FAKE_DF_CURRENT)
+
+    actual = publish.build_diff_frame(_FAKE_DF_CURRENT, diff)
+
+    expected = results.build_result_frame(
+        ['ITEM_B', 'ITEM_B', 'ITEM_D', 'ITEM_C'],
+        ['ITEM_C', 'ITEM_A', 'ITEM_A', ''],
+        [1, 2, 1, constants.DELETED_RANK],
+        [0.7, 0.6, 0.5, 0.0],
+    )
+    pd.testing.assert_frame_equal(actual, expected)
+
+  def test_diff_with_previous_output(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    previous_output_path = os.path.join(temp_dir.name, 'output.npz')
+    results.write_npz(_FAKE_DF_PREVIOUS, previous_output_path)
+
+    actual = publish.diff_with_previous_output(_FAKE_DF_CURRENT,
+                                               previous_output_path)
+
+    self.assertEqual(list(actual[constants.KEYWORD]),
+                     ['ITEM_B', 'ITEM_B', 'ITEM_D', 'ITEM_C'])
+
+  def test_diff_with_missing_previous_output(self):
+    actual = publish.diff_with_previous_output(_FAKE_DF_CURRENT,
+                                               '/missing/output.csv')
+
+    pd.testing.assert_frame_equal(actual, _FAKE_DF_CURRENT)
+
+
+if __name__ == '__main__':
+  unittest.main()
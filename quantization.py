@@ -0,0 +1,286 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for similarity search over low precision embedding vectors.
+
+The vectors are normalized to unit length and stored as float16, or as int8
+with one float32 scale per row, which takes a half or about a quarter of the
+storage and resident memory of float32. NumPy has no low precision matrix
+product, so the whole vocabulary is scored in float32 chunks of
+_ITEM_BLOCK_SIZE rows upcast on the fly, which saves memory but not compute
+or memory bandwidth. Only the best candidates of each query are re-ranked
+with the float32 vectors, whose rows are gathered from a memory map on
+demand.
+"""
+
+import os
+from typing import NamedTuple, Optional, Tuple
+
+import ann
+import constants
+import numpy as np
+import similarity
+
+
+NONE = 'none'
+FLOAT16 = 'float16'
+INT8 = 'int8'
+METHODS = (NONE, FLOAT16, INT8)
+
+_INT8_MAX = 127
+# A number of vocabulary rows converted to float32 at once when scoring.
+_ITEM_BLOCK_SIZE = 65536
+_DEFAULT_OVERLAP_SAMPLE_SIZE = 1000
+_VALUES_SUFFIX = '.values.npy'
+_SCALES_SUFFIX = '.scales.npy'
+
+
+class QuantizedVectors(NamedTuple):
+  """Unit length embedding vectors in low precision.
+
+  Row i of the unit length vectors is approximately values[i] * scales[i].
+
+  Attributes:
+    values: A 2-D float16 or int8 array, one row per item.
+    scales: A 1-D float32 array of the scale of each row.
+  """
+  values: np.ndarray
+  scales: np.ndarray
+
+  @property
+  def nbytes(self) -> int:
+    return self.values.nbytes + self.scales.nbytes
+
+  def dequantize(self, rows: np.ndarray) -> np.ndarray:
+    """Returns the float32 approximation of the unit length rows."""
+    return (self.values[rows].astype(np.float32)
+            * self.scales[rows, np.newaxis])
+
+
+def quantize(
+    vectors: np.ndarray,
+    method: str,
+    norms: Optional[np.ndarray] = None,
+) -> QuantizedVectors:
+  """Normalizes and quantizes embedding vectors.
+
+  The vectors are converted _ITEM_BLOCK_SIZE rows at a time, so no float32
+  copy of the whole matrix is made.
+
+  Args:
+    vectors: A 2-D array of embedding vectors, one row per item.
+    method: FLOAT16, or INT8 for symmetric int8 with one scale per row.
+    norms: A 1-D array of the row lengths of vectors. Computed if None.
+
+  Returns:
+    QuantizedVectors of the unit length vectors.
+
+  Raises:
+    ValueError: if method is not FLOAT16 or INT8.
+  """
+  if method not in (FLOAT16, INT8):
+    raise ValueError(f'Unknown quantization method: {method}.')
+
+  if norms is None:
+    norms = np.linalg.norm(vectors, axis=1)
+  norms = np.where(norms == 0, 1.0, norms).astype(np.float32)
+  num_items = vectors.shape[0]
+  values = np.empty(vectors.shape,
+                    dtype=np.float16 if method == FLOAT16 else np.int8)
+  scales = np.ones(num_items, dtype=np.float32)
+
+  for start in range(0, num_items, _ITEM_BLOCK_SIZE):
+    stop = min(start + _ITEM_BLOCK_SIZE, num_items)
+    normed = (np.asarray(vectors[start:stop], dtype=np.float32)
+              / norms[start:stop, np.newaxis])
+    if method == FLOAT16:
+      values[start:stop] = normed
+      continue
+    max_abs = np.abs(normed).max(axis=1, initial=0.0)
+    block_scales = np.where(max_abs == 0, 1.0, max_abs / _INT8_MAX)
+    values[start:stop] = np.rint(normed / block_scales[:, np.newaxis])
+    scales[start:stop] = block_scales
+
+  return QuantizedVectors(values, scales)
+
+
+def _score_block(
+    quantized: QuantizedVectors,
+    query_vectors: np.ndarray,
+) -> np.ndarray:
+  """Scores float32 query vectors against every quantized row.
+
+  Each chunk of _ITEM_BLOCK_SIZE rows is upcast to float32 before the matrix
+  product, so only one chunk is held in float32 at a time.
+  """
+  num_items = len(quantized.values)
+  block_scores = np.empty((len(query_vectors), num_items), dtype=np.float32)
+  for start in range(0, num_items, _ITEM_BLOCK_SIZE):
+    stop = min(start + _ITEM_BLOCK_SIZE, num_items)
+    block_scores[:, start:stop] = (
+        query_vectors @ quantized.values[start:stop].astype(np.float32).T)
+    block_scores[:, start:stop] *= quantized.scales[np.newaxis, start:stop]
+  return block_scores
+
+
+def top_n_similar(
+    quantized: QuantizedVectors,
+    query_indices: np.ndarray,
+    top_n: int,
+    block_size: int = constants.BLOCK_SIZE,
+    vectors: Optional[np.ndarray] = None,
+    norms: Optional[np.ndarray] = None,
+    num_candidates: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+  """Finds the top_n most similar items for each query item.
+
+  The query item itself is excluded from its own results, like
+  similarity.top_n_similar.
+
+  Args:
+    quantized: Quantized vectors of the items.
+    query_indices: A 1-D array of row indices to query.
+    top_n: A number of similar items to return for each query.
+    block_size: A number of queries scored at once.
+    vectors: A 2-D array of the float32 embedding vectors to re-rank the
+      candidates with, or None to return the quantized scores.
+    norms: A 1-D array of the row lengths of vectors. Computed if None.
+    num_candidates: A number of best quantized candidates of each query that
+      are re-ranked with vectors. Values up to top_n disable re-ranking.
+
+  Returns:
+    A tuple of (indices, scores) in the format of similarity.top_n_similar.
+
+  Raises:
+    ValueError: if block_size is not positive.
+  """
+  if block_size <= 0:
+    raise ValueError('block_size must be positive.')
+
+  query_indices = np.asarray(query_indices, dtype=np.int64)
+  num_items = len(quantized.values)
+  k = max(min(top_n, num_items - 1), 0)
+  indices = np.empty((len(query_indices), k), dtype=np.int64)
+  scores = np.empty((len(query_indices), k), dtype=np.float32)
+  if k == 0:
+    return indices, scores
+
+  is_reranking = vectors is not None and num_candidates > k
+  num_kept = min(num_candidates, num_items - 1) if is_reranking else k
+  if is_reranking:
+    if norms is None:
+      norms = np.linalg.norm(vectors, axis=1)
+    norms = np.where(norms == 0, 1.0, norms).astype(np.float32)
+
+  for start in range(0, len(query_indices), block_size):
+    block = query_indices[start:start + block_size]
+    rows = np.arange(len(block))
+    block_scores = _score_block(quantized, quantized.dequantize(block))
+    block_scores[rows, block] = -np.inf
+
+    candidates = np.argpartition(-block_scores, num_kept - 1,
+                                 axis=1)[:, :num_kept]
+    if is_reranking:
+      query_vectors = (np.asarray(vectors[block], dtype=np.float32)
+                       / norms[block, np.newaxis])
+      candidate_vectors = np.asarray(vectors[candidates.ravel()],
+                                     dtype=np.float32).reshape(
+                                         candidates.shape + (-1,))
+      candidate_scores = np.einsum('qd,qcd->qc', query_vectors,
+                                   candidate_vectors) / norms[candidates]
+    else:
+      candidate_scores = np.take_along_axis(block_scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')[:, :k]
+
+    indices[start:start + len(block)] = np.take_along_axis(
+        candidates, order, axis=1)
+    scores[start:start + len(block)] = np.take_along_axis(
+        candidate_scores, order, axis=1)
+
+  return indices, scores
+
+
+def sampled_overlap(
+    quantized: QuantizedVectors,
+    vectors: np.ndarray,
+    norms: np.ndarray,
+    top_n: int,
+    num_candidates: int = 0,
+    sample_size: int = _DEFAULT_OVERLAP_SAMPLE_SIZE,
+    seed: int = 0,
+) -> float:
+  """Estimates the top_n overlap with float32 search on a sample.
+
+  Args:
+    quantized: Quantized vectors of the items.
+    vectors: A 2-D array of the float32 embedding vectors.
+    norms: A 1-D array of the row lengths of vectors.
+    top_n: A number of similar items per query.
+    num_candidates: A number of re-ranked candidates per query, as in
+      top_n_similar.
+    sample_size: A number of randomly sampled query items.
+    seed: A seed for the random number generator.
+
+  Returns:
+    The mean fraction of the float32 top_n items that are also found in the
+    quantized top_n, between 0.0 and 1.0.
+  """
+  num_items = len(quantized.values)
+  rng = np.random.default_rng(seed)
+  sample = np.sort(rng.choice(num_items, min(sample_size, num_items),
+                              replace=False))
+  quantized_indices, _ = top_n_similar(quantized, sample, top_n,
+                                       vectors=vectors, norms=norms,
+                                       num_candidates=num_candidates)
+  exact_indices, _ = similarity.top_n_similar(vectors, sample, top_n,
+                                              norms=norms)
+  return ann.recall_at_n(quantized_indices, exact_indices)
+
+
+def quantized_path(keyed_vectors_path: str, method: str) -> str:
+  """Returns the path prefix of the quantized copy of saved keyed vectors."""
+  return f'{keyed_vectors_path}.{method}'
+
+
+def save(quantized: QuantizedVectors, path: str) -> None:
+  """Saves quantized vectors as .npy files with the path prefix."""
+  np.save(path + _VALUES_SUFFIX, quantized.values)
+  np.save(path + _SCALES_SUFFIX, quantized.scales)
+
+
+def exists(path: str) -> bool:
+  """Returns whether quantized vectors are saved with the path prefix."""
+  return (os.path.exists(path + _VALUES_SUFFIX)
+          and os.path.exists(path + _SCALES_SUFFIX))
+
+
+def modified_time(path: str) -> float:
+  """Returns the last modification time of quantized vectors saved at path."""
+  return min(os.path.getmtime(path + _VALUES_SUFFIX),
+             os.path.getmtime(path + _SCALES_SUFFIX))
+
+
+def load(path: str, mmap_mode: Optional[str] = 'r') -> QuantizedVectors:
+  """Loads quantized vectors saved with the path prefix.
+
+  Args:
+    path: A path prefix of quantized vectors saved by save.
+    mmap_mode: A memory map mode for the arrays, or None to load them into
+      memory.
+
+  Returns:
+    Loaded QuantizedVectors.
+  """
+  return QuantizedVectors(np.load(path + _VALUES_SUFFIX, mmap_mode=mmap_mode),
+                          np.load(path + _SCALES_SUFFIX, mmap_mode=mmap_mode))
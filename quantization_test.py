@@ -0,0 +1,108 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for quantization.py."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import quantization
+import similarity
+
+
+_FAKE_VECTORS = np.random.default_rng(0).normal(
+    size=(300, 16)).astype(np.float32)
+_FAKE_NORMS = np.linalg.norm(_FAKE_VECTORS, axis=1)
+_FAKE_TOP_N = 5
+
+
+class QuantizationTest(unittest.TestCase):
+
+  def test_quantize(self):
+    normed = similarity.normalize_vectors(_FAKE_VECTORS)
+    for method, dtype, tolerance in ((quantization.FLOAT16, np.float16, 1e-3),
+                                     (quantization.INT8, np.int8, 1e-2)):
+      with self.subTest(method=method):
+        quantized = quantization.quantize(_FAKE_VECTORS, method)
+
+        self.assertEqual(quantized.values.dtype, dtype)
+        np.testing.assert_allclose(
+            quantized.dequantize(np.arange(len(_FAKE_VECTORS))), normed,
+            atol=tolerance)
+
+  def test_quantize_int8_uses_full_range(self):
+    quantized = quantization.quantize(_FAKE_VECTORS, quantization.INT8)
+
+    np.testing.assert_array_equal(np.abs(quantized.values).max(axis=1), 127)
+    self.assertEqual(quantized.nbytes,
+                     _FAKE_VECTORS.nbytes // 4 + 4 * len(_FAKE_VECTORS))
+
+  def test_quantize_raises_value_error_with_unknown_method(self):
+    with self.assertRaises(ValueError):
+      quantization.quantize(_FAKE_VECTORS, quantization.NONE)
+
+  def test_top_n_similar_with_rerank_matches_exact_search(self):
+    query_indices = np.arange(len(_FAKE_VECTORS))
+    quantized = quantization.quantize(_FAKE_VECTORS, quantization.INT8)
+
+    indices, scores = quantization.top_n_similar(
+        quantized, query_indices, _FAKE_TOP_N, block_size=64,
+        vectors=_FAKE_VECTORS, num_candidates=30)
+
+    expected_indices, expected_scores = similarity.top_n_similar(
+        _FAKE_VECTORS, query_indices, _FAKE_TOP_N, norms=_FAKE_NORMS)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+  def test_top_n_similar_without_rerank_excludes_query(self):
+    quantized = quantization.quantize(_FAKE_VECTORS, quantization.FLOAT16)
+
+    indices, scores = quantization.top_n_similar(quantized, np.arange(10),
+                                                 _FAKE_TOP_N)
+
+    self.assertEqual(indices.shape, (10, _FAKE_TOP_N))
+    for query_index, row in enumerate(indices):
+      self.assertNotIn(query_index, row)
+    self.assertTrue(np.all(np.diff(scores, axis=1) <= 0))
+
+  def test_sampled_overlap(self):
+    quantized = quantization.quantize(_FAKE_VECTORS, quantization.INT8)
+
+    self.assertEqual(
+        quantization.sampled_overlap(quantized, _FAKE_VECTORS, _FAKE_NORMS,
+                                     _FAKE_TOP_N, num_candidates=30), 1.0)
+    self.assertGreater(
+        quantization.sampled_overlap(quantized, _FAKE_VECTORS, _FAKE_NORMS,
+                                     _FAKE_TOP_N), 0.8)
+
+  def test_save_and_load(self):
+    quantized = quantization.quantize(_FAKE_VECTORS, quantization.INT8)
+    with tempfile.TemporaryDirectory() as temp_dir:
+      path = quantization.quantized_path(os.path.join(temp_dir, 'vectors.kv'),
+                                         quantization.INT8)
+      self.assertFalse(quantization.exists(path))
+
+      quantization.save(quantized, path)
+      loaded = quantization.load(path)
+
+      self.assertTrue(quantization.exists(path))
+      self.assertIsInstance(loaded.values, np.memmap)
+      np.testing.assert_array_equal(loaded.values, quantized.values)
+      np.testing.assert_array_equal(loaded.scales, quantized.scales)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,208 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions and classes for counting the popularity of content ids.
+
+Counts are accumulated one session at a time, so counting never holds more
+than one session and the counter in memory. Integer-encoded corpora are
+counted with vectorized NumPy operations instead.
+"""
+
+import collections
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+import corpus
+import numpy as np
+
+
+# A number of content ids of an encoded corpus counted at once.
+_CHUNK_SIZE = 2 ** 20
+
+
+class ItemCounter:
+  """Accumulates the popularity of content ids one session at a time.
+
+  The input data has no timestamps, but each item_list is ordered by time, so
+  time decay is applied by recency within each session: the latest content
+  id weighs 1.0 and the weight halves every half_life earlier content ids.
+  """
+
+  def __init__(
+      self,
+      half_life: Optional[float] = None,
+      deduplicate_users: bool = False,
+  ) -> None:
+    """Initializes the counter.
+
+    Args:
+      half_life: A number of later content ids in a session after which a
+        view counts half. No decay when None.
+      deduplicate_users: A flag whether each session, which is one user,
+        counts a content id at most once. With half_life, the latest view of
+        the content id is counted.
+
+    Raises:
+      ValueError: if half_life is not positive.
+    """
+    if half_life is not None and half_life <= 0:
+      raise ValueError('half_life must be positive.')
+    self.half_life = half_life
+    self.deduplicate_users = deduplicate_users
+    self.counts = collections.Counter()
+
+  def add(self, session: Sequence[str]) -> None:
+    """Adds the content ids of one session to the counts."""
+    if self.half_life is None:
+      self.counts.update(
+          dict.fromkeys(session, 1) if self.deduplicate_users else session)
+      return
+
+    decay = 0.5 ** (1.0 / self.half_life)
+    weights = {}
+    for position, item in enumerate(reversed(session)):
+      weight = decay ** position
+      if self.deduplicate_users:
+        weights.setdefault(item, weight)
+      else:
+        weights[item] = weights.get(item, 0.0) + weight
+    self.counts.update(weights)
+
+  def settings(self) -> Tuple[Optional[float], bool]:
+    """Returns the settings that determine the counts."""
+    return self.half_life, self.deduplicate_users
+
+
+class CountingCorpus:
+  """Wraps a corpus and counts content ids during its first full pass.
+
+  Passing this corpus to word2vec folds the popularity count into the pass
+  that builds the vocabulary, so the ranking process does not read the
+  training data again.
+  """
+
+  def __init__(
+      self,
+      training_data: Iterable[Sequence[str]],
+      half_life: Optional[float] = None,
+      deduplicate_users: bool = False,
+  ) -> None:
+    """Initializes the corpus.
+
+    Args:
+      training_data: A re-iterable corpus of sessions as lists of content
+        ids.
+      half_life: See ItemCounter.
+      deduplicate_users: See ItemCounter.
+    """
+    self.training_data = training_data
+    self.half_life = half_life
+    self.deduplicate_users = deduplicate_users
+    self.counter = None
+
+  def __iter__(self) -> Iterator[Sequence[str]]:
+    """Yields each session and counts it if no pass has completed yet."""
+    if self.counter is not None:
+      yield from self.training_data
+      return
+
+    counter = ItemCounter(self.half_life, self.deduplicate_users)
+    for session in self.training_data:
+      counter.add(session)
+      yield session
+    self.counter = counter
+
+
+def _count_encoded_items(
+    encoded: corpus.EncodedCorpus,
+    half_life: Optional[float],
+    deduplicate_users: bool,
+    chunk_size: int = _CHUNK_SIZE,
+) -> collections.Counter:
+  """Counts the popularity of content ids of an encoded corpus.
+
+  See ItemCounter for the meaning of the arguments. Content ids with equal
+  counts keep the first-seen order of the streaming count. Whole sessions are
+  counted in chunks of about chunk_size content ids, so the temporary arrays
+  of the time decay and the deduplication are bounded by the chunk rather
+  than the corpus.
+  """
+  if half_life is not None and half_life <= 0:
+    raise ValueError('half_life must be positive.')
+  vocabulary_size = len(encoded.vocabulary)
+  if not vocabulary_size:
+    return collections.Counter()
+
+  offsets = np.asarray(encoded.offsets)
+  counts = np.zeros(vocabulary_size,
+                    dtype=np.int64 if half_life is None else np.float64)
+  first = 0
+  while first < len(encoded):
+    last = max(first + 1, int(np.searchsorted(
+        offsets, offsets[first] + chunk_size, side='right')) - 1)
+    start, stop = offsets[first], offsets[last]
+    tokens = np.asarray(encoded.tokens[start:stop])
+    lengths = np.diff(offsets[first:last + 1])
+
+    weights = None
+    if half_life is not None:
+      positions = (np.repeat(offsets[first + 1:last + 1] - 1, lengths)
+                   - np.arange(start, stop))
+      weights = 0.5 ** (positions / half_life)
+    if deduplicate_users:
+      keys = (np.repeat(np.arange(last - first, dtype=np.int64), lengths)
+              * vocabulary_size + tokens)
+      order = np.argsort(keys, kind='stable')
+      starts = np.flatnonzero(np.diff(keys[order], prepend=-1))
+      tokens = tokens[order[starts]]
+      if weights is not None:
+        weights = np.maximum.reduceat(weights[order], starts)
+
+    counts += np.bincount(tokens, weights=weights, minlength=vocabulary_size)
+    first = last
+
+  nonzero = np.flatnonzero(counts)
+  return collections.Counter(dict(zip(encoded.vocabulary[nonzero].tolist(),
+                                      counts[nonzero].tolist())))
+
+
+def count_items(
+    training_data: Iterable[Sequence[str]],
+    half_life: Optional[float] = None,
+    deduplicate_users: bool = False,
+) -> collections.Counter:
+  """Counts the popularity of content ids in a streaming pass.
+
+  Counts already collected by a CountingCorpus with the same settings are
+  reused without another pass over the training data, and a
+  corpus.EncodedCorpus is counted with np.bincount over its integer ids.
+
+  Args:
+    training_data: A re-iterable corpus of sessions as lists of content ids.
+    half_life: See ItemCounter.
+    deduplicate_users: See ItemCounter.
+
+  Returns:
+    A counter of popularity per content id.
+  """
+  if (isinstance(training_data, CountingCorpus)
+      and training_data.counter is not None
+      and training_data.counter.settings() == (half_life, deduplicate_users)):
+    return training_data.counter.counts
+  if isinstance(training_data, corpus.EncodedCorpus):
+    return _count_encoded_items(training_data, half_life, deduplicate_users)
+
+  counter = ItemCounter(half_life, deduplicate_users)
+  for session in training_data:
+    counter.add(session)
+  return counter.counts
@@ -0,0 +1,130 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for ranking.py."""
+
+import unittest
+
+from absl.testing import parameterized
+import corpus
+import ranking
+
+
+_FAKE_TRAINING_DATA = [['ITEM_A', 'ITEM_A', 'ITEM_A', 'ITEM_B'],
+                       ['ITEM_B', 'ITEM_C']]
+
+
+class CountItemsTest(parameterized.TestCase):
+
+  @parameterized.named_parameters([
+      {
+          'testcase_name': 'raw_counts',
+          'half_life': None,
+          'deduplicate_users': False,
+          'expected': {'ITEM_A': 3, 'ITEM_B': 2, 'ITEM_C': 1},
+      },
+      {
+          'testcase_name': 'per_user_counts',
+          'half_life': None,
+          'deduplicate_users': True,
+          'expected': {'ITEM_A': 1, 'ITEM_B': 2, 'ITEM_C': 1},
+      },
+      {
+          'testcase_name': 'decayed_counts',
+          'half_life': 1.0,
+          'deduplicate_users': False,
+          'expected': {'ITEM_A': 0.875, 'ITEM_B': 1.5, 'ITEM_C': 1.0},
+      },
+      {
+          'testcase_name': 'decayed_per_user_counts',
+          'half_life': 1.0,
+          'deduplicate_users': True,
+          'expected': {'ITEM_A': 0.5, 'ITEM_B': 1.5, 'ITEM_C': 1.0},
+      },
+  ])
+  def test_count_items(self, half_life, deduplicate_users, expected):
+    actual = ranking.count_items(_FAKE_TRAINING_DATA, half_life,
+                                 deduplicate_users)
+
+    self.assertEqual(dict(actual), expected)
+
+  @parameterized.named_parameters([
+      {'testcase_name': 'raw_counts', 'half_life': None,
+       'deduplicate_users': False},
+      {'testcase_name': 'per_user_counts', 'half_life': None,
+       'deduplicate_users': True},
+      {'testcase_name': 'decayed_counts', 'half_life': 1.0,
+       'deduplicate_users': False},
+      {'testcase_name': 'decayed_per_user_counts', 'half_life': 1.0,
+       'deduplicate_users': True},
+  ])
+  def test_count_items_of_encoded_corpus_matches_streaming_count(
+      self, half_life, deduplicate_users):
+    encoded = corpus.EncodedCorpus.from_sessions(_FAKE_TRAINING_DATA)
+
+    actual = ranking.count_items(encoded, half_life, deduplicate_users)
+
+    expected = ranking.count_items(_FAKE_TRAINING_DATA, half_life,
+                                   deduplicate_users)
+    self.assertEqual(actual.most_common(), expected.most_common())
+
+  @parameterized.parameters(1, 3, 100)
+  def test_count_encoded_items_in_chunks(self, chunk_size):
+    encoded = corpus.EncodedCorpus.from_sessions(_FAKE_TRAINING_DATA)
+    for half_life in (None, 1.0):
+      for deduplicate_users in (False, True):
+        with self.subTest(half_life=half_life,
+                          deduplicate_users=deduplicate_users):
+          actual = ranking._count_encoded_items(encoded, half_life,
+                                                deduplicate_users, chunk_size)
+
+          expected = ranking.count_items(_FAKE_TRAINING_DATA, half_life,
+                                         deduplicate_users)
+          self.assertEqual(actual.most_common(), expected.most_common())
+
+  def test_count_items_of_empty_encoded_corpus(self):
+    encoded = corpus.EncodedCorpus.from_sessions([])
+
+    for deduplicate_users in (False, True):
+      with self.subTest(deduplicate_users=deduplicate_users):
+        self.assertEqual(
+            ranking.count_items(encoded, deduplicate_users=deduplicate_users),
+            {})
+
+  def test_count_items_with_invalid_half_life(self):
+    with self.assertRaisesRegex(ValueError, 'half_life must be positive'):
+      ranking.count_items(_FAKE_TRAINING_DATA, half_life=0)
+
+
+class CountingCorpusTest(unittest.TestCase):
+
+  def test_counts_during_first_pass(self):
+    training_data = ranking.CountingCorpus(_FAKE_TRAINING_DATA)
+
+    self.assertEqual(list(training_data), _FAKE_TRAINING_DATA)
+    self.assertEqual(list(training_data), _FAKE_TRAINING_DATA)
+    self.assertEqual(dict(training_data.counter.counts),
+                     {'ITEM_A': 3, 'ITEM_B': 2, 'ITEM_C': 1})
+
+  def test_count_items_recounts_with_different_settings(self):
+    training_data = ranking.CountingCorpus(_FAKE_TRAINING_DATA)
+    _ = list(training_data)
+
+    actual = ranking.count_items(training_data, deduplicate_users=True)
+
+    self.assertEqual(actual['ITEM_A'], 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,241 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for assembling recommendation results into output data."""
+
+import os
+import zipfile
+from typing import Dict, Optional, Sequence, Tuple
+
+import constants
+import numpy as np
+import pandas as pd
+
+
+OUTPUT_FORMAT_CSV = 'csv'
+OUTPUT_FORMAT_NPZ = 'npz'
+
+NPZ_RECORDS = 'records'
+NPZ_VOCABULARY = 'vocabulary'
+NPZ_RECORD_DTYPES = np.dtype([
+    (constants.KEYWORD, 'i4'),
+    (constants.RCM_RESULT, 'i4'),
+    (constants.RANK, 'i2'),
+    (constants.SCORE, 'f4'),
+])
+
+_ZIP_LOCAL_HEADER_SIZE = 30
+_ZIP_LOCAL_HEADER_NAME_LENGTH = slice(26, 28)
+_ZIP_LOCAL_HEADER_EXTRA_LENGTH = slice(28, 30)
+
+
+def build_result_frame(
+    keywords: Sequence[str],
+    rcm_results: Sequence[str],
+    ranks: Sequence[int],
+    scores: Sequence[float],
+) -> pd.DataFrame:
+  """Builds a recommendation result dataframe from columnar data.
+
+  The dataframe is created once from whole columns, so the cost is linear in
+  the number of recommendations.
+
+  Args:
+    keywords: Key content ids, one per recommendation.
+    rcm_results: Recommended content ids, one per recommendation.
+    ranks: Ranks of the recommended content ids starting from 1.
+    scores: Similarity scores of the recommended content ids.
+
+  Returns:
+    A dataframe with key content id, recommend content id, rank, score.
+
+  Raises:
+    ValueError: if the columns have different lengths.
+  """
+  lengths = {len(keywords), len(rcm_results), len(ranks), len(scores)}
+  if len(lengths) > 1:
+    raise ValueError('All result columns must have the same length.')
+
+  return pd.DataFrame({
+      constants.KEYWORD: pd.Series(np.asarray(keywords, dtype=object),
+                                   dtype='object'),
+      constants.RCM_RESULT: pd.Series(np.asarray(rcm_results, dtype=object),
+                                      dtype='object'),
+      constants.RANK: pd.Series(np.asarray(ranks, dtype=np.int64),
+                                dtype='int64'),
+      constants.SCORE: pd.Series(np.asarray(scores, dtype=np.float64),
+                                 dtype='float64'),
+  })
+
+
+def build_top_n_frame(
+    keywords: Sequence[str],
+    index_to_key: Sequence[str],
+    indices: np.ndarray,
+    scores: np.ndarray,
+) -> pd.DataFrame:
+  """Builds a recommendation result dataframe from top-N search output.
+
+  Args:
+    keywords: Key content ids, one per row of indices.
+    index_to_key: A sequence mapping vocabulary indices to content ids.
+    indices: A 2-D array of recommended vocabulary indices sorted by rank.
+    scores: A 2-D array of scores with the same shape as indices.
+
+  Returns:
+    A dataframe with key content id, recommend content id, rank, score.
+  """
+  num_keywords, top_n = indices.shape
+  vocabulary = np.asarray(index_to_key, dtype=object)
+
+  return build_result_frame(
+      np.repeat(np.asarray(keywords, dtype=object), top_n),
+      vocabulary[indices.ravel()],
+      np.tile(np.arange(1, top_n + 1), num_keywords),
+      np.asarray(scores).ravel(),
+  )
+
+
+def write_npz(df_result: pd.DataFrame, path: str) -> None:
+  """Writes recommendation results as a binary columnar .npz file.
+
+  Keywords and recommended content ids are integer-coded against one shared
+  vocabulary, and the records are a structured array of NPZ_RECORD_DTYPES.
+  The file is not compressed, so load_npz can memory-map its arrays.
+
+  Args:
+    df_result: A dataframe with key content id, recommend content id, rank,
+      score.
+    path: A file path of output.
+  """
+  codes, vocabulary = pd.factorize(pd.concat(
+      [df_result[constants.KEYWORD], df_result[constants.RCM_RESULT]],
+      ignore_index=True))
+  records = np.empty(len(df_result), dtype=NPZ_RECORD_DTYPES)
+  records[constants.KEYWORD] = codes[:len(df_result)]
+  records[constants.RCM_RESULT] = codes[len(df_result):]
+  records[constants.RANK] = df_result[constants.RANK].to_numpy()
+  records[constants.SCORE] = df_result[constants.SCORE].to_numpy()
+
+  with open(path, 'wb') as f:
+    np.savez(f, **{NPZ_RECORDS: records,
+                   NPZ_VOCABULARY: np.asarray(vocabulary, dtype=str)})
+
+
+def _memmap_npz_member(
+    path: str,
+    info: zipfile.ZipInfo,
+    mmap_mode: str,
+) -> np.ndarray:
+  """Memory-maps one uncompressed .npy member of a .npz file."""
+  with open(path, 'rb') as f:
+    f.seek(info.header_offset)
+    local_header = f.read(_ZIP_LOCAL_HEADER_SIZE)
+    name_length = int.from_bytes(
+        local_header[_ZIP_LOCAL_HEADER_NAME_LENGTH], 'little')
+    extra_length = int.from_bytes(
+        local_header[_ZIP_LOCAL_HEADER_EXTRA_LENGTH], 'little')
+    f.seek(info.header_offset + _ZIP_LOCAL_HEADER_SIZE + name_length
+           + extra_length)
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+      shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+      shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    offset = f.tell()
+  return np.memmap(path, dtype=dtype, mode=mmap_mode, offset=offset,
+                   shape=shape, order='F' if fortran_order else 'C')
+
+
+def load_npz(
+    path: str,
+    mmap_mode: Optional[str] = 'r',
+) -> Dict[str, np.ndarray]:
+  """Loads the arrays of an uncompressed .npz file written by write_npz.
+
+  np.load does not memory-map .npz members, so the members are mapped
+  directly from their offsets in the file when mmap_mode is set. Loading is
+  then zero-copy regardless of the number of rows.
+
+  Args:
+    path: A .npz file path.
+    mmap_mode: A memory map mode, or None to read the arrays into memory.
+
+  Returns:
+    A dict of array name to array.
+  """
+  if mmap_mode is None:
+    with np.load(path) as data:
+      return {name: data[name] for name in data.files}
+
+  arrays = {}
+  with zipfile.ZipFile(path) as zf:
+    for info in zf.infolist():
+      name = info.filename[:-len('.npy')]
+      if info.compress_type == zipfile.ZIP_STORED:
+        arrays[name] = _memmap_npz_member(path, info, mmap_mode)
+      else:
+        with zf.open(info) as f:
+          arrays[name] = np.lib.format.read_array(f)
+  return arrays
+
+
+def read_npz_records(
+    path: str,
+    mmap_mode: Optional[str] = 'r',
+) -> Tuple[np.ndarray, np.ndarray]:
+  """Reads integer-coded recommendation records written by write_npz.
+
+  Args:
+    path: A .npz file path.
+    mmap_mode: A memory map mode, or None to read the arrays into memory.
+
+  Returns:
+    A tuple of (records, vocabulary). records is a structured array of
+    NPZ_RECORD_DTYPES whose keyword and rcm_result fields index vocabulary.
+  """
+  arrays = load_npz(path, mmap_mode)
+  return arrays[NPZ_RECORDS], arrays[NPZ_VOCABULARY]
+
+
+def read_result_frame(path: str) -> pd.DataFrame:
+  """Reads recommendation results written in csv or npz format.
+
+  Args:
+    path: A file path of output. Files ending with .npz are read as npz.
+
+  Returns:
+    A dataframe with key content id, recommend content id, rank, score.
+  """
+  if os.path.splitext(path)[1] == f'.{OUTPUT_FORMAT_NPZ}':
+    records, vocabulary = read_npz_records(path)
+    vocabulary = vocabulary.astype(object)
+    return build_result_frame(
+        vocabulary[records[constants.KEYWORD]],
+        vocabulary[records[constants.RCM_RESULT]],
+        records[constants.RANK],
+        records[constants.SCORE],
+    )
+
+  df_result = pd.read_csv(
+      path,
+      dtype={constants.KEYWORD: object, constants.RCM_RESULT: object},
+      keep_default_na=False,
+  )
+  return build_result_frame(
+      df_result[constants.KEYWORD],
+      df_result[constants.RCM_RESULT],
+      df_result[constants.RANK],
+      df_result[constants.SCORE],
+  )
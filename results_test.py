@@ -0,0 +1,104 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for results.py."""
+
+import os
+import tempfile
+import unittest
+
+import constants
+import numpy as np
+import pandas as pd
+import results
+
+
+_FAKE_DF_RESULTS = pd.DataFrame({
+    constants.KEYWORD: ['ITEM_A', 'ITEM_A', 'ITEM_B', 'ITEM_B'],
+    constants.RCM_RESULT: ['ITEM_B', 'ITEM_C', 'ITEM_C', 'ITEM_A'],
+    constants.RANK: [1, 2, 1, 2],
+    constants.SCORE: [0.9, 0.8, 0.7, 0.6],
+})
+
+
+class ResultsTest(unittest.TestCase):
+
+  def test_build_result_frame(self):
+    actual = results.build_result_frame(
+        ['ITEM_A', 'ITEM_A', 'ITEM_B', 'ITEM_B'],
+        ['ITEM_B', 'ITEM_C', 'ITEM_C', 'ITEM_A'],
+        [1, 2, 1, 2],
+        [0.9, 0.8, 0.7, 0.6],
+    )
+
+    pd.testing.assert_frame_equal(actual, _FAKE_DF_RESULTS)
+
+  def test_build_result_frame_with_empty_columns(self):
+    actual = results.build_result_frame([], [], [], [])
+
+    self.assertTrue(actual.empty)
+    self.assertEqual(actual.dtypes.tolist(),
+                     [np.dtype('O'), np.dtype('O'), np.dtype('int64'),
+                      np.dtype('float64')])
+
+  def test_build_result_frame_with_different_lengths(self):
+    with self.assertRaisesRegex(ValueError, 'same length'):
+      results.build_result_frame(['ITEM_A'], [], [1], [0.9])
+
+  def test_build_top_n_frame(self):
+    actual = results.build_top_n_frame(
+        ['ITEM_A', 'ITEM_B'],
+        ['ITEM_A', 'ITEM_B', 'ITEM_C'],
+        np.array([[1, 2], [2, 0]]),
+        np.array([[0.9, 0.8], [0.7, 0.6]], dtype=np.float32),
+    )
+
+    pd.testing.assert_frame_equal(actual, _FAKE_DF_RESULTS, atol=1e-6)
+
+  def _write_npz(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    path = os.path.join(temp_dir.name, 'output.npz')
+    results.write_npz(_FAKE_DF_RESULTS, path)
+    return path
+
+  def test_read_npz_records_with_memory_map(self):
+    path = self._write_npz()
+
+    records, vocabulary = results.read_npz_records(path)
+
+    self.assertIsInstance(records, np.memmap)
+    self.assertEqual(records.dtype, results.NPZ_RECORD_DTYPES)
+    np.testing.assert_array_equal(vocabulary[records[constants.KEYWORD]],
+                                  _FAKE_DF_RESULTS[constants.KEYWORD])
+    np.testing.assert_array_equal(vocabulary[records[constants.RCM_RESULT]],
+                                  _FAKE_DF_RESULTS[constants.RCM_RESULT])
+    np.testing.assert_array_equal(records[constants.RANK],
+                                  _FAKE_DF_RESULTS[constants.RANK])
+    np.testing.assert_allclose(records[constants.SCORE],
+                               _FAKE_DF_RESULTS[constants.SCORE], atol=1e-6)
+
+  def test_read_npz_records_without_memory_map(self):
+    path = self._write_npz()
+
+    records, vocabulary = results.read_npz_records(path, mmap_mode=None)
+    expected_records, expected_vocabulary = results.read_npz_records(path)
+
+    self.assertNotIsInstance(records, np.memmap)
+    np.testing.assert_array_equal(records, expected_records)
+    np.testing.assert_array_equal(vocabulary, expected_vocabulary)
+
+
+if __name__ == '__main__':
+  unittest.main()
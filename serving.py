@@ -0,0 +1,309 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""HTTP service answering recommendation queries from saved keyed vectors.
+
+Run from project's root directory.
+
+Example:
+  `python serving.py -kv [Keyed vectors path] --port 8080`
+  `curl 'localhost:8080/similar?item=ITEM_A'`
+  `curl 'localhost:8080/session?items=ITEM_A,ITEM_B,ITEM_C'`
+  `curl 'localhost:8080/metrics'`
+"""
+
+import argparse
+import collections
+import functools
+from http import server
+import json
+import logging
+import threading
+import time
+from typing import Any, Deque, Dict, Sequence, Tuple
+from urllib import parse
+
+import constants
+import gensim
+import model_store
+import numpy as np
+
+
+_CACHE_SIZE = 10000
+_LATENCY_WINDOW = 10000
+_HOST = '127.0.0.1'
+_PORT = 8080
+
+PATH_SIMILAR = '/similar'
+PATH_SESSION = '/session'
+PATH_METRICS = '/metrics'
+PARAM_ITEM = 'item'
+PARAM_ITEMS = 'items'
+
+Recommendations = Tuple[Tuple[str, float], ...]
+
+
+class Recommender:
+  """Scores queries against keyed vectors held in memory once.
+
+  Vectors are scored in place and divided by their precomputed norms, so
+  read-only memory-mapped keyed vectors are not copied. Results of hot
+  queries are kept in LRU caches.
+  """
+
+  def __init__(
+      self,
+      keyed_vectors: gensim.models.KeyedVectors,
+      top_n: int = constants.TOP_N,
+      cache_size: int = _CACHE_SIZE,
+  ) -> None:
+    """Initializes the recommender.
+
+    Args:
+      keyed_vectors: Trained keyed vectors.
+      top_n: A number of recommendations per query.
+      cache_size: A number of cached results per query type.
+    """
+    keyed_vectors.fill_norms()
+    self._keyed_vectors = keyed_vectors
+    self._vectors = keyed_vectors.vectors
+    self._norms = np.where(keyed_vectors.norms == 0, 1.0,
+                           keyed_vectors.norms).astype(np.float32)
+    self._top_n = top_n
+    self.similar = functools.lru_cache(maxsize=cache_size)(self._similar)
+    self.session = functools.lru_cache(maxsize=cache_size)(self._session)
+
+  def _top_n_excluding(
+      self,
+      query: np.ndarray,
+      exclude: Sequence[int],
+  ) -> Recommendations:
+    """Returns the top_n items most similar to a unit length query."""
+    scores = self._vectors @ query
+    scores /= self._norms
+    scores[list(exclude)] = -np.inf
+    k = min(self._top_n, len(scores) - len(set(exclude)))
+    if k <= 0:
+      return ()
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best], kind='stable')]
+    index_to_key = self._keyed_vectors.index_to_key
+    return tuple((index_to_key[i], float(scores[i])) for i in best)
+
+  def _similar(self, item: str) -> Recommendations:
+    """Returns the items most similar to one item.
+
+    Raises:
+      KeyError: if the item is not in the vocabulary.
+    """
+    index = self._keyed_vectors.get_index(item)
+    return self._top_n_excluding(self._vectors[index] / self._norms[index],
+                                 [index])
+
+  def _session(self, items: Tuple[str, ...]) -> Recommendations:
+    """Returns the items most similar to the mean vector of a session.
+
+    Items missing from the vocabulary are ignored, and the session items are
+    excluded from the results.
+
+    Raises:
+      KeyError: if none of the items is in the vocabulary.
+    """
+    indices = [self._keyed_vectors.key_to_index[item] for item in items
+               if item in self._keyed_vectors.key_to_index]
+    if not indices:
+      raise KeyError(items)
+    query = np.mean(self._vectors[indices]
+                    / self._norms[indices, np.newaxis], axis=0)
+    norm = np.linalg.norm(query)
+    return self._top_n_excluding(query / (norm if norm else 1.0), indices)
+
+
+class LatencyRecorder:
+  """Keeps the latencies of recent requests per endpoint."""
+
+  def __init__(self, window: int = _LATENCY_WINDOW) -> None:
+    """Initializes the recorder.
+
+    Args:
+      window: A number of recent requests per endpoint that percentiles are
+        computed over.
+    """
+    self._lock = threading.Lock()
+    self._counts = collections.Counter()
+    self._latencies: Dict[str, Deque[float]] = collections.defaultdict(
+        functools.partial(collections.deque, maxlen=window))
+
+  def record(self, endpoint: str, seconds: float) -> None:
+    with self._lock:
+      self._counts[endpoint] += 1
+      self._latencies[endpoint].append(seconds)
+
+  def summary(self) -> Dict[str, Dict[str, float]]:
+    """Returns the request count and p50/p99 latency of each endpoint."""
+    with self._lock:
+      latencies = {endpoint: np.array(values)
+                   for endpoint, values in self._latencies.items()}
+      counts = dict(self._counts)
+    return {
+        endpoint: {
+            'count': counts[endpoint],
+            'p50_ms': float(np.percentile(values, 50) * 1000),
+            'p99_ms': float(np.percentile(values, 99) * 1000),
+        } for endpoint, values in latencies.items()
+    }
+
+
+class RecommendationServer(server.ThreadingHTTPServer):
+  """A threaded HTTP server holding one Recommender for all requests."""
+
+  daemon_threads = True
+
+  def __init__(
+      self,
+      server_address: Tuple[str, int],
+      recommender: Recommender,
+  ) -> None:
+    super().__init__(server_address, RecommendationHandler)
+    self.recommender = recommender
+    self.latencies = LatencyRecorder()
+
+
+class RecommendationHandler(server.BaseHTTPRequestHandler):
+  """Answers /similar, /session and /metrics requests with JSON."""
+
+  def _send_json(self, status: int, body: Any) -> None:
+    data = json.dumps(body).encode('utf-8')
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def _metrics(self) -> Dict[str, Any]:
+    caches = {
+        PATH_SIMILAR: self.server.recommender.similar.cache_info(),
+        PATH_SESSION: self.server.recommender.session.cache_info(),
+    }
+    return {
+        'latency': self.server.latencies.summary(),
+        'cache': {path: {'hits': info.hits, 'misses': info.misses,
+                         'size': info.currsize}
+                  for path, info in caches.items()},
+    }
+
+  def do_GET(self) -> None:  # pylint: disable=invalid-name
+    start = time.perf_counter()
+    url = parse.urlsplit(self.path)
+    params = parse.parse_qs(url.query)
+    if url.path == PATH_METRICS:
+      self._send_json(200, self._metrics())
+      return
+    if url.path not in (PATH_SIMILAR, PATH_SESSION):
+      self._send_json(404, {'error': f'Unknown path {url.path}.'})
+      return
+    param = PARAM_ITEM if url.path == PATH_SIMILAR else PARAM_ITEMS
+    if param not in params:
+      self._send_json(400, {'error': f'Missing query parameter {param}.'})
+      return
+
+    recommender = self.server.recommender
+    try:
+      if url.path == PATH_SIMILAR:
+        recommendations = recommender.similar(params[param][0])
+      else:
+        recommendations = recommender.session(tuple(
+            item for item in params[param][0].split(constants.DELIMITER)
+            if item))
+    except KeyError:
+      self._send_json(404, {'error': 'Unknown content id.'})
+      return
+
+    body = [
+        {constants.RCM_RESULT: item, constants.RANK: rank,
+         constants.SCORE: score}
+        for rank, (item, score) in enumerate(recommendations, start=1)
+    ]
+    self.server.latencies.record(url.path, time.perf_counter() - start)
+    self._send_json(200, body)
+
+  def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+    logging.debug(format, *args)
+
+
+def parse_cli_args() -> argparse.Namespace:
+  """Parses command line arguments.
+
+  Returns:
+    An instance of argparse.Namespace with arg values.
+  """
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+      '--keyed_vectors', '-kv',
+      help='File path of keyed vectors saved by the train stage of main.py.',
+      required=True,
+      type=str,
+      )
+  parser.add_argument(
+      '--host',
+      help='Host to listen on.',
+      default=_HOST,
+      required=False,
+      type=str,
+      )
+  parser.add_argument(
+      '--port', '-p',
+      help='Port to listen on.',
+      default=_PORT,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--top_n', '-n',
+      help='Number of recommendations per query.',
+      default=constants.TOP_N,
+      required=False,
+      type=int,
+      )
+  parser.add_argument(
+      '--cache_size',
+      help='Number of cached results per query type.',
+      default=_CACHE_SIZE,
+      required=False,
+      type=int,
+      )
+
+  return parser.parse_args()
+
+
+def main() -> None:
+  """Serves recommendations over HTTP until interrupted."""
+  logging.basicConfig(
+      format='%(asctime)s %(message)s',
+      datefmt='%m/%d/%Y %I:%M:%S %p',
+      level=logging.INFO,
+  )
+  args = parse_cli_args()
+  recommender = Recommender(model_store.load_keyed_vectors(args.keyed_vectors),
+                            args.top_n, args.cache_size)
+  with RecommendationServer((args.host, args.port), recommender) as httpd:
+    logging.info('Serving recommendations on %s:%d.', *httpd.server_address)
+    try:
+      httpd.serve_forever()
+    except KeyboardInterrupt:
+      pass
+
+
+if __name__ == '__main__':
+  main()
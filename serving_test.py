@@ -0,0 +1,153 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for serving.py."""
+
+import json
+import threading
+import unittest
+from urllib import error
+from urllib import request
+
+import gensim
+import numpy as np
+import serving
+import similarity
+
+
+_FAKE_KEYS = ['ITEM_A', 'ITEM_B', 'ITEM_C', 'ITEM_D', 'ITEM_E']
+
+
+def _fake_keyed_vectors():
+  keyed_vectors = gensim.models.KeyedVectors(vector_size=3)
+  keyed_vectors.add_vectors(_FAKE_KEYS, np.array([
+      [1.0, 0.0, 0.0],
+      [0.9, 0.1, 0.0],
+      [0.0, 1.0, 0.0],
+      [0.0, 0.9, 0.1],
+      [0.0, 0.0, 2.0],
+  ], dtype=np.float32))
+  return keyed_vectors
+
+
+class RecommenderTest(unittest.TestCase):
+
+  def test_similar_matches_top_n_similar(self):
+    keyed_vectors = _fake_keyed_vectors()
+    recommender = serving.Recommender(keyed_vectors, top_n=3)
+
+    actual = recommender.similar('ITEM_A')
+
+    indices, scores = similarity.top_n_similar(
+        similarity.normalize_vectors(keyed_vectors.vectors), [0], 3)
+    self.assertEqual([item for item, _ in actual],
+                     [_FAKE_KEYS[i] for i in indices[0]])
+    np.testing.assert_allclose([score for _, score in actual], scores[0],
+                               atol=1e-6)
+
+  def test_similar_with_unknown_item(self):
+    recommender = serving.Recommender(_fake_keyed_vectors())
+
+    with self.assertRaises(KeyError):
+      recommender.similar('ITEM_Z')
+
+  def test_session_excludes_session_items(self):
+    recommender = serving.Recommender(_fake_keyed_vectors(), top_n=2)
+
+    actual = recommender.session(('ITEM_A', 'ITEM_C', 'ITEM_Z'))
+
+    self.assertEqual([item for item, _ in actual], ['ITEM_B', 'ITEM_D'])
+
+  def test_session_with_unknown_items(self):
+    recommender = serving.Recommender(_fake_keyed_vectors())
+
+    with self.assertRaises(KeyError):
+      recommender.session(('ITEM_Z',))
+
+  def test_similar_is_cached(self):
+    recommender = serving.Recommender(_fake_keyed_vectors())
+
+    recommender.similar('ITEM_A')
+    recommender.similar('ITEM_A')
+
+    self.assertEqual(recommender.similar.cache_info().hits, 1)
+
+
+class LatencyRecorderTest(unittest.TestCase):
+
+  def test_summary(self):
+    latencies = serving.LatencyRecorder(window=100)
+    for seconds in np.linspace(0.001, 0.1, 200):
+      latencies.record('/similar', seconds)
+
+    actual = latencies.summary()['/similar']
+
+    self.assertEqual(actual['count'], 200)
+    self.assertAlmostEqual(actual['p50_ms'], 75.25, delta=0.5)
+    self.assertAlmostEqual(actual['p99_ms'], 99.5, delta=0.5)
+
+
+class RecommendationServerTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._server = serving.RecommendationServer(
+        ('127.0.0.1', 0),
+        serving.Recommender(_fake_keyed_vectors(), top_n=2))
+    thread = threading.Thread(target=self._server.serve_forever)
+    thread.start()
+    self.addCleanup(thread.join)
+    self.addCleanup(self._server.server_close)
+    self.addCleanup(self._server.shutdown)
+
+  def _get(self, path):
+    host, port = self._server.server_address
+    with request.urlopen(f'http://{host}:{port}{path}') as response:
+      return json.load(response)
+
+  def _get_status(self, path):
+    with self.assertRaises(error.HTTPError) as context:
+      self._get(path)
+    return context.exception.code
+
+  def test_similar(self):
+    actual = self._get('/similar?item=ITEM_C')
+
+    self.assertEqual([row['rcm_result'] for row in actual],
+                     ['ITEM_D', 'ITEM_B'])
+    self.assertEqual([row['rank'] for row in actual], [1, 2])
+
+  def test_session(self):
+    actual = self._get('/session?items=ITEM_A,ITEM_C')
+
+    self.assertEqual([row['rcm_result'] for row in actual],
+                     ['ITEM_B', 'ITEM_D'])
+
+  def test_metrics(self):
+    self._get('/similar?item=ITEM_A')
+    self._get('/similar?item=ITEM_A')
+
+    actual = self._get('/metrics')
+
+    self.assertEqual(actual['latency']['/similar']['count'], 2)
+    self.assertEqual(actual['cache']['/similar']['hits'], 1)
+
+  def test_errors(self):
+    self.assertEqual(self._get_status('/similar?item=ITEM_Z'), 404)
+    self.assertEqual(self._get_status('/similar'), 400)
+    self.assertEqual(self._get_status('/unknown'), 404)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,209 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for recommending content to users from their recent sessions.
+
+Each user's query vector is a recency-weighted mean of the unit vectors of
+the last content ids in the user's item_list. All users are scored against
+the whole vocabulary with blocked matrix products, excluding the content ids
+the user already saw.
+"""
+
+import logging
+import os
+from typing import Iterator, NamedTuple, Optional, Sequence
+
+import constants
+import error_messages
+import gensim
+import numpy as np
+import pandas as pd
+import results
+from scipy import sparse
+import similarity
+
+
+_DEFAULT_NUM_RECENT_ITEMS = 10
+_DEFAULT_HALF_LIFE = 3.0
+_DEFAULT_CHUNK_SIZE = 100000
+
+
+class SessionQueries(NamedTuple):
+  """Query vectors of users and the content ids they saw.
+
+  Attributes:
+    has_query: A boolean array, True for users with at least one content id
+      in the vocabulary.
+    vectors: A float32 array of unit length query vectors of the users with
+      has_query.
+    seen_offsets: Offsets into seen_indices in CSR layout, one session per
+      user with has_query.
+    seen_indices: Vocabulary indices of the content ids each user saw.
+  """
+  has_query: np.ndarray
+  vectors: np.ndarray
+  seen_offsets: np.ndarray
+  seen_indices: np.ndarray
+
+
+def iter_user_sessions(
+    path: str,
+    chunk_size: int = _DEFAULT_CHUNK_SIZE,
+) -> Iterator[pd.DataFrame]:
+  """Reads user ids and their item_list from training data in chunks.
+
+  Args:
+    path: A CSV format file path of training data.
+    chunk_size: A number of CSV rows read at once.
+
+  Yields:
+    Dataframes with the user_id and item_list columns as strings.
+
+  Raises:
+    IOError: if the path is not found.
+  """
+  if not os.path.exists(path):
+    raise IOError(error_messages.NOT_EXISTS_INPUT_FILE)
+
+  columns = [constants.USER_ID, constants.ITEM_LIST]
+  with pd.read_csv(
+      path,
+      usecols=columns,
+      dtype={column: str for column in columns},
+      chunksize=chunk_size,
+      compression='infer',
+  ) as reader:
+    for chunk in reader:
+      yield chunk.dropna()
+
+
+def build_session_queries(
+    item_lists: Sequence[str],
+    keyed_vectors: gensim.models.KeyedVectors,
+    num_recent_items: int = _DEFAULT_NUM_RECENT_ITEMS,
+    half_life: Optional[float] = _DEFAULT_HALF_LIFE,
+) -> SessionQueries:
+  """Builds a recency-weighted query vector for each session.
+
+  Content ids missing from the vocabulary are skipped. The latest of the
+  last num_recent_items known content ids weighs 1.0 and the weight halves
+  every half_life earlier content ids.
+
+  Args:
+    item_lists: Comma separated content ids of each user in viewing order.
+    keyed_vectors: Trained keyed vectors with filled norms.
+    num_recent_items: A number of latest content ids in a query.
+    half_life: A number of content ids after which a weight halves, or None
+      to weigh the recent content ids equally.
+
+  Returns:
+    SessionQueries of the sessions.
+
+  Raises:
+    ValueError: if num_recent_items or half_life is not positive.
+  """
+  if num_recent_items <= 0:
+    raise ValueError('num_recent_items must be positive.')
+  if half_life is not None and half_life <= 0:
+    raise ValueError('half_life must be positive.')
+
+  key_to_index = keyed_vectors.key_to_index
+  sessions = [[key_to_index[item] for item in item_list.split(
+      constants.DELIMITER) if item in key_to_index]
+              for item_list in item_lists]
+  lengths = np.array([len(session) for session in sessions], dtype=np.int64)
+  has_query = lengths > 0
+  lengths = lengths[has_query]
+  seen_indices = np.fromiter(
+      (index for session in sessions for index in session), dtype=np.int64,
+      count=int(lengths.sum()))
+  seen_offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+  positions = (np.repeat(seen_offsets[1:], lengths) - 1
+               - np.arange(len(seen_indices)))
+  is_recent = positions < num_recent_items
+  decay = 1.0 if half_life is None else 0.5 ** (1.0 / half_life)
+  norms = np.where(keyed_vectors.norms == 0, 1.0, keyed_vectors.norms)
+  recent_indices = seen_indices[is_recent]
+  weights = sparse.csr_matrix(
+      (((decay ** positions[is_recent]) / norms[recent_indices]).astype(
+          np.float32),
+       (np.repeat(np.arange(len(lengths)), lengths)[is_recent],
+        recent_indices)),
+      shape=(len(lengths), len(keyed_vectors.vectors)),
+  )
+  vectors = similarity.normalize_vectors(weights @ keyed_vectors.vectors)
+
+  return SessionQueries(has_query, vectors, seen_offsets, seen_indices)
+
+
+def recommend_for_users(
+    input_file_path: str,
+    keyed_vectors: gensim.models.KeyedVectors,
+    output_file_path: str,
+    num_recent_items: int = _DEFAULT_NUM_RECENT_ITEMS,
+    half_life: Optional[float] = _DEFAULT_HALF_LIFE,
+    top_n: int = constants.TOP_N,
+    chunk_size: int = _DEFAULT_CHUNK_SIZE,
+    block_size: int = constants.BLOCK_SIZE,
+) -> int:
+  """Writes the top_n recommendations of each user in training data.
+
+  Users are processed chunk_size at a time and the results of each chunk are
+  appended to the output, so memory does not grow with the number of users.
+  The output has the format of the item-to-item recommendations, with the
+  user id in the keyword column, so firestore.py publishes it as one
+  document per user. Users with no content id in the vocabulary are skipped.
+
+  Args:
+    input_file_path: A CSV format file path of training data.
+    keyed_vectors: Trained keyed vectors.
+    output_file_path: A CSV file path of output.
+    num_recent_items: A number of latest content ids in a user's query.
+    half_life: A number of content ids after which a weight halves, or None
+      to weigh the recent content ids equally.
+    top_n: A number of recommendations per user.
+    chunk_size: A number of users read and scored at once.
+    block_size: A number of users scored with one matrix product.
+
+  Returns:
+    A number of users with recommendations.
+  """
+  keyed_vectors.fill_norms()
+  index_to_key = np.asarray(keyed_vectors.index_to_key, dtype=object)
+  num_users = num_skipped = 0
+  header = True
+  for df_sessions in iter_user_sessions(input_file_path, chunk_size):
+    queries = build_session_queries(df_sessions[constants.ITEM_LIST],
+                                    keyed_vectors, num_recent_items,
+                                    half_life)
+    indices, scores = similarity.top_n_for_query_vectors(
+        keyed_vectors.vectors, queries.vectors, top_n, block_size,
+        keyed_vectors.norms, queries.seen_offsets, queries.seen_indices)
+    df_result = results.build_top_n_frame(
+        df_sessions[constants.USER_ID].to_numpy()[queries.has_query],
+        index_to_key, indices, scores)
+    df_result = df_result[np.isfinite(df_result[constants.SCORE])]
+    df_result.to_csv(output_file_path, mode='w' if header else 'a',
+                     header=header, index=False)
+    header = False
+    num_users += int(queries.has_query.sum())
+    num_skipped += int((~queries.has_query).sum())
+  if header:
+    results.build_result_frame([], [], [], []).to_csv(output_file_path,
+                                                      index=False)
+
+  logging.info('Recommended content to %d users. Skipped %d users without '
+               'known content ids.', num_users, num_skipped)
+  return num_users
@@ -0,0 +1,101 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for session_recommendations.py."""
+
+import os
+import tempfile
+import unittest
+
+import constants
+import gensim
+import numpy as np
+import pandas as pd
+import session_recommendations
+
+
+_FAKE_KEYS = ['ITEM_A', 'ITEM_B', 'ITEM_C', 'ITEM_D']
+_FAKE_DF_SESSIONS = pd.DataFrame({
+    constants.USER_ID: ['user_a', 'user_b', 'user_c', 'user_d'],
+    constants.ITEM_LIST: ['ITEM_A,ITEM_C', 'ITEM_C,ITEM_A', 'ITEM_Z',
+                          'ITEM_A,ITEM_B,ITEM_C,ITEM_D'],
+})
+
+
+def _fake_keyed_vectors():
+  keyed_vectors = gensim.models.KeyedVectors(vector_size=2)
+  keyed_vectors.add_vectors(_FAKE_KEYS, np.array([
+      [1.0, 0.0],
+      [2.0, 0.2],
+      [0.0, 1.0],
+      [0.1, 0.9],
+  ], dtype=np.float32))
+  keyed_vectors.fill_norms()
+  return keyed_vectors
+
+
+class SessionRecommendationsTest(unittest.TestCase):
+
+  def test_build_session_queries(self):
+    actual = session_recommendations.build_session_queries(
+        _FAKE_DF_SESSIONS[constants.ITEM_LIST], _fake_keyed_vectors(),
+        num_recent_items=2, half_life=1.0)
+
+    np.testing.assert_array_equal(actual.has_query,
+                                  [True, True, False, True])
+    np.testing.assert_array_equal(actual.seen_offsets, [0, 2, 4, 8])
+    np.testing.assert_array_equal(actual.seen_indices,
+                                  [0, 2, 2, 0, 0, 1, 2, 3])
+    # The latest item weighs twice as much as the one before it.
+    np.testing.assert_allclose(actual.vectors[0],
+                               np.array([1.0, 2.0]) / np.sqrt(5), rtol=1e-6)
+    np.testing.assert_allclose(actual.vectors[1],
+                               np.array([2.0, 1.0]) / np.sqrt(5), rtol=1e-6)
+
+  def test_build_session_queries_with_equal_weights(self):
+    actual = session_recommendations.build_session_queries(
+        ['ITEM_A,ITEM_C'], _fake_keyed_vectors(), half_life=None)
+
+    np.testing.assert_allclose(actual.vectors[0],
+                               np.array([1.0, 1.0]) / np.sqrt(2), rtol=1e-6)
+
+  def test_build_session_queries_with_invalid_num_recent_items(self):
+    with self.assertRaisesRegex(ValueError, 'num_recent_items'):
+      session_recommendations.build_session_queries(
+          ['ITEM_A'], _fake_keyed_vectors(), num_recent_items=0)
+
+  def test_recommend_for_users(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    input_file_path = os.path.join(temp_dir.name, 'input.csv')
+    output_file_path = os.path.join(temp_dir.name, 'output.csv')
+    _FAKE_DF_SESSIONS.to_csv(input_file_path, index=False)
+
+    num_users = session_recommendations.recommend_for_users(
+        input_file_path, _fake_keyed_vectors(), output_file_path,
+        top_n=2, chunk_size=3, block_size=1)
+
+    actual_df = pd.read_csv(output_file_path)
+    self.assertEqual(num_users, 3)
+    self.assertEqual(
+        list(zip(actual_df[constants.KEYWORD],
+                 actual_df[constants.RCM_RESULT],
+                 actual_df[constants.RANK])),
+        [('user_a', 'ITEM_D', 1), ('user_a', 'ITEM_B', 2),
+         ('user_b', 'ITEM_B', 1), ('user_b', 'ITEM_D', 2)],
+    )
+
+
+if __name__ == '__main__':
+  unittest.main()
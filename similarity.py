@@ -0,0 +1,269 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for batched cosine similarity search over embedding vectors.
+
+The similarity of every query item is computed against the whole vocabulary
+with one matrix product per block of queries, instead of one
+`KeyedVectors.most_similar` call per item.
+"""
+
+from concurrent import futures
+import os
+import tempfile
+from typing import Optional, Tuple
+
+import constants
+import numpy as np
+
+
+_SHARDS_PER_WORKER = 4
+
+
+def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
+  """Normalizes each row of vectors to unit length.
+
+  Args:
+    vectors: A 2-D array of embedding vectors, one row per item.
+
+  Returns:
+    A float32 array of the same shape with unit length rows. Rows with zero
+    length are left as zero.
+  """
+  vectors = np.asarray(vectors, dtype=np.float32)
+  norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+  norms[norms == 0] = 1.0
+  return vectors / norms
+
+
+def top_n_similar(
+    normed_vectors: np.ndarray,
+    query_indices: np.ndarray,
+    top_n: int,
+    block_size: int = constants.BLOCK_SIZE,
+    norms: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+  """Finds the top_n most similar items for each query item.
+
+  The query item itself is excluded from its own results, which matches the
+  behavior of `gensim.models.KeyedVectors.most_similar`. Peak memory of the
+  score matrix is bounded by block_size * len(normed_vectors) floats.
+
+  Args:
+    normed_vectors: A 2-D array of unit length embedding vectors, or of raw
+      embedding vectors when norms is set.
+    query_indices: A 1-D array of row indices in normed_vectors to query.
+    top_n: A number of similar items to return for each query.
+    block_size: A number of queries scored with one matrix product.
+    norms: A 1-D array of the row lengths of raw embedding vectors. Scores
+      are divided by norms instead of normalizing a copy of the vectors, so
+      read-only memory-mapped vectors are shared without being copied.
+
+  Returns:
+    A tuple of (indices, scores). Both are 2-D arrays with one row per query
+    and min(top_n, len(normed_vectors) - 1) columns sorted by descending
+    score.
+
+  Raises:
+    ValueError: if block_size is not positive.
+  """
+  if block_size <= 0:
+    raise ValueError('block_size must be positive.')
+
+  query_indices = np.asarray(query_indices, dtype=np.int64)
+  num_items = normed_vectors.shape[0]
+  k = max(min(top_n, num_items - 1), 0)
+  indices = np.empty((len(query_indices), k), dtype=np.int64)
+  scores = np.empty((len(query_indices), k), dtype=np.float32)
+  if k == 0:
+    return indices, scores
+  if norms is not None:
+    norms = np.where(norms == 0, 1.0, norms).astype(np.float32)
+
+  for start in range(0, len(query_indices), block_size):
+    block = query_indices[start:start + block_size]
+    rows = np.arange(len(block))
+    block_scores = normed_vectors[block] @ normed_vectors.T
+    if norms is not None:
+      block_scores /= norms[block, np.newaxis]
+      block_scores /= norms[np.newaxis, :]
+    block_scores[rows, block] = -np.inf
+
+    candidates = np.argpartition(-block_scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(block_scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+
+    indices[start:start + len(block)] = np.take_along_axis(
+        candidates, order, axis=1)
+    scores[start:start + len(block)] = np.take_along_axis(
+        candidate_scores, order, axis=1)
+
+  return indices, scores
+
+
+def top_n_for_query_vectors(
+    vectors: np.ndarray,
+    query_vectors: np.ndarray,
+    top_n: int,
+    block_size: int = constants.BLOCK_SIZE,
+    norms: Optional[np.ndarray] = None,
+    exclude_offsets: Optional[np.ndarray] = None,
+    exclude_indices: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+  """Finds the top_n items most similar to each of arbitrary query vectors.
+
+  Peak memory of the score matrix is bounded by block_size * len(vectors)
+  floats, so any number of queries is scored in bounded memory.
+
+  Args:
+    vectors: A 2-D array of embedding vectors, one row per item.
+    query_vectors: A 2-D array of unit length query vectors.
+    top_n: A number of similar items to return for each query.
+    block_size: A number of queries scored with one matrix product.
+    norms: A 1-D array of the row lengths of vectors. Computed if None.
+    exclude_offsets: A 1-D array of len(query_vectors) + 1 offsets into
+      exclude_indices in CSR layout. Query i never returns the items
+      exclude_indices[exclude_offsets[i]:exclude_offsets[i + 1]].
+    exclude_indices: A 1-D array of row indices in vectors to exclude.
+
+  Returns:
+    A tuple of (indices, scores) in the format of top_n_similar with
+    min(top_n, len(vectors)) columns. Columns beyond the number of items
+    left after exclusion have a score of -inf.
+
+  Raises:
+    ValueError: if block_size is not positive.
+  """
+  if block_size <= 0:
+    raise ValueError('block_size must be positive.')
+
+  if norms is None:
+    norms = np.linalg.norm(vectors, axis=1)
+  norms = np.where(norms == 0, 1.0, norms).astype(np.float32)
+  num_queries = len(query_vectors)
+  k = min(top_n, len(vectors))
+  indices = np.empty((num_queries, k), dtype=np.int64)
+  scores = np.empty((num_queries, k), dtype=np.float32)
+  if k == 0:
+    return indices, scores
+
+  for start in range(0, num_queries, block_size):
+    stop = min(start + block_size, num_queries)
+    block_scores = np.asarray(query_vectors[start:stop],
+                              dtype=np.float32) @ vectors.T
+    block_scores /= norms[np.newaxis, :]
+    if exclude_offsets is not None:
+      lengths = np.diff(exclude_offsets[start:stop + 1])
+      block_scores[
+          np.repeat(np.arange(stop - start), lengths),
+          exclude_indices[exclude_offsets[start]:exclude_offsets[stop]],
+      ] = -np.inf
+
+    candidates = np.argpartition(-block_scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(block_scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    indices[start:stop] = np.take_along_axis(candidates, order, axis=1)
+    scores[start:stop] = np.take_along_axis(candidate_scores, order, axis=1)
+
+  return indices, scores
+
+
+def _score_shard(
+    vectors_path: str,
+    norms_path: str,
+    query_indices: np.ndarray,
+    top_n: int,
+    block_size: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+  """Scores one shard of queries in a worker process.
+
+  The vectors are attached read-only through a memory map, so every worker
+  shares the page cache of one file instead of receiving a pickled copy.
+  """
+  vectors = np.load(vectors_path, mmap_mode='r')
+  norms = np.load(norms_path, mmap_mode='r')
+  return top_n_similar(vectors, query_indices, top_n, block_size, norms)
+
+
+def _memmap_path(vectors: np.ndarray) -> Optional[str]:
+  """Returns the .npy file backing vectors, or None if it is not mapped."""
+  filename = getattr(vectors, 'filename', None)
+  if not isinstance(vectors, np.memmap) or not filename:
+    return None
+  if not str(filename).endswith('.npy'):
+    return None
+  mapped = np.load(filename, mmap_mode='r')
+  if mapped.shape != vectors.shape or mapped.dtype != vectors.dtype:
+    return None
+  return str(filename)
+
+
+def parallel_top_n_similar(
+    vectors: np.ndarray,
+    query_indices: np.ndarray,
+    top_n: int,
+    block_size: int = constants.BLOCK_SIZE,
+    norms: Optional[np.ndarray] = None,
+    num_workers: int = 1,
+) -> Tuple[np.ndarray, np.ndarray]:
+  """Finds the top_n most similar items with a pool of worker processes.
+
+  The queries are split into contiguous shards that are scored by
+  top_n_similar in a `concurrent.futures.ProcessPoolExecutor`. Workers attach
+  to the vectors through a memory-mapped .npy file: the file backing
+  memory-mapped keyed vectors is reused, otherwise the vectors are written
+  to a temporary file once. Shards are merged in query order, so the output
+  is identical to top_n_similar.
+
+  Args:
+    vectors: A 2-D array of embedding vectors, one row per item.
+    query_indices: A 1-D array of row indices in vectors to query.
+    top_n: A number of similar items to return for each query.
+    block_size: A number of queries scored with one matrix product in each
+      worker.
+    norms: A 1-D array of the row lengths of vectors. Computed if None.
+    num_workers: A number of worker processes. 1 scores in this process.
+
+  Returns:
+    A tuple of (indices, scores) in the format of top_n_similar.
+  """
+  if norms is None:
+    norms = np.linalg.norm(vectors, axis=1)
+  query_indices = np.asarray(query_indices, dtype=np.int64)
+  if num_workers <= 1 or len(query_indices) <= block_size:
+    return top_n_similar(vectors, query_indices, top_n, block_size, norms)
+
+  num_shards = min(num_workers * _SHARDS_PER_WORKER,
+                   -(-len(query_indices) // block_size))
+  shards = np.array_split(query_indices, num_shards)
+  with tempfile.TemporaryDirectory() as temp_dir:
+    vectors_path = _memmap_path(vectors)
+    if vectors_path is None:
+      vectors_path = os.path.join(temp_dir, 'vectors.npy')
+      np.save(vectors_path, vectors)
+    norms_path = os.path.join(temp_dir, 'norms.npy')
+    np.save(norms_path, np.asarray(norms, dtype=np.float32))
+
+    with futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+      shard_results = list(executor.map(
+          _score_shard,
+          [vectors_path] * num_shards,
+          [norms_path] * num_shards,
+          shards,
+          [top_n] * num_shards,
+          [block_size] * num_shards,
+      ))
+
+  return (np.concatenate([indices for indices, _ in shard_results]),
+          np.concatenate([scores for _, scores in shard_results]))
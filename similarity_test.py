@@ -0,0 +1,139 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for similarity.py."""
+
+import os
+import tempfile
+import unittest
+
+from absl.testing import parameterized
+import numpy as np
+import similarity
+
+
+_FAKE_VECTORS = np.array(
+    [[1.0, 0.0],
+     [0.9, 0.1],
+     [0.0, 1.0],
+     [0.1, 0.9],
+     [-1.0, 0.0]],
+    dtype=np.float32,
+)
+
+
+class SimilarityTest(parameterized.TestCase):
+
+  def test_normalize_vectors_returns_unit_rows(self):
+    actual = similarity.normalize_vectors([[3.0, 4.0], [0.0, 0.0]])
+
+    np.testing.assert_allclose(actual, [[0.6, 0.8], [0.0, 0.0]])
+    self.assertEqual(actual.dtype, np.float32)
+
+  @parameterized.named_parameters([
+      {'testcase_name': 'single_block', 'block_size': 1024},
+      {'testcase_name': 'one_query_per_block', 'block_size': 1},
+      {'testcase_name': 'uneven_blocks', 'block_size': 2},
+  ])
+  def test_top_n_similar_matches_brute_force(self, block_size):
+    normed_vectors = similarity.normalize_vectors(_FAKE_VECTORS)
+    query_indices = np.arange(len(normed_vectors))
+
+    indices, scores = similarity.top_n_similar(
+        normed_vectors, query_indices, 2, block_size)
+
+    expected_scores = normed_vectors @ normed_vectors.T
+    np.fill_diagonal(expected_scores, -np.inf)
+    expected_indices = np.argsort(-expected_scores, axis=1)[:, :2]
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(
+        scores, np.take_along_axis(expected_scores, expected_indices, axis=1),
+        rtol=1e-6)
+
+  def test_top_n_similar_with_norms_matches_normed_vectors(self):
+    normed_vectors = similarity.normalize_vectors(_FAKE_VECTORS)
+    query_indices = np.arange(len(normed_vectors))
+
+    indices, scores = similarity.top_n_similar(
+        _FAKE_VECTORS * 3, query_indices, 2,
+        norms=np.linalg.norm(_FAKE_VECTORS * 3, axis=1))
+
+    expected_indices, expected_scores = similarity.top_n_similar(
+        normed_vectors, query_indices, 2)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+  def test_top_n_similar_caps_top_n_at_vocabulary_size(self):
+    normed_vectors = similarity.normalize_vectors(_FAKE_VECTORS[:3])
+
+    indices, _ = similarity.top_n_similar(normed_vectors, [0], 10)
+
+    self.assertEqual(indices.shape, (1, 2))
+    self.assertNotIn(0, indices[0])
+
+  @parameterized.named_parameters([
+      {'testcase_name': 'in_memory_vectors', 'use_memmap': False},
+      {'testcase_name': 'memory_mapped_vectors', 'use_memmap': True},
+  ])
+  def test_parallel_top_n_similar_matches_top_n_similar(self, use_memmap):
+    vectors = np.random.default_rng(0).normal(size=(50, 4)).astype(np.float32)
+    if use_memmap:
+      temp_dir = tempfile.TemporaryDirectory()
+      self.addCleanup(temp_dir.cleanup)
+      path = os.path.join(temp_dir.name, 'vectors.npy')
+      np.save(path, vectors)
+      vectors = np.load(path, mmap_mode='r')
+    query_indices = np.arange(len(vectors))[::-1]
+
+    indices, scores = similarity.parallel_top_n_similar(
+        vectors, query_indices, 3, block_size=4, num_workers=2)
+
+    expected_indices, expected_scores = similarity.top_n_similar(
+        vectors, query_indices, 3, 4, norms=np.linalg.norm(vectors, axis=1))
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+  @parameterized.named_parameters([
+      {'testcase_name': 'single_block', 'block_size': 1024},
+      {'testcase_name': 'uneven_blocks', 'block_size': 2},
+  ])
+  def test_top_n_for_query_vectors_matches_top_n_similar(self, block_size):
+    normed_vectors = similarity.normalize_vectors(_FAKE_VECTORS)
+    query_indices = np.arange(len(normed_vectors))
+
+    indices, scores = similarity.top_n_for_query_vectors(
+        _FAKE_VECTORS, normed_vectors, 2, block_size,
+        exclude_offsets=np.arange(len(query_indices) + 1),
+        exclude_indices=query_indices)
+
+    expected_indices, expected_scores = similarity.top_n_similar(
+        normed_vectors, query_indices, 2)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+  def test_top_n_for_query_vectors_with_all_items_excluded(self):
+    _, scores = similarity.top_n_for_query_vectors(
+        _FAKE_VECTORS[:2], np.array([[1.0, 0.0]]), 3,
+        exclude_offsets=np.array([0, 1]), exclude_indices=np.array([0]))
+
+    self.assertEqual(scores.shape, (1, 2))
+    self.assertEqual(scores[0, 1], -np.inf)
+
+  def test_top_n_similar_with_invalid_block_size(self):
+    with self.assertRaisesRegex(ValueError, 'block_size must be positive'):
+      similarity.top_n_similar(_FAKE_VECTORS, [0], 2, 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,291 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Hyperparameter search of word2vec with a holdout metric.
+
+Candidates from a grid or a random search space are trained concurrently in
+a process pool, evaluated with evaluation.py and written to a leaderboard.
+The training data is encoded once and memory-mapped by every trial, so no
+trial parses the CSV.
+
+Run from project's root directory.
+
+Example:
+  `python sweep.py -i sample_input_data.csv --space window=3,5,7
+  negative=5,10 -o leaderboard.csv`
+  `python sweep.py -i sample_input_data.csv --space window=2,3,5,8
+  vector_size=32,64,100 --search random --num_trials 6 --jobs 3 -o
+  leaderboard.csv`
+"""
+
+import argparse
+from concurrent import futures
+import dataclasses
+import itertools
+import logging
+import os
+import random
+import tempfile
+from typing import Dict, List, Optional, Sequence
+
+import corpus
+import evaluation
+import main as pipeline
+import pandas as pd
+
+
+SEARCH_GRID = 'grid'
+SEARCH_RANDOM = 'random'
+
+_METRICS = ('hit_rate', 'mrr', 'coverage')
+_DEFAULT_METRIC = 'hit_rate'
+_DEFAULT_NUM_TRIALS = 10
+_DEFAULT_JOBS = 2
+_SPACE_ASSIGNMENT = '='
+_SPACE_DELIMITER = ','
+# Parameters that are set by the sweep itself rather than searched.
+_RESERVED_PARAMS = ('workers',)
+
+logging.basicConfig(
+    format='%(asctime)s %(message)s',
+    datefmt='%m/%d/%Y %I:%M:%S %p',
+    level=logging.INFO,
+)
+
+SearchSpace = Dict[str, List[int]]
+
+
+def parse_search_space(specs: Sequence[str]) -> SearchSpace:
+  """Parses a search space from name=value,value specifications.
+
+  Args:
+    specs: Specifications such as 'window=3,5,7' of main.Word2VecParams
+      fields.
+
+  Returns:
+    A dict of parameter name to candidate values.
+
+  Raises:
+    ValueError: if a specification is malformed or names an unknown or
+      reserved parameter.
+  """
+  names = {field.name for field in dataclasses.fields(pipeline.Word2VecParams)}
+  space = {}
+  for spec in specs:
+    name, assignment, values = spec.partition(_SPACE_ASSIGNMENT)
+    if not assignment or not values:
+      raise ValueError(f'Search space must be name=value,... but got {spec}.')
+    if name not in names or name in _RESERVED_PARAMS:
+      raise ValueError(f'{name} is not a searchable word2vec parameter.')
+    space[name] = [int(value) for value in values.split(_SPACE_DELIMITER)]
+  return space
+
+
+def candidate_params(
+    space: SearchSpace,
+    search: str = SEARCH_GRID,
+    num_trials: int = _DEFAULT_NUM_TRIALS,
+    seed: int = 0,
+) -> List[Dict[str, int]]:
+  """Lists the parameter overrides of each trial.
+
+  Args:
+    space: A dict of parameter name to candidate values.
+    search: SEARCH_GRID for every combination, or SEARCH_RANDOM for
+      num_trials distinct combinations sampled uniformly.
+    num_trials: A number of trials of random search.
+    seed: A seed for the random number generator of random search.
+
+  Returns:
+    A list of dicts of parameter name to value.
+  """
+  names = list(space)
+  grid = [dict(zip(names, values))
+          for values in itertools.product(*space.values())]
+  if search == SEARCH_RANDOM and num_trials < len(grid):
+    return random.Random(seed).sample(grid, num_trials)
+  return grid
+
+
+def _run_trial(
+    encoded_path: str,
+    overrides: Dict[str, int],
+    workers: int,
+    scoring_params: pipeline.ScoringParams,
+) -> Dict[str, float]:
+  """Trains and evaluates one candidate in a worker process."""
+  encoded = corpus.EncodedCorpus.load(encoded_path)
+  params = dataclasses.replace(pipeline.Word2VecParams(), workers=workers,
+                               **overrides)
+  # Memory tracing would inflate the stage seconds the leaderboard reports.
+  report, df_stages = evaluation.run_evaluation(encoded, params,
+                                                scoring_params,
+                                                trace_memory=False)
+  seconds = df_stages.set_index('stage')['seconds']
+  return {
+      **overrides,
+      **{metric: getattr(report, metric) for metric in _METRICS},
+      'train_seconds': seconds[evaluation.STAGE_TRAIN],
+      'score_seconds': seconds[evaluation.STAGE_SCORE],
+  }
+
+
+def run_sweep(
+    encoded_path: str,
+    candidates: Sequence[Dict[str, int]],
+    jobs: int = _DEFAULT_JOBS,
+    metric: str = _DEFAULT_METRIC,
+    scoring_params: Optional[pipeline.ScoringParams] = None,
+) -> pd.DataFrame:
+  """Trains and evaluates candidates concurrently.
+
+  Each of the jobs worker processes trains with os.cpu_count() // jobs
+  word2vec threads, so concurrent trials do not oversubscribe the cores.
+
+  Args:
+    encoded_path: A directory path of an encoded corpus saved by
+      corpus.EncodedCorpus.save.
+    candidates: Parameter overrides of each trial, e.g. from
+      candidate_params.
+    jobs: A number of trials trained concurrently.
+    metric: A metric of evaluation.EvaluationReport to rank candidates by.
+    scoring_params: Parameters of the similarity search in each trial.
+
+  Returns:
+    A leaderboard dataframe with the parameters, metrics and stage seconds of
+    each trial, best first.
+
+  Raises:
+    ValueError: if metric is unknown.
+  """
+  if metric not in _METRICS:
+    raise ValueError(f'metric must be one of {_METRICS}.')
+
+  scoring_params = scoring_params or pipeline.ScoringParams()
+  workers = max(1, (os.cpu_count() or 1) // jobs)
+  logging.info('Running %d trials in %d processes with %d word2vec workers '
+               'each.', len(candidates), jobs, workers)
+  with futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+    rows = list(executor.map(
+        _run_trial,
+        [encoded_path] * len(candidates),
+        candidates,
+        [workers] * len(candidates),
+        [scoring_params] * len(candidates),
+    ))
+
+  return pd.DataFrame(rows).sort_values(
+      metric, ascending=False, kind='stable').reset_index(drop=True)
+
+
+def parse_cli_args() -> argparse.Namespace:
+  """Parses command line arguments.
+
+  Returns:
+    An instance of argparse.Namespace with arg values.
+  """
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+      '--input', '-i',
+      help='Input data file path. Synthetic sessions are used if omitted.',
+      default=None,
+      type=str,
+      )
+  parser.add_argument(
+      '--output', '-o',
+      help='Output file path of the leaderboard CSV.',
+      required=True,
+      type=str,
+      )
+  parser.add_argument(
+      '--space',
+      help=('Candidate values of word2vec parameters, e.g. window=3,5,7 '
+            'negative=5,10.'),
+      required=True,
+      nargs='+',
+      type=str,
+      )
+  parser.add_argument(
+      '--search',
+      help='"grid" tries every combination, "random" samples --num_trials.',
+      default=SEARCH_GRID,
+      choices=(SEARCH_GRID, SEARCH_RANDOM),
+      type=str,
+      )
+  parser.add_argument(
+      '--num_trials',
+      help='Number of trials of random search.',
+      default=_DEFAULT_NUM_TRIALS,
+      type=int,
+      )
+  parser.add_argument(
+      '--jobs', '-j',
+      help='Number of trials trained concurrently.',
+      default=_DEFAULT_JOBS,
+      type=int,
+      )
+  parser.add_argument(
+      '--metric',
+      help='Holdout metric to rank the candidates by.',
+      default=_DEFAULT_METRIC,
+      choices=_METRICS,
+      type=str,
+      )
+  parser.add_argument(
+      '--encoded_corpus', '-ec',
+      help=('Directory of the cached encoded input data. A temporary '
+            'directory is used if omitted.'),
+      default=None,
+      type=str,
+      )
+  parser.add_argument(
+      '--num_sessions',
+      help='Number of synthetic sessions.',
+      default=corpus.SYNTHETIC_NUM_SESSIONS,
+      type=int,
+      )
+  parser.add_argument(
+      '--vocabulary_size',
+      help='Number of distinct synthetic content ids.',
+      default=corpus.SYNTHETIC_VOCABULARY_SIZE,
+      type=int,
+      )
+
+  return parser.parse_args()
+
+
+def main() -> None:
+  """Runs the sweep and writes the leaderboard."""
+  args = parse_cli_args()
+  candidates = candidate_params(parse_search_space(args.space), args.search,
+                                args.num_trials)
+  with tempfile.TemporaryDirectory() as temp_dir:
+    encoded_path = args.encoded_corpus or os.path.join(temp_dir, 'encoded')
+    if args.input is None:
+      corpus.synthetic_corpus(
+          args.num_sessions, args.vocabulary_size,
+          corpus.SYNTHETIC_SESSION_LENGTH,
+      ).save(encoded_path)
+    else:
+      corpus.load_or_encode(encoded_path, args.input)
+
+    df_leaderboard = run_sweep(encoded_path, candidates, args.jobs,
+                               args.metric)
+
+  df_leaderboard.to_csv(args.output, index=False)
+  print(df_leaderboard.to_string(index=False))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,99 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for sweep.py."""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import corpus
+import evaluation
+import pandas as pd
+import sweep
+
+
+class SweepTest(unittest.TestCase):
+
+  def test_parse_search_space(self):
+    actual = sweep.parse_search_space(['window=3,5', 'negative=10'])
+
+    self.assertEqual(actual, {'window': [3, 5], 'negative': [10]})
+
+  def test_parse_search_space_rejects_unknown_and_reserved_params(self):
+    for spec in ('window', 'window=', 'alpha=1', 'workers=1,2'):
+      with self.subTest(spec=spec):
+        with self.assertRaises(ValueError):
+          sweep.parse_search_space([spec])
+
+  def test_candidate_params_grid(self):
+    actual = sweep.candidate_params({'window': [3, 5], 'negative': [5, 10]})
+
+    self.assertEqual(actual, [
+        {'window': 3, 'negative': 5},
+        {'window': 3, 'negative': 10},
+        {'window': 5, 'negative': 5},
+        {'window': 5, 'negative': 10},
+    ])
+
+  def test_candidate_params_random(self):
+    space = {'window': [1, 2, 3, 4], 'negative': [5, 10, 15]}
+
+    actual = sweep.candidate_params(space, sweep.SEARCH_RANDOM, num_trials=5,
+                                    seed=1)
+
+    self.assertEqual(len(actual), 5)
+    self.assertEqual(len({tuple(params.items()) for params in actual}), 5)
+    self.assertEqual(actual, sweep.candidate_params(
+        space, sweep.SEARCH_RANDOM, num_trials=5, seed=1))
+
+  def test_run_sweep(self):
+    with tempfile.TemporaryDirectory() as temp_dir:
+      encoded_path = os.path.join(temp_dir, 'encoded')
+      corpus.synthetic_corpus(200, 20, 5).save(encoded_path)
+      candidates = sweep.candidate_params({
+          'window': [1, 3], 'min_count': [1], 'vector_size': [8],
+          'epochs': [1]})
+
+      actual = sweep.run_sweep(encoded_path, candidates, jobs=2)
+
+    self.assertEqual(sorted(actual['window']), [1, 3])
+    self.assertTrue(actual['hit_rate'].is_monotonic_decreasing)
+    self.assertTrue((actual['train_seconds'] > 0).all())
+    self.assertIn('score_seconds', actual.columns)
+
+  def test_run_trial_does_not_trace_memory(self):
+    report = evaluation.EvaluationReport(1, 7, 1.0, 1.0, 1.0)
+    df_stages = pd.DataFrame([
+        evaluation.StageStats(evaluation.STAGE_TRAIN, 2.0, None),
+        evaluation.StageStats(evaluation.STAGE_SCORE, 1.0, None),
+    ])
+    with tempfile.TemporaryDirectory() as temp_dir:
+      corpus.synthetic_corpus(10, 5, 3).save(temp_dir)
+      with mock.patch.object(evaluation, 'run_evaluation',
+                             return_value=(report, df_stages)) as mock_run:
+        actual = sweep._run_trial(temp_dir, {'window': 3}, 1,
+                                  sweep.pipeline.ScoringParams())
+
+    self.assertFalse(mock_run.call_args.kwargs['trace_memory'])
+    self.assertEqual(actual['train_seconds'], 2.0)
+
+  def test_run_sweep_rejects_unknown_metric(self):
+    with self.assertRaises(ValueError):
+      sweep.run_sweep('encoded', [], metric='accuracy')
+
+
+if __name__ == '__main__':
+  unittest.main()
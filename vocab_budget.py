@@ -0,0 +1,160 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Functions for fitting the word2vec vocabulary into a memory budget.
+
+The memory of a word2vec model grows linearly with its vocabulary: every
+content id has a vocabulary entry, an input vector and an output vector of
+hierarchical softmax or negative sampling. The estimate follows
+gensim.models.word2vec.Word2Vec.estimate_memory.
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+from gensim import utils
+import numpy as np
+import pandas as pd
+
+
+ITEM = 'item'
+COUNT = 'count'
+
+
+_FLOAT_BYTES = np.dtype(np.float32).itemsize
+# Bytes of the vocabulary entry of a content id as estimated by gensim.
+_VOCAB_ENTRY_BYTES = 500
+_VOCAB_ENTRY_BYTES_HS = 700
+_BYTES_PER_MB = 1024 * 1024
+_LOGGED_PRUNED_ITEMS = 20
+_PRUNED_ITEMS_SUFFIX = '.pruned.csv'
+
+
+def bytes_per_content_id(vector_size: int, hs: int, negative: int) -> int:
+  """Estimates the model memory per content id in the vocabulary.
+
+  Args:
+    vector_size: Dimensionality of the embedding vectors.
+    hs: 1 for hierarchical softmax, 0 for negative sampling.
+    negative: A number of noise content ids drawn for negative sampling.
+
+  Returns:
+    A number of bytes.
+  """
+  num_matrices = 1 + (1 if hs else 0) + (1 if negative else 0)
+  return ((_VOCAB_ENTRY_BYTES_HS if hs else _VOCAB_ENTRY_BYTES)
+          + num_matrices * vector_size * _FLOAT_BYTES)
+
+
+def max_final_vocab(
+    max_vocab: Optional[int],
+    max_memory_mb: Optional[int],
+    vector_size: int,
+    hs: int,
+    negative: int,
+) -> Optional[int]:
+  """Picks the largest vocabulary size that satisfies both limits.
+
+  Args:
+    max_vocab: A maximum number of content ids in the vocabulary, or None.
+    max_memory_mb: A memory budget of the model in MiB, or None.
+    vector_size: Dimensionality of the embedding vectors.
+    hs: 1 for hierarchical softmax, 0 for negative sampling.
+    negative: A number of noise content ids drawn for negative sampling.
+
+  Returns:
+    A max_final_vocab for gensim word2vec, or None for no limit.
+  """
+  limits = []
+  if max_vocab is not None:
+    limits.append(max_vocab)
+  if max_memory_mb is not None:
+    per_content_id = bytes_per_content_id(vector_size, hs, negative)
+    limits.append(max_memory_mb * _BYTES_PER_MB // per_content_id)
+    logging.info('Memory budget of %d MiB fits %d content ids of %d bytes.',
+                 max_memory_mb, limits[-1], per_content_id)
+  return min(limits) if limits else None
+
+
+class PrunedItems:
+  """Records the content ids that word2vec drops from its vocabulary.
+
+  An instance is passed to gensim as trim_rule. It keeps the default
+  decision of count >= min_count, where min_count is raised by gensim to fit
+  max_final_vocab, and remembers the content ids that it drops.
+
+  Attributes:
+    items: A list of (content id, count) of the dropped content ids.
+  """
+
+  def __init__(self):
+    self.items: List[Tuple[str, int]] = []
+
+  def __call__(self, word: str, count: int, min_count: int) -> int:
+    if count < min_count:
+      self.items.append((word, count))
+    return utils.RULE_DEFAULT
+
+  def most_frequent(self) -> List[Tuple[str, int]]:
+    """Returns every dropped (content id, count), most frequent first."""
+    return sorted(self.items, key=lambda item: (-item[1], item[0]))
+
+  def log(self, min_count: int) -> None:
+    """Logs the number of pruned content ids and the most frequent ones."""
+    if not self.items:
+      return
+    most_frequent = self.most_frequent()
+    logging.info(
+        'Pruned %d content ids seen fewer than %d times from the vocabulary. '
+        'They have no vector and are left to cold-start handling. Most '
+        'frequent: %s.', len(self.items), min_count,
+        ', '.join(f'{word} ({count})'
+                  for word, count in most_frequent[:_LOGGED_PRUNED_ITEMS]))
+
+
+def pruned_items_path(path: str) -> str:
+  """Returns the file path of the pruned content ids saved next to a model.
+
+  Args:
+    path: A file path of a saved model or keyed vectors.
+
+  Returns:
+    A CSV file path.
+  """
+  return path + _PRUNED_ITEMS_SUFFIX
+
+
+def save_pruned_items(items: List[Tuple[str, int]], path: str) -> None:
+  """Writes pruned content ids as a CSV with the columns item and count.
+
+  Args:
+    items: A list of (content id, count), e.g. from
+      PrunedItems.most_frequent.
+    path: A CSV file path, e.g. from pruned_items_path.
+  """
+  pd.DataFrame(items, columns=[ITEM, COUNT]).to_csv(path, index=False)
+  logging.info('Saved %d pruned content ids into %s.', len(items), path)
+
+
+def load_pruned_items(path: str) -> List[Tuple[str, int]]:
+  """Reads pruned content ids written by save_pruned_items.
+
+  Args:
+    path: A CSV file path.
+
+  Returns:
+    A list of (content id, count), most frequent first.
+  """
+  df_pruned = pd.read_csv(path, dtype={ITEM: str}, keep_default_na=False)
+  return list(zip(df_pruned[ITEM].tolist(), df_pruned[COUNT].tolist()))
@@ -0,0 +1,74 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for vocab_budget.py."""
+
+import os
+import tempfile
+import unittest
+
+from gensim.models import word2vec
+import vocab_budget
+
+
+class VocabBudgetTest(unittest.TestCase):
+
+  def test_bytes_per_content_id_matches_gensim_estimate(self):
+    for hs, negative in ((0, 5), (1, 0), (1, 5)):
+      model = word2vec.Word2Vec(vector_size=32, hs=hs, negative=negative)
+      expected = model.estimate_memory(vocab_size=1)['total']
+
+      self.assertEqual(vocab_budget.bytes_per_content_id(32, hs, negative),
+                       expected)
+
+  def test_max_final_vocab(self):
+    # 500 bytes of vocabulary and 2 * 100 float32 per content id.
+    self.assertEqual(
+        vocab_budget.max_final_vocab(None, 1, 100, hs=0, negative=5),
+        1024 * 1024 // 1300)
+    self.assertEqual(
+        vocab_budget.max_final_vocab(100, 1, 100, hs=0, negative=5), 100)
+    self.assertIsNone(
+        vocab_budget.max_final_vocab(None, None, 100, hs=0, negative=5))
+
+  def test_pruned_items(self):
+    pruned_items = vocab_budget.PrunedItems()
+    sessions = [['ITEM_A', 'ITEM_B'], ['ITEM_A', 'ITEM_C'], ['ITEM_A']]
+
+    model = word2vec.Word2Vec(sessions, min_count=1, max_final_vocab=1,
+                              trim_rule=pruned_items, workers=1)
+
+    self.assertEqual(model.wv.index_to_key, ['ITEM_A'])
+    self.assertCountEqual(pruned_items.items, [('ITEM_B', 1), ('ITEM_C', 1)])
+    with self.assertLogs(level='INFO') as log_output:
+      pruned_items.log(model.effective_min_count)
+    self.assertIn('Pruned 2 content ids seen fewer than 2 times',
+                  log_output.output[0])
+
+  def test_save_and_load_pruned_items(self):
+    pruned_items = vocab_budget.PrunedItems()
+    for word, count in (('ITEM_B', 1), ('NA', 3), ('ITEM_C', 2)):
+      pruned_items(word, count, min_count=4)
+    with tempfile.TemporaryDirectory() as temp_dir:
+      path = vocab_budget.pruned_items_path(
+          os.path.join(temp_dir, 'vectors.kv'))
+
+      vocab_budget.save_pruned_items(pruned_items.most_frequent(), path)
+      actual = vocab_budget.load_pruned_items(path)
+
+    self.assertEqual(actual, [('NA', 3), ('ITEM_C', 2), ('ITEM_B', 1)])
+
+
+if __name__ == '__main__':
+  unittest.main()